@@ -1,27 +1,88 @@
 # app.py — Betty robuste (réponses rapides étendues, typos, Petit Rat, 1 lien max, bulle Wix, relance non systématique)
 
-import os, json, re, textwrap, unicodedata
-import openai
-from flask import Flask, request, jsonify, render_template, session
-from dotenv import load_dotenv
+import os, sys, json, re, textwrap, hashlib, hmac, itertools, threading, time, uuid, contextvars
+from contextlib import contextmanager
 from datetime import date  # pour la promo de septembre
+from typing import TYPE_CHECKING
+
+# chronométrage du démarrage (startup.py) : importé en premier, sans dépendance
+from startup import Startup
+STARTUP = Startup("app")
+
+with STARTUP.step("flask", kind="import"):
+    from flask import Flask, Response, request, jsonify, session, stream_with_context, g, has_request_context, send_file
+with STARTUP.step("dotenv", kind="import"):
+    from dotenv import load_dotenv
+
+with STARTUP.step("modules locaux", kind="import"):
+    from fuzzy import norm, trigrams, unit_trigrams, similar, fuzzy_has, KeywordMatcher
+    from response_cache import ResponseCache, cache_key
+    from singleflight import FlightTimeout, SingleFlight
+    from concurrency import ConcurrencyGate, GateTimeout, Overloaded
+    from ratelimit import RateLimiter, RateLimited, DailyBudget, BudgetExhausted
+    from prompt_budget import PromptBudget, PromptPlan, TokenLedger
+    from metrics import Registry
+    from conversation import Conversation, ConversationStore, is_follow_up
+    from static_assets import AssetStore, choose_encoding, compress
+    from tenants import Tenant, TenantBundle, TenantRegistry
+    from kb_ingest import KB_FOLDERS
+    from chatlog import ChatLog
+    from deadline import Deadline, DeadlineExceeded, DeadlineSaturated
+    from profiling import Profiler
+    from routing import Route, classify, routes_from_env
+
+if TYPE_CHECKING:  # importés par init_components() (requests, numpy : hors du chemin critique)
+    from kb_live import Knowledge, LiveKnowledge
+    from provider_client import ProviderClient
 
 # =========================
-# ENV & Provider (openai==0.28)
+# ENV & Provider (OpenAI et/ou OpenRouter — pool, retries, bascule : provider_client.py)
 # =========================
-load_dotenv()
-OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-OPENROUTER_KEY = os.getenv("OPENROUTER_API_KEY")
+with STARTUP.step("dotenv"):
+    load_dotenv()
 MODEL_ID = os.getenv("MODEL_ID", "openai/gpt-4o-mini")
 
-if OPENAI_KEY:
-    openai.api_key = OPENAI_KEY
-    openai.api_base = "https://api.openai.com/v1"
-elif OPENROUTER_KEY:
-    openai.api_key = OPENROUTER_KEY
-    openai.api_base = "https://openrouter.ai/api/v1"
-else:
-    raise ValueError("Aucune clé API trouvée (OPENAI_API_KEY ou OPENROUTER_API_KEY).")
+# LAZY_INIT=1 (défaut) : client LLM et base de connaissances créés en arrière-plan (voir init_components)
+LAZY_INIT = os.getenv("LAZY_INIT", "1") != "0"
+LLM: "ProviderClient | None" = None
+ProviderError: type[Exception] = Exception  # provider_client.ProviderError une fois initialisé
+
+# =========================
+# Métriques Prometheus (/metrics) — agrégées entre workers via METRICS_DIR (metrics.py)
+# =========================
+METRICS = Registry(os.getenv("METRICS_DIR", "instance/metrics"))
+STAGE_SECONDS = METRICS.histogram("stage_seconds", "Durée de chaque étape du pipeline de réponse")
+REPLIES = METRICS.counter("replies_total", "Réponses par origine (fast, cache, model, degraded, busy, limited, faq_only, error)")
+FAST_HITS = METRICS.counter("fast_path_hits_total", "Réponses rapides par règle")
+UPSTREAM_RESPONSES = METRICS.counter("upstream_responses_total", "Réponses des fournisseurs LLM par code HTTP")
+UPSTREAM_ERRORS = METRICS.counter("upstream_errors_total", "Appels modèle en échec (après nouvelles tentatives et bascule)")
+HTTP_REQUESTS = METRICS.counter("http_requests_total", "Requêtes HTTP par route et code")
+
+# trace de la requête en cours (origine de la réponse, durée des étapes, tokens) : relue
+# en fin de requête par le journal des échanges (log_exchange)
+def trace() -> dict:
+    if not has_request_context():
+        return {}
+    if "trace" not in g:
+        g.trace = {}
+    return g.trace
+
+def observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name)
+    stages = trace().setdefault("stages", {})
+    stages[name] = round(stages.get(name, 0.0) + seconds, 4)
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t0)
+
+def replied(source: str) -> None:
+    REPLIES.inc(source=source)
+    trace()["source"] = source
 
 # =========================
 # URLs du site
@@ -39,23 +100,42 @@ URLS = {
 }
 
 # =========================
-# FAQ locale (optionnelle)
+# Base de connaissances : index BM25 (data/ + personnalisées/, FAQ incluse) + FAQ en réponse directe,
+# rechargés à chaud quand les sources changent (kb_live.py)
 # =========================
 FAQ_PATH = os.getenv("FAQ_PATH", "data/faq_danse.json")
-def load_faq() -> str:
-    try:
-        with open(FAQ_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        items = []
-        for it in data:
-            q = (it.get("question") or "").strip()
-            a = (it.get("answer") or "").strip()
-            if q and a:
-                items.append(f"Q: {q}\nR: {a}")
-        return "\n\n".join(items)[:4000]
-    except Exception:
-        return ""
-KNOWLEDGE = load_faq()
+KNOWLEDGE: "LiveKnowledge | None" = None  # base du studio par défaut, créée par init_components()
+KB_TOP_K = int(os.getenv("KB_TOP_K", 4))
+TENANT_DATA_DIR = os.getenv("TENANT_DATA_DIR", "instance/tenants")  # snapshots/index des autres studios
+
+def load_knowledge(t: "Tenant") -> "LiveKnowledge":
+    from kb_live import LiveKnowledge
+    if t.id == DEFAULT_TENANT.id:
+        snapshot_path = os.getenv("KB_SNAPSHOT_PATH", "instance/kb_snapshot.bin")
+        index_path = os.getenv("KB_INDEX_PATH", "instance/kb_index.npz")
+    else:
+        snapshot_path = os.path.join(TENANT_DATA_DIR, t.id, "kb_snapshot.bin")
+        index_path = os.path.join(TENANT_DATA_DIR, t.id, "kb_index.npz")
+    return LiveKnowledge(
+        snapshot_path,
+        index_path,
+        t.faq_path,
+        folders=t.kb_folders,
+        interval=float(os.getenv("KB_WATCH_INTERVAL", 30)),  # 0 → rechargement via /admin/kb/reload seulement
+        # FAQ : réponse directe (sans modèle) quand la question correspond clairement à une entrée
+        faq_options={
+            "min_confidence": float(os.getenv("FAQ_MIN_CONFIDENCE", 0.8)),
+            "min_score": float(os.getenv("FAQ_MIN_SCORE", 0.4)),
+        },
+    )
+
+def knowledge() -> "Knowledge":
+    """Version de la base du studio, figée pour toute la requête même si un rechargement a lieu entre-temps."""
+    if not has_request_context():
+        return tenant().live.current
+    if "kb" not in g:
+        g.kb = tenant().live.current
+    return g.kb
 
 # =========================
 # Petit Rat (magasin)
@@ -69,39 +149,8 @@ PETIT_RAT_BLURB = (
 ).format(addr=PETIT_RAT_ADDR)
 
 # -------------------------
-# Normalisation & fuzzy-match (typos)
+# Normalisation & fuzzy-match (typos) → fuzzy.py
 # -------------------------
-def norm(s: str) -> str:
-    s = unicodedata.normalize("NFD", s)
-    s = "".join(c for c in s if unicodedata.category(c) != "Mn")
-    s = s.lower()
-    s = re.sub(r"[^a-z0-9]+", " ", s)
-    s = re.sub(r"(.)\1{2,}", r"\1\1", s)  # aaa -> aa
-    return s.strip()
-
-def trigrams(s: str) -> set:
-    s = f"  {s}  "
-    return {s[i:i+3] for i in range(len(s)-2)}
-
-def similar(a: str, b: str) -> float:
-    A, B = trigrams(a), trigrams(b)
-    if not A or not B: return 0.0
-    return len(A & B) / len(A | B)
-
-def fuzzy_has(text: str, keywords: list[str], threshold: float = 0.45) -> bool:
-    t = norm(text)
-    words = t.split()
-    for kw in keywords:
-        k = norm(kw)
-        if k in t:
-            return True
-        for w in words:
-            if similar(w, k) >= threshold:
-                return True
-        if similar(t, k) >= threshold:
-            return True
-    return False
-
 # Triggers
 CLOTHES_TERMS = [
     "tenue", "tenues", "vetement", "vêtement", "vêtements", "habit", "habits", "habiys", "veteman",
@@ -121,9 +170,6 @@ SYSTEM_PROMPT = textwrap.dedent(f"""
 Tu es **Betty**, l’assistante du Centre de Danse Delphine Letort.
 Style: chaleureuse, bienveillante, précise, naturelle. **Ne parle jamais d’IA/LLM/OpenAI**.
 
-Infos utiles (résumé):
-{KNOWLEDGE}
-
 Cours:
 - Delphine Letort (DE) : classique (dès 6 ans), street jazz, lyrical jazz.
 - Marie : éveil (dès 3 ans, samedi matin).
@@ -163,17 +209,30 @@ INTENT_MAP = [
     (re.compile(r"\b(galerie|photos?|vid[ée]os?)\b", re.I),
      ("Voir la galerie", "galerie")),
 ]
-def choose_link(user_text: str) -> tuple[str, str] | None:
-    for rgx, (anchor, key) in INTENT_MAP:
-        if rgx.search(user_text):
-            return (anchor, URLS.get(key, URLS["accueil"]))
+# toutes les intentions en une seule regex (un groupe nommé par intention) ;
+# la priorité reste l'ordre de INTENT_MAP, pas la position dans le message
+INTENT_RE = re.compile("|".join(f"(?P<{key}>{rgx.pattern})" for rgx, (_, key) in INTENT_MAP), re.I)
+
+def site_url(urls: dict[str, str], key: str) -> str:
+    return urls.get(key) or urls.get("accueil", "")
+
+def find_intents(user_text: str) -> set[str]:
+    return {next(k for k, v in m.groupdict().items() if v is not None) for m in INTENT_RE.finditer(user_text)}
+
+def choose_link(user_text: str, urls: dict[str, str] = URLS, intents: set[str] | None = None) -> tuple[str, str] | None:
+    found = find_intents(user_text) if intents is None else intents
+    for _, (anchor, key) in INTENT_MAP:
+        if key in found:
+            url = site_url(urls, key)
+            return (anchor, url) if url else None
     return None
 
 # =========================
 # Promo septembre & K-Pop (règles métier)
 # =========================
-def promo_septembre_active() -> bool:
-    return date.today().month == 9
+def promo_active(t: "Tenant") -> bool:
+    # promo du studio (septembre pour le Centre de Danse Delphine Letort), le mois venu
+    return bool(t.promo_month and t.promo_msg) and date.today().month == t.promo_month
 
 PROMO_MSG = (
     "**En septembre : 1 cours d’essai gratuit** par personne (places limitées). "
@@ -181,18 +240,17 @@ PROMO_MSG = (
     "L’essai n’engage pas ; si vous poursuivez, le règlement intérieur s’applique."
 )
 
+OFFER_TERMS = [
+    # essai / offre / période
+    "essai", "essayer", "offre", "septembre", "test", "decouvrir", "essayer un cours",
+    "essai gratuit", "cours d essai",
+    # gratuit — toutes variantes utiles
+    "gratuit", "gratuite", "gratuits", "gratuites", "gratuitement", "free",
+    # chemins usuels qui doivent aussi l’afficher
+    "prix", "tarif", "inscription", "s inscrire"
+]
 def wants_offer(user_text: str) -> bool:
-    msg = norm(user_text)
-    keywords = [
-        # essai / offre / période
-        "essai", "essayer", "offre", "septembre", "test", "decouvrir", "essayer un cours",
-        "essai gratuit", "cours d essai",
-        # gratuit — toutes variantes utiles
-        "gratuit", "gratuite", "gratuits", "gratuites", "gratuitement", "free",
-        # chemins usuels qui doivent aussi l’afficher
-        "prix", "tarif", "inscription", "s inscrire"
-    ]
-    return fuzzy_has(msg, keywords, threshold=0.40)
+    return MessageAnalysis(user_text).offer
 
 KPOP_TERMS = ["kpop", "k-pop", "k pop", "k kick", "kkick", "kpop crew", "groupe kpop"]
 KPOP_REPLY = (
@@ -226,43 +284,97 @@ COURSE_FAST = [
     # “barre au sol” → on ne promet pas un cours non listé, on oriente poliment
     ("barre", "Je vérifie la disponibilité d’un cours de type **barre au sol** au planning."),
 ]
-def quick_course_answer(user_text: str) -> str | None:
-    t = norm(user_text)
-    if not t: return None
 
-    # K-Pop
-    if fuzzy_has(t, KPOP_TERMS, threshold=0.40):
-        return KPOP_REPLY
+AGE_REPLIES = {
+    3: "Dès **3 ans**, l’**éveil** à la danse est animé par Marie le samedi matin.",
+    6: "Dès **6 ans**, on peut commencer la **danse classique** avec Delphine.",
+}
+# les listes sont compilées une seule fois par studio (index inversé de trigrammes) : TenantBundle.keywords
+
+# =========================
+# Analyse du message (une seule fois par requête)
+# =========================
+AGE_RE = re.compile(r"\b(\d{1,2})\s*ans\b")
+
+class MessageAnalysis:
+    """Forme normalisée, trigrammes, intentions et lien contextuel d'un message.
+
+    Calculée une fois en entrée de /chat (ou /chat/stream) puis passée à toutes les étapes.
+    """
+    __slots__ = ("tenant", "text", "normalized", "words", "units", "match", "special", "inscription_fast",
+                 "inscription", "clothes_fast", "clothes", "offer", "course_kw", "age", "intents", "link", "kind",
+                 "follow_up")
+
+    def __init__(self, user_text: str, bundle: "TenantBundle | None" = None):
+        b = bundle or tenant()
+        self.tenant = tn = b.tenant
+        self.text = user_text
+        self.normalized = t = norm(user_text)
+        self.words = t.split()
+        self.units = unit_trigrams(t)
+        self.match = m = b.keywords.scan_units(t, self.units)
+        # seuil 0.40 pour les réponses rapides, 0.45 (défaut) pour les ajouts en fin de réponse
+        self.special = next((rule for rule, _, _ in tn.specials if m.has(f"special:{rule}", threshold=0.40)), None)
+        self.inscription_fast = m.has("inscription", threshold=0.40)
+        self.inscription = m.has("inscription")
+        self.clothes_fast = m.has("clothes", threshold=0.40)
+        self.clothes = m.has("clothes")
+        self.offer = m.has("offer", threshold=0.40)
+        self.course_kw = m.first("course_fast", threshold=0.40)
+        ages = set(map(int, AGE_RE.findall(t)))
+        self.age = next((n for n in tn.age_replies if n in ages), None)  # ordre de AGE_REPLIES (3 ans avant 6 ans)
+        self.intents = find_intents(user_text)
+        self.link = choose_link(user_text, tn.urls, self.intents)
+        # classe de question (routing.py) : palier de modèle et budgets si la réponse vient du modèle
+        topical = bool(self.special or self.inscription or self.clothes or self.offer or self.course_kw
+                       or self.age is not None)
+        self.kind = classify(self.words, user_text.count("?"), len(self.intents), topical)
+        # relance (« et pour les ados ? ») : seule à dépendre de l'historique (conversation.py)
+        self.follow_up = is_follow_up(self.words, topical)
+
+def quick_course_match(a: MessageAnalysis) -> tuple[str, str] | None:
+    """(règle, réponse) de la première réponse rapide applicable, sinon None."""
+    if not a.normalized: return None
+    t = a.tenant
+    urls = t.urls
+
+    # Règles propres au studio (ex. K-Pop)
+    if a.special:
+        return a.special, next(reply for rule, _, reply in t.specials if rule == a.special)
 
     # Inscription → bulle Wix
-    if fuzzy_has(t, INSCRIPTION_TERMS, threshold=0.40):
-        return "💡 Pour vous inscrire rapidement, cliquez sur **la petite bulle bleue en bas à droite**."
+    if a.inscription_fast and t.signup_hint:
+        return "inscription", t.signup_hint
 
-    # Tenues → Petit Rat
-    if fuzzy_has(t, CLOTHES_TERMS, threshold=0.40):
-        return f"{PETIT_RAT_BLURB}\n\n[Découvrir les cours]({URLS['cours']})"
+    # Tenues → boutique (Petit Rat)
+    if a.clothes_fast and t.shop_blurb:
+        return "shop", f"{t.shop_blurb}\n\n[Découvrir les cours]({site_url(urls, 'cours')})"
 
     # Âges clés
-    if re.search(r"\b3\s*ans\b", t):
-        return "Dès **3 ans**, l’**éveil** à la danse est animé par Marie le samedi matin.\n\n[Voir le planning]({})".format(URLS["planning"])
-    if re.search(r"\b6\s*ans\b", t):
-        return "Dès **6 ans**, on peut commencer la **danse classique** avec Delphine.\n\n[Voir le planning]({})".format(URLS["planning"])
+    if a.age is not None:
+        return f"age_{a.age}", f"{t.age_replies[a.age]}\n\n[Voir le planning]({site_url(urls, 'planning')})"
 
     # Mots très courts (synonymes, fautes)
-    for kw, sentence in COURSE_FAST:
-        if fuzzy_has(t, [kw], threshold=0.40):
+    first_kw = a.course_kw
+    for kw, sentence in t.course_fast:
+        if kw == first_kw:
+            rule = f"course:{kw}"
             if kw in ("tarifs",):
-                return f"{sentence}\n\n[Consulter les tarifs]({URLS['tarifs']})"
+                return rule, f"{sentence}\n\n[Consulter les tarifs]({site_url(urls, 'tarifs')})"
             if kw in ("planning", "adresse"):
                 key = "plan" if kw == "adresse" else "planning"
                 anchor = "Plan d’accès" if kw == "adresse" else "Voir le planning"
-                return f"{sentence}\n\n[{anchor}]({URLS[key]})"
+                return rule, f"{sentence}\n\n[{anchor}]({site_url(urls, key)})"
             if kw in ("contact",):
-                return f"{sentence}\n\n[Nous contacter]({URLS['contact']})"
-            return f"{sentence}\n\n[Voir le planning]({URLS['planning']})"
+                return rule, f"{sentence}\n\n[Nous contacter]({site_url(urls, 'contact')})"
+            return rule, f"{sentence}\n\n[Voir le planning]({site_url(urls, 'planning')})"
 
     return None
 
+def quick_course_answer(user_text: str) -> str | None:
+    hit = quick_course_match(MessageAnalysis(user_text))
+    return hit[1] if hit else None
+
 # =========================
 # Helpers de sortie
 # =========================
@@ -277,41 +389,185 @@ def first_clickable_link_only(text: str) -> str:
     out += text[idx:]
     return out
 
-def add_more_prompt(text: str, q_count: int) -> str:
-    """Relance NON systématique : 1 fois sur 3, seulement si la réponse ne finit pas déjà par une question."""
-    if re.search(r"en savoir plus\s*\?", text, re.I):
-        return text
-    if q_count % 3 == 0 and not text.strip().endswith("?"):
-        return f"{text}\n\nSouhaitez-vous en savoir plus ?"
-    return text
-
-def add_petit_rat_if_relevant(text: str, user_text: str) -> str:
-    if fuzzy_has(user_text, CLOTHES_TERMS) and "Petit Rat" not in text:
-        text = f"{text}\n\n{PETIT_RAT_BLURB}"
-    return text
-
 def remove_ai_meta(reply: str) -> str:
     if re.search(r"\b(IA|intelligence artificielle|LLM|OpenAI|mod[eè]le de langage|API)\b", reply, re.I):
         return "Je suis Betty 😊. Je préfère vérifier pour bien vous répondre."
     return reply
 
 WIX_BULLE = "💡 Pour vous inscrire rapidement, cliquez sur **la petite bulle bleue en bas à droite**."
-def bulle_cta(text: str, user_text: str, force: bool = False) -> str:
-    if force or fuzzy_has(user_text, INSCRIPTION_TERMS):
-        if WIX_BULLE not in text:
-            return f"{text}\n\n{WIX_BULLE}"
+MORE_PROMPT = "Souhaitez-vous en savoir plus ?"
+
+# une seule passe sur la réponse : liens markdown (ou mal formés), relance déjà présente
+OUTPUT_RE = re.compile(
+    r"\[(?P<anchor>[^\]]+)\]\((?P<url>https?://[^\s)]+)\)"
+    r"|(?P<loose>\]\(https?://)"
+    r"|(?P<more>(?i:en savoir plus\s*\?))"
+)
+
+def postprocess(text: str, a: MessageAnalysis, q_count: int) -> str:
+    """Étapes 2 à 6 en une passe : boutique, lien contextuel, 1 lien max, relance, bulle Wix."""
+    t = a.tenant
+    # 2) Boutique (Petit Rat) si on parle tenues/chaussures/boutique
+    if a.clothes and t.shop_blurb and t.shop_name not in text:
+        text = f"{text}\n\n{t.shop_blurb}"
+
+    parts, idx, links, has_link, has_more = [], 0, 0, False, False
+    for m in OUTPUT_RE.finditer(text):
+        if m.group("more"):
+            has_more = True
+            continue
+        has_link = True
+        if m.group("loose"):
+            continue
+        links += 1
+        if links > 1:
+            # 4) Un seul lien max : on garde l'ancre, on retire l'URL
+            parts.append(text[idx:m.start()])
+            parts.append(m.group("anchor"))
+            idx = m.end()
+    if idx:
+        parts.append(text[idx:])
+        text = "".join(parts)
+
+    # 3) Lien contextuel (si aucun lien et intention détectée)
+    if not has_link and a.link:
+        anchor, url = a.link
+        text = f"{text}\n\n[{anchor}]({url})"
+
+    # 5) Relance NON systématique : 1 fois sur 3, si la réponse ne finit pas déjà par une question
+    if not has_more and q_count % 3 == 0 and not text.strip().endswith("?"):
+        text = f"{text}\n\n{MORE_PROMPT}"
+
+    # 6) Bulle Wix (immédiate si inscription; rappel toutes les 2 questions)
+    if t.signup_hint and (a.inscription or q_count % 2 == 0) and t.signup_hint not in text:
+        text = f"{text}\n\n{t.signup_hint}"
     return text
 
+# =========================
+# Studios (tenants.py) : le Centre de Danse Delphine Letort par défaut, les autres dans TENANTS_DIR
+# =========================
+FAQ_ONLY_MSG = ("Je ne peux répondre qu’aux questions les plus fréquentes pour le moment 🙏 "
+                "Pour le reste, écrivez-nous à contactdelphineletort@gmail.com ou appelez le 06 63 11 15 75.")
+
+DEFAULT_TENANT = Tenant(
+    id=os.getenv("DEFAULT_TENANT", "delphine-letort"),
+    name="Centre de Danse Delphine Letort",
+    assistant="Betty",
+    urls=URLS,
+    persona=SYSTEM_PROMPT,
+    course_fast=COURSE_FAST,
+    specials=[("kpop", KPOP_TERMS, KPOP_REPLY)],
+    inscription_terms=INSCRIPTION_TERMS,
+    clothes_terms=CLOTHES_TERMS,
+    shop_name="Petit Rat",
+    shop_blurb=PETIT_RAT_BLURB,
+    offer_terms=OFFER_TERMS,
+    promo_month=9,
+    promo_msg=PROMO_MSG,
+    age_replies=AGE_REPLIES,
+    signup_hint=WIX_BULLE,
+    faq_only_msg=FAQ_ONLY_MSG,
+    avatar="images/betty_pirouette.gif",
+    kb_folders=KB_FOLDERS,
+    faq_path=FAQ_PATH,
+)
+
+def build_bundle(t: Tenant) -> TenantBundle:
+    # appelé au 1er message pour ce studio (ou par init_components pour le studio par défaut)
+    b = TenantBundle(t, load_knowledge(t), PROMPT_BUDGET_OPTIONS)
+    # réponses calculées avec l'ancienne base : plus jamais relues, autant libérer la place
+    b.live.on_swap.append(lambda old, new: RESPONSE_CACHE.invalidate(prefix=f"{prompt_version(b, old)}:"))
+    return b
+
+TENANTS = TenantRegistry(
+    DEFAULT_TENANT, build_bundle,
+    directory=os.getenv("TENANTS_DIR", "tenants"),
+    max_bundles=int(os.getenv("TENANT_MAX_LOADED", 8)),
+    max_bytes=int(float(os.getenv("TENANT_MAX_MB", 256)) * 1024 * 1024),
+    idle_ttl=float(os.getenv("TENANT_IDLE_TTL", 1800)),
+)
+
+def request_tenant() -> Tenant:
+    """Configuration du studio de la requête : paramètre `tenant` du widget, sinon nom d'hôte."""
+    requested = request.args.get("tenant", "")
+    if not requested and request.is_json:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict) and isinstance(payload.get("tenant"), str):
+            requested = payload["tenant"]
+    return TENANTS.resolve(request.host, requested)
+
+def tenant() -> TenantBundle:
+    """Studio compilé de la requête (chargé au besoin) ; studio par défaut hors requête."""
+    if not has_request_context():
+        return TENANTS.get(DEFAULT_TENANT.id)
+    if "tenant" not in g:
+        g.tenant = TENANTS.get(request_tenant().id)
+    return g.tenant
+
 # =========================
 # Flask
 # =========================
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.secret_key = os.getenv("FLASK_SECRET", "change-me-please")
 
+# =========================
+# Widget : coquille HTML préconstruite + ressources versionnées (static_assets.py)
+# =========================
+WIDGET_MAX_AGE = int(os.getenv("WIDGET_MAX_AGE", 300))  # la coquille est revalidée (ETag) au-delà
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+def widget_shell(t: Tenant):
+    """Coquille du widget d'un studio, rendue une seule fois : le template ne dépend pas de la requête
+    (la session démarre au 1er /chat)."""
+    name = f"widget/{t.id}.html"
+    asset = ASSETS.get(name)
+    if asset is None:
+        html = app.jinja_env.get_template("widget.html").render(
+            asset_url=ASSETS.url, tenant=t.id, assistant=t.assistant, studio=t.name,
+            avatar=t.avatar or DEFAULT_TENANT.avatar)
+        asset = ASSETS.add(name, html.encode("utf-8"), "text/html; charset=utf-8")
+    return asset
+
+with STARTUP.step("widget (précompression)"):
+    ASSETS = AssetStore(app.static_folder)
+    widget_shell(DEFAULT_TENANT)
+
+def send_asset(asset, max_age: int, immutable: bool = False) -> Response:
+    enc, body, etag = asset.pick(request.headers.get("Accept-Encoding", ""))
+    resp = Response(body, content_type=asset.content_type)
+    if enc:
+        resp.headers["Content-Encoding"] = enc
+    resp.vary.add("Accept-Encoding")
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = max_age
+    if immutable:
+        resp.cache_control.immutable = True
+    return resp.make_conditional(request)  # If-None-Match identique → 304 sans corps
+
 @app.route("/")
 def home():
-    session["q_count"] = 0
-    return render_template("widget.html")
+    return send_asset(widget_shell(request_tenant()), WIDGET_MAX_AGE)
+
+@app.route("/assets/<version>/<path:name>")
+def asset(version: str, name: str):
+    a = ASSETS.get(name)
+    if a is None:
+        return "Not Found", 404
+    if version != a.digest:
+        return send_asset(a, 0)  # ancienne version demandée : contenu actuel, sans cache long
+    return send_asset(a, ASSET_MAX_AGE, immutable=True)
+
+def start_visit(payload: dict) -> None:
+    """1er message de la page (`new_visit` envoyé par le widget) → nouvelle conversation.
+
+    Fait ici plutôt que dans home(), dont la réponse reste ainsi identique pour tous (sans cookie).
+    """
+    tid = request_tenant().id  # même cookie pour deux studios servis par le même hôte : conversations séparées
+    if payload.get("new_visit") or "sid" not in session or session.get("tenant") != tid:
+        session["q_count"] = 0
+        session["sid"] = uuid.uuid4().hex
+        session["tenant"] = tid
 
 def extract_user_text(payload: dict) -> str:
     for k in ("message","text","content","prompt","msg","q","question"):
@@ -320,78 +576,963 @@ def extract_user_text(payload: dict) -> str:
             return v.strip()
     return ""
 
-def call_model(user_text: str) -> str:
-    resp = openai.ChatCompletion.create(
-        model=MODEL_ID,
-        temperature=0.35,
-        max_tokens=600,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_text},
-        ],
+# =========================
+# Prompt sous budget de tokens (prompt_budget.py)
+# =========================
+PROMPT_BUDGET_OPTIONS = dict(  # PromptBudget de chaque studio (persona propre, mêmes plafonds)
+    max_prompt=int(os.getenv("PROMPT_MAX_TOKENS", 1500)),
+    max_knowledge=int(os.getenv("PROMPT_KNOWLEDGE_TOKENS", 500)),
+    max_user=int(os.getenv("PROMPT_USER_TOKENS", 300)),
+    max_history=int(os.getenv("PROMPT_HISTORY_TOKENS", 400)),
+)
+MAX_COMPLETION_TOKENS = int(os.getenv("MAX_COMPLETION_TOKENS", 600))
+TOKENS = TokenLedger()
+
+# =========================
+# Routage par classe de question (routing.py) : palier de modèle, max_tokens, passages de la base
+# =========================
+# classes absentes ou champs omis : palier supérieur, budgets historiques (MAX_COMPLETION_TOKENS, KB_TOP_K)
+ROUTE_DEFAULTS = dict(tier="large", max_tokens=MAX_COMPLETION_TOKENS, top_k=KB_TOP_K, temperature=0.35)
+ROUTES, ROUTE_STATS = routes_from_env(MODEL_ID, ROUTE_DEFAULTS)
+ROUTE_SECONDS = METRICS.histogram("route_model_seconds", "Durée des appels modèle par classe de question")
+ROUTE_TOKENS = METRICS.counter("route_tokens_total", "Tokens amont par classe de question (prompt, completion)")
+
+def route_for(a: "MessageAnalysis") -> Route:
+    return ROUTES[a.kind]
+
+def account_route(route: Route, entry: dict) -> None:
+    """Latence, tokens et coût de l'appel, rangés sous la classe de la question."""
+    ROUTE_SECONDS.observe(entry["latency_s"], route=route.name)
+    ROUTE_TOKENS.inc(entry["prompt_tokens"], route=route.name, kind="prompt")
+    ROUTE_TOKENS.inc(entry["completion_tokens"], route=route.name, kind="completion")
+    ROUTE_STATS.record(route, entry["latency_s"], entry["prompt_tokens"], entry["completion_tokens"])
+    trace()["route"] = route.name
+
+def build_prompt(user_text: str, convo: Conversation | None = None, route: Route | None = None) -> PromptPlan:
+    # persona fixe d'abord (préfixe identique à chaque requête), l'historique, puis les passages utiles
+    convo = convo or Conversation()
+    route = route or ROUTES["open"]
+    query = user_text
+    if convo.turns:
+        # relance courte (« et pour les ados ? ») : on cherche aussi avec la question précédente
+        query = f"{convo.turns[-1]['user']} {user_text}"
+    return tenant().prompt.build(user_text, knowledge=knowledge().index.blocks(query, k=route.top_k),
+                               context=route.hint, history=convo.messages(), summary=convo.summary)
+
+# =========================
+# Mémoire de conversation (conversation.py) : derniers échanges + résumé, par session
+# =========================
+with STARTUP.step("conversations (SQLite)"):
+    CONVERSATIONS = ConversationStore(
+        path=os.getenv("CONVERSATION_PATH", "instance/conversations.sqlite3"),  # vide → mémoire du worker
+        ttl=float(os.getenv("CONVERSATION_TTL", 1800)),
+        max_sessions=int(os.getenv("CONVERSATION_MAX_SESSIONS", 2000)),
+        keep_turns=int(os.getenv("CONVERSATION_TURNS", 4)),
+        summary_chars=int(os.getenv("CONVERSATION_SUMMARY_CHARS", 600)),
+    )
+
+def session_id() -> str:
+    sid = session.get("sid")
+    if not sid:
+        sid = session["sid"] = uuid.uuid4().hex
+    return sid
+
+# =========================
+# Cache des réponses modèle (partagé entre workers via SQLite)
+# =========================
+def prompt_version(b: TenantBundle, kb: "Knowledge") -> str:
+    # deux studios au même persona et à la même base partagent leurs réponses (elles seraient identiques)
+    return kb.derive("prompt_version", lambda kb: hashlib.sha1(
+        f"{MODEL_ID}\n{b.tenant.persona}\n{kb.index.signature}\n{b.prompt.signature}".encode("utf-8")
+    ).hexdigest()[:12])
+
+with STARTUP.step("cache de réponses (SQLite)"):
+    RESPONSE_CACHE = ResponseCache(
+        path=os.getenv("RESPONSE_CACHE_PATH", "instance/response_cache.sqlite3"),
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", 6 * 3600)),
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX", 2000)),
+        near_threshold=float(os.getenv("RESPONSE_CACHE_NEAR", 0)),  # ex. 0.85 pour activer (petit cache)
+        near_candidates=int(os.getenv("RESPONSE_CACHE_NEAR_CANDIDATES", 500)),
     )
-    return resp["choices"][0]["message"]["content"].strip()
+
+def cache_namespace(route: Route | None = None) -> str:
+    # la réponse dépend du prompt (persona + modèle + version de la base), de la promo en cours
+    # et de la route (modèle, budgets, consigne de longueur)
+    b = tenant()
+    route_id = hashlib.sha1((route or ROUTES["open"]).signature.encode("utf-8")).hexdigest()[:8]
+    return f"{prompt_version(b, knowledge())}:promo={int(promo_active(b.tenant))}:route={route_id}"
+
+def ask_model(user_text: str, convo: Conversation | None = None, route: Route | None = None) -> str:
+    BUDGET.check()
+    route = route or ROUTES["open"]
+    plan = build_prompt(user_text, convo, route)
+    try:
+        res = LLM.chat(plan.messages, route.model, temperature=route.temperature, max_tokens=route.max_tokens)
+    except ProviderError as e:
+        UPSTREAM_ERRORS.inc(status=e.status or "network")
+        raise
+    entry = TOKENS.record(plan, res.text, res.usage, latency=res.latency, provider=res.provider)
+    account_tokens(entry)
+    account_route(route, entry)
+    return res.text
+
+# =========================
+# Limites de débit par client (session + IP) et budget quotidien amont (ratelimit.py)
+# =========================
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "instance/ratelimit.sqlite3")  # vide → par worker
+RATE_IP_FACTOR = float(os.getenv("RATE_IP_FACTOR", 4))  # plusieurs visiteurs derrière une même IP (box, 4G)
+
+def make_limiters(kind: str, per_min: float, burst: float) -> tuple[RateLimiter, RateLimiter]:
+    return (RateLimiter(kind, per_min / 60, burst, RATE_LIMIT_PATH),
+            RateLimiter(f"{kind}_ip", per_min * RATE_IP_FACTOR / 60, burst * RATE_IP_FACTOR, RATE_LIMIT_PATH))
+
+with STARTUP.step("limites de débit (SQLite)"):
+    RATE_LIMITS = {
+        # chaque message (réponse rapide comprise)
+        "fast": make_limiters("fast", float(os.getenv("RATE_FAST_PER_MIN", 30)), float(os.getenv("RATE_FAST_BURST", 15))),
+        # messages qui demandent une réponse modèle (cache compris)
+        "model": make_limiters("model", float(os.getenv("RATE_MODEL_PER_MIN", 6)), float(os.getenv("RATE_MODEL_BURST", 5))),
+    }
+    BUDGET = DailyBudget(
+        max_calls=int(os.getenv("DAILY_MAX_CALLS", 0)),    # 0 → illimité
+        max_tokens=int(os.getenv("DAILY_MAX_TOKENS", 0)),  # 0 → illimité
+        path=RATE_LIMIT_PATH,
+    )
+PROXY_HOPS = int(os.getenv("PROXY_HOPS", 1))  # proxys de confiance devant l'appli (Render : 1)
+
+RATE_LIMIT_MSG = ("Doucement 😊 vous m’écrivez un peu vite ! Laissez-moi quelques secondes, "
+                  "puis reposez votre question.")
+FAQ_ONLY_CONFIDENCE = float(os.getenv("FAQ_ONLY_CONFIDENCE", 0.5))
+
+def client_ip() -> str:
+    route = request.access_route  # X-Forwarded-For (le plus proche en dernier), sinon adresse directe
+    return route[-PROXY_HOPS] if len(route) >= PROXY_HOPS else route[0]
+
+def rate_limit(kind: str, sid: str, ip: str) -> None:
+    """RateLimited si la session ou l'IP a épuisé ses jetons pour ce type de réponse."""
+    by_session, by_ip = RATE_LIMITS[kind]
+    by_session.check(f"sid:{sid}")
+    by_ip.check(f"ip:{ip}")
+
+def account_tokens(entry: dict) -> None:
+    """Budget du jour + tokens de la requête en cours (journal des échanges)."""
+    BUDGET.spend(calls=1, tokens=entry["prompt_tokens"] + entry["completion_tokens"])
+    tokens = trace().setdefault("tokens", {"prompt": 0, "completion": 0, "cached": 0})
+    tokens["prompt"] += entry["prompt_tokens"]
+    tokens["completion"] += entry["completion_tokens"]
+    tokens["cached"] += entry["cached_tokens"]
+
+def account_discarded(res) -> None:
+    """Réponse perdante d'un hedge : facturée, donc comptée dans le budget du jour."""
+    BUDGET.spend(calls=1, tokens=TOKENS.record_discarded(res.text, res.usage))
+
+def faq_only_reply(a: MessageAnalysis) -> str:
+    """Budget du jour épuisé : meilleure entrée de la FAQ si elle est plausible, sinon renvoi vers le contact."""
+    replied("faq_only")
+    m = knowledge().faq.match(a.text)
+    if m and m.confidence >= FAQ_ONLY_CONFIDENCE:
+        return m.answer
+    return a.tenant.faq_only_msg or FAQ_ONLY_MSG
+
+# =========================
+# Concurrence : appels modèle bornés par worker, file d'attente limitée
+# =========================
+MODEL_GATE = ConcurrencyGate(
+    max_active=int(os.getenv("MODEL_MAX_CONCURRENCY", 4)),
+    max_waiting=int(os.getenv("MODEL_MAX_WAITING", 8)),
+    wait_timeout=float(os.getenv("MODEL_WAIT_TIMEOUT", 10)),
+)
+BUSY_MSG = "Je suis très sollicitée en ce moment 😅 Réessayez dans quelques secondes, s’il vous plaît !"
+
+# =========================
+# Single-flight : questions identiques en vol → un seul appel amont partagé
+# =========================
+SINGLE_FLIGHT = SingleFlight(
+    lease_path=os.getenv("SINGLEFLIGHT_LEASE_PATH", ""),  # ex. instance/singleflight.sqlite3 (multi-workers)
+    wait_timeout=float(os.getenv("SINGLEFLIGHT_WAIT", 60)),
+)
+
+def flight_key(user_text: str, ns: str) -> str:
+    return cache_key(norm(user_text), ns)
+
+# =========================
+# Délai de réponse (deadline.py) : modèle trop lent → réponse locale, l'appel finit en arrière-plan
+# =========================
+REPLY_DEADLINE_S = float(os.getenv("REPLY_DEADLINE_S", 8))  # 0 → on attend le modèle
+FALLBACK_SNIPPET_MIN_SCORE = float(os.getenv("FALLBACK_SNIPPET_MIN_SCORE", 4.0))  # score BM25 du passage
+DEADLINE_EVENTS = METRICS.counter("deadline_events_total",
+                                  "Délai de réponse : à l'heure, dépassements, saturation, fins tardives")
+FALLBACKS = METRICS.counter("fallback_replies_total", "Réponses locales servies après un dépassement, par type")
+DEADLINE = Deadline(
+    max_background=int(os.getenv("DEADLINE_MAX_BACKGROUND", 16)),  # appels modèle orphelins au plus
+    on_event=lambda event: DEADLINE_EVENTS.inc(event=event),
+)
+
+HOLDING_MSG = ("Je vérifie cette information pour vous répondre précisément 🙏 "
+               "Reposez-moi la question dans un instant, la réponse sera prête.")
+LINK_HOLDING_MSG = "Je vérifie cette information 🙏 En attendant, vous trouverez sûrement la réponse ici :"
+SNIPPET_INTRO = "Voici ce que j’ai trouvé à ce sujet :"
+
+def request_deadline() -> float | None:
+    return time.monotonic() + REPLY_DEADLINE_S if REPLY_DEADLINE_S > 0 else None
+
+def remaining(deadline: float | None) -> float | None:
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+def within_deadline(fn, deadline: float | None):
+    """`fn()` avant `deadline` ; le contexte de la requête (studio, base, trace) suit dans le thread."""
+    if deadline is None:
+        return fn()
+    ctx = contextvars.copy_context()
+    return DEADLINE.run(lambda: ctx.run(fn), deadline - time.monotonic())
+
+def acquire_gate(deadline: float | None) -> None:
+    """Place dans MODEL_GATE, attendue au plus jusqu'à `deadline` (sinon DeadlineExceeded)."""
+    left = remaining(deadline)
+    bounded = left is not None and left < MODEL_GATE.wait_timeout
+    try:
+        MODEL_GATE.acquire(timeout=left if bounded else None)
+    except GateTimeout:
+        if not bounded:
+            raise
+        DEADLINE.expire()
+        raise DeadlineExceeded("pas de place dans MODEL_GATE avant le délai") from None
+
+def gated_call(fn, deadline: float | None):
+    """`fn()` avec une place dans MODEL_GATE, avant `deadline`.
+
+    La place est attendue dans le thread de la requête (au plus jusqu'au délai), puis seul
+    l'appel passe dans un thread de DEADLINE ; la place est rendue à la fin de l'appel,
+    même s'il se termine en arrière-plan.
+    """
+    acquire_gate(deadline)
+
+    def run():
+        try:
+            return fn()
+        finally:
+            MODEL_GATE.release()
+
+    try:
+        return within_deadline(run, deadline)
+    except DeadlineSaturated:
+        MODEL_GATE.release()  # `run` n'a pas été lancée
+        raise
+
+def first_within_deadline(gen, deadline: float | None, on_late):
+    """1er fragment du flux `gen` avant `deadline`.
+
+    Dépassé : DeadlineExceeded, et `on_late(fragment, erreur)` termine le flux dans le thread
+    de l'appel (DEADLINE), comme call_model. DeadlineSaturated : `gen` n'a pas été lancé.
+    """
+    lock = threading.Lock()
+    state = {"late": False, "done": False, "first": "", "error": None}
+
+    def pull() -> str:
+        first, error = "", None
+        try:
+            first = next(gen, "")
+        except Exception as e:
+            error = e
+        with lock:
+            state.update(done=True, first=first, error=error)
+            late = state["late"]
+        if late:
+            on_late(first, error)
+        if error is not None:
+            raise error
+        return first
+
+    try:
+        return within_deadline(pull, deadline)
+    except DeadlineSaturated:
+        raise
+    except DeadlineExceeded:
+        with lock:
+            if not state["done"]:
+                state["late"] = True
+                raise
+    if state["error"] is not None:  # terminé entre le dépassement et le verrou
+        raise state["error"]
+    return state["first"]
+
+def excerpt(text: str, limit: int = 400) -> str:
+    """Début d'un passage, coupé à la dernière phrase complète."""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    return cut[:end + 1] if end > limit // 2 else cut.rsplit(" ", 1)[0] + "…"
+
+def degraded_reply(a: MessageAnalysis) -> str:
+    """Modèle hors délai : FAQ plausible, sinon passage de la base, sinon lien d'intention, sinon attente."""
+    replied("degraded")
+    kb = knowledge()
+    m = kb.faq.match(a.text)
+    hits = kb.index.search(a.text, k=1)
+    if m and m.confidence >= FAQ_ONLY_CONFIDENCE and m.score >= kb.faq.min_score:
+        kind, reply = "faq", m.answer
+    elif hits and hits[0][0] >= FALLBACK_SNIPPET_MIN_SCORE:
+        kind, reply = "snippet", f"{SNIPPET_INTRO}\n\n{excerpt(hits[0][1]['text'])}"
+    elif a.link:
+        anchor, url = a.link
+        kind, reply = "link", f"{a.tenant.link_holding_msg or LINK_HOLDING_MSG}\n\n[{anchor}]({url})"
+    else:
+        kind, reply = "holding", a.tenant.holding_msg or HOLDING_MSG
+    FALLBACKS.inc(kind=kind)
+    trace()["fallback"] = kind
+    return reply
+
+def call_model(user_text: str, convo: Conversation | None = None, info: dict | None = None,
+               deadline: float | None = None, route: Route | None = None) -> str:
+    """Réponse modèle brute (cache, regroupement, puis appel) ; `info["source"]` dit d'où elle vient.
+
+    `deadline` (time.monotonic()) : au-delà, DeadlineExceeded et l'appel se termine en arrière-plan.
+    `route` : palier et budgets de la classe de question (routing.py).
+    """
+    info = {} if info is None else info
+    if convo is not None and not convo.empty:
+        # relance : la réponse dépend de l'historique, ni cache partagé ni regroupement
+        with stage("model"):
+            reply = gated_call(lambda: ask_model(user_text, convo, route), deadline)
+        replied("model")
+        info["source"] = "model"
+        return reply
+
+    ns = cache_namespace(route)
+    with stage("cache"):
+        cached = RESPONSE_CACHE.get(user_text, ns)
+    if cached is not None:
+        replied("cache")
+        info["source"] = "cache"
+        return cached
+
+    def fetch() -> str:
+        t0 = time.monotonic()
+        reply = ask_model(user_text, route=route)
+        RESPONSE_CACHE.put(user_text, ns, reply, latency=time.monotonic() - t0)
+        return reply
+
+    # seul le meneur appelle (place MODEL_GATE, puis thread DEADLINE) ; délai dépassé, fetch()
+    # continue, met la réponse en cache et la publie aux suiveurs, qui l'attendent jusqu'à leur
+    # propre délai sans occuper de thread
+    with stage("model"):
+        try:
+            reply = SINGLE_FLIGHT.do(
+                flight_key(user_text, ns), fetch,
+                lookup=lambda: RESPONSE_CACHE.get(user_text, ns, record=False),
+                timeout=remaining(deadline),
+                runner=lambda job: gated_call(job, deadline),
+            )
+        except FlightTimeout:
+            DEADLINE.expire()
+            raise DeadlineExceeded("pas de réponse partagée avant le délai") from None
+    replied("model")
+    info["source"] = "model"
+    return reply
+
+def stream_model(user_text: str, convo: Conversation | None = None, route: Route | None = None):
+    """Même appel que call_model, mais renvoie les fragments (deltas) au fil de l'eau."""
+    BUDGET.check()
+    route = route or ROUTES["open"]
+    plan = build_prompt(user_text, convo, route)
+    info: dict = {}
+    t0 = time.monotonic()
+    ttft, text = None, ""
+    try:
+        for delta in LLM.stream(plan.messages, route.model, temperature=route.temperature,
+                                max_tokens=route.max_tokens, info=info):
+            if ttft is None:
+                ttft = time.monotonic() - t0
+            text += delta
+            yield delta
+    except ProviderError as e:
+        UPSTREAM_ERRORS.inc(status=e.status or "network")
+        raise
+    finally:
+        # aussi quand le flux est interrompu (méta IA, client parti) : les tokens sont consommés
+        if "provider" in info:
+            entry = TOKENS.record(plan, text, info.get("usage"), latency=time.monotonic() - t0,
+                                  ttft=ttft, provider=info["provider"])
+            account_tokens(entry)
+            account_route(route, entry)
+
+# =========================
+# Pipeline /chat (partagé entre réponse JSON et streaming)
+# =========================
+def fast_reply(a: MessageAnalysis, info: dict | None = None) -> str | None:
+    """Étape 0 : réponses rapides + promo septembre (sans appel modèle) ; règle retenue dans `info["rule"]`."""
+    info = {} if info is None else info
+    # 0) Réponses rapides (mots courts, typos, synonymes) — inclut K-Pop
+    with stage("quick_answer"):
+        hit = quick_course_match(a)
+    reply = None
+    if hit:
+        rule, reply = hit
+        FAST_HITS.inc(rule=rule)
+        info["rule"] = rule
+    else:
+        # 0.a) FAQ : entrée reconnue avec assez de confiance → sa réponse telle quelle
+        with stage("faq"):
+            faq = knowledge().faq.answer(a.text)
+        if faq:
+            reply = faq.answer
+            FAST_HITS.inc(rule="faq")
+            info["rule"] = "faq"
+
+    # 0.b) Promo septembre — insertion proactive même si quick_course_answer a répondu
+    with stage("promo"):
+        promo = a.tenant.promo_msg
+        if promo_active(a.tenant) and a.offer:
+            if reply:
+                if promo not in reply:
+                    reply = f"{promo}\n\n{reply}"
+            else:
+                reply = promo
+                FAST_HITS.inc(rule="promo")
+                info["rule"] = "promo"
+    if reply is not None:
+        replied("fast")
+        info["source"] = "fast"
+    return reply
+
+def promo_prefix(a: MessageAnalysis) -> str:
+    """Préfixe promo à placer devant une réponse modèle (vide si non pertinent)."""
+    if promo_active(a.tenant) and a.offer:
+        return f"{a.tenant.promo_msg}\n\n"
+    return ""
+
+def fix_model_reply(reply: str, a: MessageAnalysis) -> str:
+    """Étape 1 : nettoyage d'une réponse modèle complète."""
+    reply = remove_ai_meta(reply)
+    # 1.b) Promo septembre — post-traitement si pas déjà présente
+    if not a.tenant.promo_msg or a.tenant.promo_msg not in reply:
+        reply = promo_prefix(a) + reply
+    return reply
+
+def finalize_reply(reply: str, a: MessageAnalysis, q: int) -> str:
+    """Étapes 2 à 6 : appliquées en fin de réponse (JSON ou stream)."""
+    with stage("postprocess"):
+        reply = postprocess(reply, a, q)
+    trace()["reply_chars"] = len(reply)
+    return reply
+
+def answer_message(user_text: str, q: int, sid: str = "", before_model=None, info: dict | None = None,
+                   deadline: float | None = None) -> str:
+    """Pipeline complet de /chat hors HTTP (aussi utilisé par batch_answer.py).
+
+    `before_model()` est appelé avant toute réponse modèle (cache compris) : limite de débit
+    de /chat, cadence du traitement par lots. `info` reçoit l'origine (`source`, `rule`) ;
+    par défaut, la trace de la requête. `deadline` : voir call_model (None → pas de délai).
+    """
+    info = trace() if info is None else info
+    with stage("total"):
+        with stage("analyze"):
+            a = MessageAnalysis(user_text)
+        reply = fast_reply(a, info)
+        if reply is None:
+            # 1) Réponse modèle (avec l'historique de la session pour une relance)
+            if before_model:
+                before_model()
+            # question autonome : sans l'historique, donc cache et regroupement partagés entre sessions
+            convo = CONVERSATIONS.get(sid) if a.follow_up else None
+            try:
+                reply = fix_model_reply(call_model(user_text, convo, info, deadline, route_for(a)), a)
+            except BudgetExhausted:
+                reply = faq_only_reply(a)
+                info["source"] = "faq_only"
+            except DeadlineExceeded:
+                reply = fix_model_reply(degraded_reply(a), a)
+                info["source"] = "degraded"
+        CONVERSATIONS.append(sid, user_text, reply)
+        return finalize_reply(reply, a, q)
+
+def next_question_count() -> int:
+    # compteur questions → sert aux relances/nudges
+    q = int(session.get("q_count", 0)) + 1
+    session["q_count"] = q
+    return q
+
+# =========================
+# Journal des échanges (chatlog.py) : JSONL par worker, écrit en arrière-plan
+# =========================
+CHAT_LOG = ChatLog(
+    os.getenv("CHAT_LOG_DIR", "instance/chatlog"),  # vide → pas de journal
+    max_bytes=int(float(os.getenv("CHAT_LOG_MAX_MB", 50)) * 1024 * 1024),
+    compress=os.getenv("CHAT_LOG_GZIP", "1") != "0",
+    queue_size=int(os.getenv("CHAT_LOG_QUEUE", 10000)),
+    fsync_interval=float(os.getenv("CHAT_LOG_FSYNC_S", 5)),
+)
+
+def log_exchange() -> None:
+    """Met en file l'échange de la requête en cours (rien si le message était vide)."""
+    t = trace()
+    if "text" not in t or not CHAT_LOG.enabled:
+        return
+    CHAT_LOG.log({
+        "ts": round(time.time(), 3),
+        "tenant": request_tenant().id,
+        "sid": t["sid"],
+        "q": t["q"],
+        "text": norm(t["text"]),
+        "source": t.get("source"),
+        "rule": t.get("rule"),
+        "fallback": t.get("fallback"),
+        "route": t.get("route"),
+        # copies : un appel modèle hors délai peut encore compléter la trace en arrière-plan
+        "stages": dict(t.get("stages", {})),
+        "tokens": dict(t["tokens"]) if "tokens" in t else None,
+        "reply_chars": t.get("reply_chars"),
+    })
 
 @app.route("/chat", methods=["POST"])
 def chat():
+    deadline = request_deadline()  # depuis l'arrivée de la requête
     try:
         data = request.get_json(force=True) or {}
         user_text = extract_user_text(data)
         if not user_text:
             return jsonify({"error":"Message manquant"}), 400
 
-        # compteur questions → sert aux relances/nudges
-        q = int(session.get("q_count", 0)) + 1
-        session["q_count"] = q
+        start_visit(data)
+        q = next_question_count()
+        sid, ip = session_id(), client_ip()
+        trace().update(sid=sid, q=q, text=user_text)
+        rate_limit("fast", sid, ip)
+        reply = answer_message(user_text, q, sid, before_model=lambda: rate_limit("model", sid, ip),
+                               deadline=deadline)
+        return jsonify({"reply": reply})
+    except RateLimited as e:
+        return rate_limited_response(e)
+    except Overloaded:
+        replied("busy")
+        return jsonify({"reply": request_tenant().busy_msg or BUSY_MSG, "busy": True}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        replied("error")
+        report_error("chat", e)
+        return jsonify({"error": ERROR_MSG}), 500
+    finally:
+        log_exchange()
 
-        # 0) Réponses rapides (mots courts, typos, synonymes) — inclut K-Pop
-        reply = quick_course_answer(user_text)
+ERROR_MSG = "Désolée, je rencontre un souci pour répondre. N’hésitez pas à réessayer bientôt."
 
-        # 0.b) Promo septembre — insertion proactive même si quick_course_answer a répondu
-        if promo_septembre_active() and wants_offer(user_text):
-            if reply:
-                if PROMO_MSG not in reply:
-                    reply = f"{PROMO_MSG}\n\n{reply}"
-            else:
-                reply = PROMO_MSG
+def report_error(where: str, e: Exception) -> None:
+    # détail dans les logs du serveur seulement : le visiteur reçoit ERROR_MSG
+    print(f"[{where}] {type(e).__name__}: {e}", file=sys.stderr, flush=True)
 
-        if reply is None:
-            # 1) Réponse modèle
-            reply = call_model(user_text)
-            reply = remove_ai_meta(reply)
+def rate_limited_response(e: RateLimited):
+    replied("limited")
+    return (jsonify({"reply": request_tenant().rate_limit_msg or RATE_LIMIT_MSG, "limited": True}), 429,
+            {"Retry-After": str(max(1, round(e.retry_after)))})
 
-            # 1.b) Promo septembre — post-traitement si pas déjà présente
-            if promo_septembre_active() and wants_offer(user_text) and PROMO_MSG not in reply:
-                reply = f"{PROMO_MSG}\n\n{reply}"
+# =========================
+# Streaming (Server-Sent Events)
+# =========================
+MD_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
 
-        # 2) Petit Rat si on parle tenues/chaussures/boutique
-        reply = add_petit_rat_if_relevant(reply, user_text)
+def stream_safe_len(text: str) -> int:
+    """Longueur diffusable sans couper un lien markdown en cours d'écriture."""
+    i = text.rfind("[")
+    if i == -1 or MD_LINK_RE.match(text, i):
+        return len(text)
+    return i
 
-        # 3) Lien contextuel (si aucun lien et intention détectée)
-        if not re.search(r"\]\(https?://", reply):
-            anchor_url = choose_link(user_text)
-            if anchor_url:
-                anchor, url = anchor_url
-                reply = f"{reply}\n\n[{anchor}]({url})"
+def sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
-        # 4) Un seul lien max
-        reply = first_clickable_link_only(reply)
+def stream_reply_events(a: MessageAnalysis, q: int, sid: str = "", ip: str = "",
+                        deadline: float | None = None):
+    """Génère les événements SSE : `delta` (texte partiel) puis `done` (réponse finale).
 
-        # 5) Relance non systématique
-        reply = add_more_prompt(reply, q)
+    Les deltas sont déjà filtrés (1 seul lien cliquable, pas de lien coupé) ;
+    les étapes de fin (Petit Rat, lien contextuel, relance, bulle) sont
+    appliquées sur le texte complet et envoyées dans `done`, qui remplace la bulle.
+    `deadline` : comme call_model, pour le 1er fragment ; dépassé → réponse locale (degraded_reply).
+    """
+    user_text = a.text
+    reply = fast_reply(a, trace())
+    if reply is not None:
+        CONVERSATIONS.append(sid, user_text, reply)
+        yield sse("done", {"reply": finalize_reply(reply, a, q)})
+        return
 
-        # 6) Bulle Wix (immédiate si inscription; rappel toutes les 2 questions)
-        reply = bulle_cta(reply, user_text, force=fuzzy_has(user_text, INSCRIPTION_TERMS))
-        if q % 2 == 0:
-            reply = bulle_cta(reply, user_text, force=True)
+    try:
+        rate_limit("model", sid, ip)
+    except RateLimited:
+        replied("limited")
+        yield sse("done", {"reply": a.tenant.rate_limit_msg or RATE_LIMIT_MSG, "limited": True})
+        return
 
-        return jsonify({"reply": reply})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    # relance avec un historique : réponse propre à la session, ni cache ni regroupement ;
+    # question autonome : sans l'historique, partagée comme dans call_model
+    convo = CONVERSATIONS.get(sid) if a.follow_up else Conversation()
+    shareable = convo.empty
+    route = route_for(a)
+    ns = cache_namespace(route)
+    if shareable:
+        with stage("cache"):
+            cached = RESPONSE_CACHE.get(user_text, ns)
+        if cached is not None:
+            replied("cache")
+            reply = fix_model_reply(cached, a)
+            CONVERSATIONS.append(sid, user_text, reply)
+            yield sse("done", {"reply": finalize_reply(reply, a, q)})
+            return
+
+    if BUDGET.exhausted():
+        reply = faq_only_reply(a)
+        CONVERSATIONS.append(sid, user_text, reply)
+        yield sse("done", {"reply": finalize_reply(reply, a, q)})
+        return
+
+    # même question déjà en cours (stream ou /chat) : on attend sa réponse au lieu d'un 2e appel
+    key = flight_key(user_text, ns)
+    leader, call = SINGLE_FLIGHT.begin(key) if shareable else (False, None)
+    if shareable and not leader:
+        shared = SINGLE_FLIGHT.wait(call, remaining(deadline))
+        if shared:
+            replied("model")
+            reply = fix_model_reply(shared, a)
+            CONVERSATIONS.append(sid, user_text, reply)
+            yield sse("done", {"reply": finalize_reply(reply, a, q)})
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            DEADLINE.expire()
+            yield from degraded_events(a, q, sid)
+            return
+        leader, call = SINGLE_FLIGHT.begin(key)
+
+    t0 = time.monotonic()
+    prefix = promo_prefix(a)
+    raw, sent, complete = "", "", False
+    handed_off = False  # délai dépassé : le flux se termine en arrière-plan et publie lui-même
+    try:
+        if prefix:
+            sent = prefix
+            yield sse("delta", {"text": prefix})
+        try:
+            acquire_gate(deadline)
+        except Overloaded:
+            replied("busy")
+            yield sse("done", {"reply": a.tenant.busy_msg or BUSY_MSG, "busy": True})
+            return
+        except DeadlineExceeded:
+            yield from degraded_events(a, q, sid)
+            return
+        t_model = time.perf_counter()
+        gen = stream_model(user_text, convo, route)
+
+        def finish_late(first: str, error: Exception | None) -> None:
+            # même suite que call_model hors délai : réponse complète → cache et suiveurs
+            text, done = first, error is None
+            try:
+                if done:
+                    for delta in gen:
+                        text += delta
+            except Exception:
+                done = False
+            finally:
+                gen.close()
+                MODEL_GATE.release()
+            text = text.strip()
+            ok = done and bool(text) and remove_ai_meta(text) == text
+            if ok and shareable:
+                RESPONSE_CACHE.put(user_text, ns, text, latency=time.monotonic() - t0)
+            if leader:
+                SINGLE_FLIGHT.finish(key, call, result=text if ok else None)
+
+        try:
+            first = first_within_deadline(gen, deadline, finish_late)
+        except DeadlineExceeded as e:
+            handed_off = not isinstance(e, DeadlineSaturated)
+            if not handed_off:
+                gen.close()
+                MODEL_GATE.release()
+            observe_stage("model", time.perf_counter() - t_model)
+            yield from degraded_events(a, q, sid)
+            return
+        except BaseException:
+            gen.close()
+            MODEL_GATE.release()
+            raise
+        try:
+            complete = True
+            for delta in itertools.chain((first,), gen):
+                raw += delta
+                if remove_ai_meta(raw) != raw:
+                    # méta IA détectée : on arrête de diffuser, `done` remplacera la bulle ;
+                    # réponse tronquée : ni cache ni partage
+                    complete = False
+                    break
+                shown = prefix + first_clickable_link_only(raw[:stream_safe_len(raw)])
+                if shown.startswith(sent) and len(shown) > len(sent):
+                    yield sse("delta", {"text": shown[len(sent):]})
+                    sent = shown
+        except BaseException:
+            complete = False
+            raise
+        finally:
+            gen.close()
+            MODEL_GATE.release()
+            observe_stage("model", time.perf_counter() - t_model)
+        raw = raw.strip()
+    finally:
+        # réveille les suiveurs dans tous les cas ; sans réponse complète, ils appelleront eux-mêmes
+        if leader and not handed_off:
+            SINGLE_FLIGHT.finish(key, call, result=raw if complete and raw else None)
+
+    replied("model")
+    if shareable and complete and raw:
+        RESPONSE_CACHE.put(user_text, ns, raw, latency=time.monotonic() - t0)
+    reply = fix_model_reply(raw, a)
+    CONVERSATIONS.append(sid, user_text, reply)
+    yield sse("done", {"reply": finalize_reply(reply, a, q)})
+
+def degraded_events(a: MessageAnalysis, q: int, sid: str = ""):
+    """Modèle hors délai en streaming : réponse locale dans `done` (même repli que /chat)."""
+    reply = fix_model_reply(degraded_reply(a), a)
+    CONVERSATIONS.append(sid, a.text, reply)
+    yield sse("done", {"reply": finalize_reply(reply, a, q)})
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    deadline = request_deadline()  # depuis l'arrivée de la requête
+    data = request.get_json(force=True) or {}
+    user_text = extract_user_text(data)
+    if not user_text:
+        return jsonify({"error":"Message manquant"}), 400
+
+    start_visit(data)
+    q = next_question_count()
+    sid, ip = session_id(), client_ip()
+    trace().update(sid=sid, q=q, text=user_text)
+    try:
+        rate_limit("fast", sid, ip)
+    except RateLimited as e:
+        log_exchange()
+        return rate_limited_response(e)
+    with stage("analyze"):
+        a = MessageAnalysis(user_text)
+
+    def generate():
+        t0 = time.perf_counter()
+        try:
+            yield from stream_reply_events(a, q, sid, ip, deadline)
+        except Exception as e:
+            replied("error")
+            report_error("chat/stream", e)
+            yield sse("error", {"error": ERROR_MSG})
+        observe_stage("total_stream", time.perf_counter() - t0)
+        log_exchange()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(RESPONSE_CACHE.stats())
 
 @app.route("/healthz")
 def healthz():
+    # vivant (liveness) : répond dès l'import, même pendant l'initialisation
     return "OK", 200
 
+@app.route("/readyz")
+def readyz():
+    # prêt (readiness) : client LLM et base de connaissances chargés
+    if STARTUP.ready:
+        return jsonify({"ready": True, "version": KNOWLEDGE.current.version})
+    return jsonify({"ready": False, "error": STARTUP.error or None}), 503, {"Retry-After": "2"}
+
+@app.route("/startup")
+def startup_report():
+    return jsonify(STARTUP.report())
+
+# routes servies sans attendre la fin de l'initialisation
+NO_WAIT_ENDPOINTS = {"home", "static", "asset", "healthz", "readyz", "startup_report", "metrics"}
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", 20))
+
+@app.before_request
+def wait_until_ready():
+    if request.endpoint in NO_WAIT_ENDPOINTS:
+        return None
+    if not STARTUP.wait(READY_TIMEOUT):
+        replied("busy")
+        return jsonify({"reply": request_tenant().busy_msg or BUSY_MSG, "busy": True}), 503, {"Retry-After": "5"}
+    try:
+        tenant().live.watch()  # studio chargé au besoin ; surveillance démarrée une fois par processus
+    except Exception as e:  # tenant.json invalide, base du studio illisible…
+        replied("error")
+        report_error(f"tenant {request_tenant().id}", e)
+        return jsonify({"error": ERROR_MSG}), 500
+    return None
+
+@app.after_request
+def count_request(resp):
+    HTTP_REQUESTS.inc(endpoint=request.endpoint or "unknown", code=resp.status_code)
+    return resp
+
+JSON_COMPRESS_MIN = int(os.getenv("JSON_COMPRESS_MIN_BYTES", 512))  # en dessous, les en-têtes coûtent plus
+
+@app.after_request
+def compress_json(resp):
+    # réponses JSON (/chat) : compression rapide si le client l'accepte et si ça vaut le coup
+    if resp.mimetype != "application/json" or resp.direct_passthrough or "Content-Encoding" in resp.headers:
+        return resp
+    data = resp.get_data()
+    if len(data) < JSON_COMPRESS_MIN:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    enc = choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if enc:
+        resp.set_data(compress(data, enc, fast=True))
+        resp.headers["Content-Encoding"] = enc
+    return resp
+
+@app.route("/metrics")
+def metrics():
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/load")
+def load_stats():
+    return jsonify({"gate": MODEL_GATE.stats(), "llm": LLM.stats(), "singleflight": SINGLE_FLIGHT.stats(),
+                    "tokens": TOKENS.stats(last=10), "conversations": CONVERSATIONS.stats(),
+                    "ratelimit": {name: [lim.stats() for lim in pair] for name, pair in RATE_LIMITS.items()},
+                    "budget": BUDGET.stats(), "chatlog": CHAT_LOG.stats(), "deadline": DEADLINE.stats(),
+                    "routes": ROUTE_STATS.stats(ROUTES),
+                    "faq": knowledge().faq.stats(), "tenants": TENANTS.stats()})
+
+# =========================
+# Administration (jeton ADMIN_TOKEN dans l'en-tête X-Admin-Token)
+# =========================
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def admin_allowed() -> bool:
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+
+@app.route("/admin/kb")
+def admin_kb():
+    if not admin_allowed():
+        return jsonify({"error": "Accès refusé"}), 403
+    return jsonify({"tenant": tenant().tenant.id, **tenant().live.stats()})
+
+@app.route("/admin/tenants")
+def admin_tenants():
+    if not admin_allowed():
+        return jsonify({"error": "Accès refusé"}), 403
+    return jsonify(TENANTS.stats())
+
+@app.route("/admin/kb/reload", methods=["POST"])
+def admin_kb_reload():
+    if not admin_allowed():
+        return jsonify({"error": "Accès refusé"}), 403
+    TENANTS.scan()  # nouveaux studios ou configurations modifiées dans TENANTS_DIR
+    live = tenant().live
+    changed = live.check() if request.args.get("force") is None else live.reload()
+    return jsonify({"tenant": tenant().tenant.id, "changed": changed, **live.stats()})
+
+# =========================
+# Profilage à la demande (profiling.py) : en-tête X-Profile ou tirage aléatoire
+# =========================
+PROFILER = Profiler(
+    os.getenv("PROFILE_DIR", "instance/profiles"),      # vide → profilage désactivé
+    keep=int(os.getenv("PROFILE_KEEP", 50)),            # captures gardées (anneau, tous workers)
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 0)),  # ex. 0.01 : 1 requête /chat sur 100
+    interval=float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000,
+    min_ms=float(os.getenv("PROFILE_MIN_MS", 250)),     # captures tirées au sort : seulement les lentes
+)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "") or ADMIN_TOKEN
+PROFILED_ENDPOINTS = {"chat", "chat_stream"}  # tirage aléatoire : routes de réponse seulement
+
+@app.before_request
+def start_profile():
+    if not PROFILER.enabled:
+        return None
+    token = request.headers.get("X-Profile")
+    if token is not None:
+        # capture demandée : échantillons + cProfile (fichier pstats)
+        if PROFILE_TOKEN and hmac.compare_digest(token, PROFILE_TOKEN):
+            g.profile = PROFILER.start("header", cprofile=True)
+    elif request.endpoint in PROFILED_ENDPOINTS and PROFILER.sampled():
+        g.profile = PROFILER.start("sample")
+    return None
+
+@app.after_request
+def tag_profile(resp):
+    if "profile" in g:
+        g.profile_status = resp.status_code
+        resp.headers["X-Profile-Id"] = g.profile.id
+    return resp
+
+@app.teardown_request
+def finish_profile(exc):
+    # après la signature de la session et, pour /chat/stream, après le dernier événement
+    cap = g.pop("profile", None)
+    if cap is None:
+        return
+    t = trace()
+    try:
+        PROFILER.finish(cap, {
+            "endpoint": request.endpoint,
+            "status": g.get("profile_status", 500),
+            "tenant": g.tenant.tenant.id if "tenant" in g else None,
+            "source": t.get("source"),
+            "stages": dict(t.get("stages", {})),
+        })
+    except OSError as e:
+        report_error("profile", e)
+
+@app.route("/admin/profiles")
+def admin_profiles():
+    # requêtes profilées les plus lentes (?sort=recent : les plus récentes), avec leurs fichiers
+    if not admin_allowed():
+        return jsonify({"error": "Accès refusé"}), 403
+    items = PROFILER.recent(request.args.get("limit", 20, type=int), request.args.get("sort") != "recent")
+    for m in items:
+        m["urls"] = {kind: f"/admin/profiles/{name}" for kind, name in m["files"].items()}
+    return jsonify({**PROFILER.stats(), "profiles": items})
+
+@app.route("/admin/profiles/<name>")
+def admin_profile_file(name: str):
+    # .collapsed : flamegraph.pl, speedscope… ; .prof : python -m pstats, snakeviz
+    if not admin_allowed():
+        return jsonify({"error": "Accès refusé"}), 403
+    path = PROFILER.path(name)
+    if path is None:
+        return jsonify({"error": "Profil introuvable"}), 404
+    if name.endswith(".prof"):
+        return send_file(path, mimetype="application/octet-stream", as_attachment=True)
+    return send_file(path, mimetype="application/json" if name.endswith(".json") else "text/plain")
+
+# =========================
+# Initialisation des composants lourds (immédiate, ou en arrière-plan si LAZY_INIT)
+# =========================
+def init_components() -> None:
+    global LLM, ProviderError, KNOWLEDGE
+    with STARTUP.step("provider_client (requests)", kind="import"):
+        import provider_client
+    with STARTUP.step("client LLM"):
+        llm = provider_client.ProviderClient.from_env()
+        if not llm.providers:
+            raise ValueError("Aucune clé API trouvée (OPENAI_API_KEY ou OPENROUTER_API_KEY).")
+        llm.on_status = lambda provider, status: UPSTREAM_RESPONSES.inc(provider=provider, status=status)
+        llm.on_discard = account_discarded
+    with STARTUP.step("kb_live (numpy)", kind="import"):
+        import kb_live  # noqa: F401
+    with STARTUP.step("base de connaissances (snapshot, index, FAQ)"):
+        bundle = TENANTS.get(DEFAULT_TENANT.id)  # les autres studios : au 1er message
+    with STARTUP.step("préchauffage"):
+        prompt_version(bundle, bundle.live.current)
+        MessageAnalysis("bonjour, quels cours pour ma fille de 6 ans ?", bundle)
+    ProviderError = provider_client.ProviderError
+    LLM, KNOWLEDGE = llm, bundle.live
+
+STARTUP.run(init_components, lazy=LAZY_INIT)
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
+    # serveur de développement Flask — en production : gunicorn -c gunicorn.conf.py app:app
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)), threaded=True)
@@ -0,0 +1,170 @@
+# batch_answer.py — réponses en lot, hors HTTP, par le même pipeline que /chat
+#
+#   python batch_answer.py questions.jsonl -o reponses.jsonl --workers 8 --upstream-per-min 120
+#   python batch_answer.py requests.jsonl -o out.jsonl --field title --limit 200
+#
+# Chaque ligne JSONL est une requête /chat (champs message / text / question… ou --field) ;
+# elle passe par answer_message() : réponses rapides, FAQ, promo, cache, appel modèle, post-traitement.
+# - pool de threads borné (--workers) ; appels modèle simultanés bornés par MODEL_GATE
+#   (--upstream-concurrency) et cadencés par un seau à jetons (--upstream-per-min)
+# - résultats écrits au fil de l'eau (1 ligne par question : réponse, origine, règle, latence) ;
+#   le fichier de sortie sert de point de reprise : relancé, le lot saute les lignes déjà réussies
+# - usages : non-régression des règles en masse, préchauffage du cache avant la rentrée
+#
+# Un résumé JSON (origines, latences p50/p95, débit, coût par classe de question) est affiché
+# sur stderr à la fin.
+
+import argparse, json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+def read_items(path: str, field: str = "") -> list[tuple[str, int, dict]]:
+    """(clé, n° de ligne, ligne) ; clé = id / request_id de la ligne, sinon son numéro."""
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, str):
+                row = {"message": row}
+            if not isinstance(row, dict):
+                continue
+            if field:
+                row = {**row, "message": row.get(field)}
+            key = row.get("id") or row.get("request_id") or f"line:{n}"
+            items.append((str(key), n, row))
+    return items
+
+def done_keys(path: str) -> set[str]:
+    """Clés déjà traitées sans erreur (lignes du fichier de sortie d'une exécution précédente)."""
+    keys = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # dernière ligne tronquée par une interruption
+                if isinstance(row, dict) and row.get("key") and not row.get("error"):
+                    keys.add(row["key"])
+    except OSError:
+        pass
+    return keys
+
+def percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 4)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Réponses de Betty en lot (même pipeline que /chat)")
+    ap.add_argument("input", help="fichier JSONL de questions")
+    ap.add_argument("-o", "--output", required=True, help="fichier JSONL de résultats (ajout + reprise)")
+    ap.add_argument("--field", default="", help="champ de la question (défaut : message, text, question…)")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--upstream-concurrency", type=int, default=4, help="appels modèle simultanés")
+    ap.add_argument("--upstream-per-min", type=float, default=120, help="appels modèle par minute (0 : sans limite)")
+    ap.add_argument("--q", type=int, default=1, help="rang de la question dans la visite (relance, bulle Wix)")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--restart", action="store_true", help="ignore le fichier de sortie existant et l'écrase")
+    args = ap.parse_args()
+
+    # avant l'import de app : file d'attente MODEL_GATE à la taille du pool, métriques hors du dossier du serveur
+    os.environ["MODEL_MAX_CONCURRENCY"] = str(args.upstream_concurrency)
+    os.environ.setdefault("MODEL_MAX_WAITING", str(args.workers))
+    os.environ.setdefault("MODEL_WAIT_TIMEOUT", "600")
+    os.environ.setdefault("METRICS_DIR", "")
+    os.environ.setdefault("CHAT_LOG_DIR", "")  # les résultats du lot sont déjà dans --output
+    import app
+    from ratelimit import RateLimiter
+
+    if not app.STARTUP.wait():
+        sys.exit(f"initialisation impossible : {app.STARTUP.error}")
+
+    items = read_items(args.input, args.field)
+    skip = set() if args.restart else done_keys(args.output)
+    todo = [it for it in items if it[0] not in skip]
+    done = len(items) - len(todo)
+    if args.limit:
+        todo = todo[:args.limit]
+    print(f"[batch] {len(items)} lignes, {done} déjà faites, {len(todo)} à traiter", file=sys.stderr, flush=True)
+
+    pace = RateLimiter("batch", args.upstream_per_min / 60, max(1.0, args.upstream_concurrency))
+
+    def before_model(text: str) -> None:
+        # réponse déjà en cache : pas d'appel amont, inutile d'attendre son tour
+        ns = app.cache_namespace(app.route_for(app.MessageAnalysis(text)))
+        if app.RESPONSE_CACHE.get(text, ns, record=False) is not None:
+            return
+        while True:
+            wait = pace.take("upstream")
+            if not wait:
+                return
+            time.sleep(wait)
+
+    out_lock = threading.Lock()
+    out = open(args.output, "w" if args.restart else "a", encoding="utf-8")
+    stats: dict[str, int] = {}
+    latencies: list[float] = []
+    slots = threading.BoundedSemaphore(args.workers * 2)  # lignes en vol (soumises, non terminées)
+
+    def run(key: str, n: int, row: dict) -> None:
+        try:
+            text = app.extract_user_text(row)
+            info: dict = {}
+            t0 = time.perf_counter()
+            reply, error = None, None
+            if not text:
+                error = "message manquant"
+            else:
+                try:
+                    reply = app.answer_message(text, args.q, before_model=lambda: before_model(text), info=info)
+                except app.Overloaded:
+                    error = "busy"
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+            latency = time.perf_counter() - t0
+            source = "error" if error else info.get("source", "")
+            result = {"key": key, "line": n, "question": text, "reply": reply, "source": source,
+                      "rule": info.get("rule"), "latency_s": round(latency, 4), "error": error}
+            with out_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()  # point de reprise à jour même si le lot est interrompu
+                stats[source] = stats.get(source, 0) + 1
+                if not error:
+                    latencies.append(latency)
+        finally:
+            slots.release()
+
+    t0 = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="batch")
+    try:
+        for key, n, row in todo:
+            slots.acquire()
+            pool.submit(run, key, n, row)
+        pool.shutdown(wait=True)
+    except KeyboardInterrupt:
+        print("[batch] interrompu : relancez la même commande pour reprendre", file=sys.stderr, flush=True)
+        pool.shutdown(wait=True, cancel_futures=True)
+        out.close()
+        sys.exit(130)
+    out.close()
+
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        "processed": sum(stats.values()),
+        "by_source": stats,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(sum(stats.values()) / elapsed, 2) if elapsed else None,
+        "latency_p50_s": percentile(latencies, 0.5),
+        "latency_p95_s": percentile(latencies, 0.95),
+        "tokens": {k: v for k, v in app.TOKENS.stats(last=0).items() if k != "last"},
+        "routes": app.ROUTE_STATS.stats(app.ROUTES),
+    }, ensure_ascii=False, indent=2), file=sys.stderr)
+    if stats.get("error"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
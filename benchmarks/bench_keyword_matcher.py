@@ -0,0 +1,80 @@
+# benchmarks/bench_keyword_matcher.py — KeywordMatcher (index trigrammes) vs fuzzy_has
+#
+# Vérifie que les résultats sont identiques (toutes listes, seuils 0.40 / 0.45)
+# puis mesure le coût par message :  python benchmarks/bench_keyword_matcher.py
+
+import json, os, random, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fuzzy import fuzzy_has, KeywordMatcher
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")  # app.py exige une clé à l'import
+import app
+
+TABLES = {
+    "kpop": app.KPOP_TERMS,
+    "inscription": app.INSCRIPTION_TERMS,
+    "clothes": app.CLOTHES_TERMS,
+    "offer": app.OFFER_TERMS,
+    "course_fast": [kw for kw, _ in app.COURSE_FAST],
+}
+
+def typo(s: str, rng: random.Random) -> str:
+    if len(s) < 4:
+        return s
+    i = rng.randrange(1, len(s) - 1)
+    return s[:i] + s[i + 1] + s[i] + s[i + 2:]
+
+def corpus(n: int = 400) -> list[str]:
+    rng = random.Random(7)
+    base = ["horaires ?", "tarif classique enfant", "cours d'essai", "jazz", "jaz", "kpop",
+            "je veux m'inscrire", "ou acheter des pointes", "c'est où ?", "éveil 3 ans"]
+    try:
+        with open(os.path.join(ROOT, "data", "faq_danse.json"), encoding="utf-8") as f:
+            base += [it["question"] for it in json.load(f)]
+    except Exception:
+        pass
+    out = list(base)
+    while len(out) < n:
+        out.append(typo(rng.choice(base), rng))
+    return out
+
+def main() -> None:
+    msgs = corpus()
+    matcher = KeywordMatcher(TABLES)
+
+    # 1) Résultats identiques
+    for m in msgs:
+        res = matcher.scan(m)
+        for table, kws in TABLES.items():
+            for thr in (0.40, 0.45):
+                assert res.has(table, thr) == fuzzy_has(m, kws, thr), (m, table, thr)
+                first = next((kw for kw in kws if fuzzy_has(m, [kw], thr)), None)
+                assert res.first(table, thr) == first, (m, table, thr)
+
+    # 2) Temps : toutes les listes, une fois par message
+    t0 = time.perf_counter()
+    for m in msgs:
+        for kws in TABLES.values():
+            fuzzy_has(m, kws, 0.40)
+        for kw in TABLES["course_fast"]:
+            fuzzy_has(m, [kw], 0.40)
+    legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for m in msgs:
+        matcher.scan(m)
+    indexed = time.perf_counter() - t0
+
+    print(json.dumps({
+        "messages": len(msgs),
+        "identical": True,
+        "fuzzy_has_us_per_msg": round(legacy / len(msgs) * 1e6, 1),
+        "matcher_us_per_msg": round(indexed / len(msgs) * 1e6, 1),
+        "speedup": round(legacy / indexed, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# benchmarks/load_test.py — test de charge HTTP de /chat + micro-benchmarks des fonctions pures
+#
+#   python benchmarks/load_test.py http --concurrency 16 --requests 400 --latency-ms 600
+#   python benchmarks/load_test.py http --server gunicorn --stream --error-rate 0.05
+#   python benchmarks/load_test.py micro
+#
+# Mode http : lance benchmarks/stub_llm.py (faux fournisseur), démarre l'app pointée dessus
+# (OPENAI_API_BASE), rejoue un corpus de questions (FAQ + paraphrases + fautes de frappe,
+# plus les fichiers JSONL passés en --seed-file) et affiche un rapport JSON : débit, latences
+# p50/p95/p99, taux d'erreur et part des réponses rapides (lue sur /metrics).
+# Mode micro : coût par appel de norm, fuzzy_has, quick_course_answer, first_clickable_link_only,
+# MessageAnalysis et postprocess.
+
+import argparse, json, os, random, re, socket, subprocess, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# =========================
+# Corpus
+# =========================
+FAST_PROBES = ["jazz", "jaz", "kpop", "tenue", "horaires ?", "tarifs", "classique", "éveil 3 ans",
+               "mon fils a 6 ans", "je veux m'inscrire", "adresse", "contact"]
+PARAPHRASES = ["{q}", "Bonjour, {q}", "{q} merci", "Petite question : {q}", "svp {q}",
+               "Je me demandais : {q}"]
+
+def typo(s: str, rng: random.Random) -> str:
+    """Une faute de frappe : deux lettres voisines inversées, une lettre doublée ou oubliée."""
+    if len(s) < 5:
+        return s
+    i = rng.randrange(1, len(s) - 2)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return s[:i] + s[i + 1] + s[i] + s[i + 2:]
+    if kind == 1:
+        return s[:i] + s[i] + s[i:]
+    return s[:i] + s[i + 1:]
+
+def seed_questions(paths: list[str]) -> list[str]:
+    """Questions des fichiers JSONL (champs message / question / text) ; les autres lignes sont ignorées."""
+    out = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(row, dict):
+                        q = row.get("message") or row.get("question") or row.get("text")
+                        if isinstance(q, str) and q.strip():
+                            out.append(q.strip())
+        except OSError:
+            continue
+    return out
+
+def build_corpus(n: int, seeds: list[str], rng: random.Random) -> list[str]:
+    base = list(FAST_PROBES)
+    try:
+        with open(os.path.join(ROOT, "data", "faq_danse.json"), encoding="utf-8") as f:
+            base += [it["question"] for it in json.load(f)]
+    except (OSError, ValueError, KeyError):
+        pass
+    base += seed_questions(seeds)
+    out = []
+    while len(out) < n:
+        q = rng.choice(base)
+        if q not in FAST_PROBES:
+            q = rng.choice(PARAPHRASES).format(q=q[0].lower() + q[1:] if q else q)
+        if rng.random() < 0.3:
+            q = typo(q, rng)
+        out.append(q)
+    return out
+
+# =========================
+# Outils
+# =========================
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def wait_http(url: str, timeout: float = 60) -> None:
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"pas de réponse de {url}")
+
+METRIC_RE = re.compile(r'^betty_replies_total\{source="(\w+)"\} ([0-9.e+]+)$', re.M)
+
+def reply_sources(base_url: str) -> dict[str, float]:
+    import requests
+    try:
+        text = requests.get(f"{base_url}/metrics", timeout=5).text
+    except requests.RequestException:
+        return {}
+    return {k: float(v) for k, v in METRIC_RE.findall(text)}
+
+# =========================
+# Mode http
+# =========================
+def start_servers(a, workdir: str) -> tuple[list[subprocess.Popen], str]:
+    stub_port, app_port = free_port(), free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "stub_llm.py"), "--port", str(stub_port),
+         "--latency-ms", str(a.latency_ms), "--jitter", str(a.jitter),
+         "--tokens-per-s", str(a.tokens_per_s), "--error-rate", str(a.error_rate), "--seed", str(a.seed)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    env = {k: v for k, v in os.environ.items() if k != "OPENROUTER_API_KEY"}
+    env.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_BASE": f"http://127.0.0.1:{stub_port}/v1",
+        "PORT": str(app_port),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "RESPONSE_CACHE_PATH": os.path.join(workdir, "cache.sqlite3") if a.cache else "",
+        "RESPONSE_CACHE_TTL": os.environ.get("RESPONSE_CACHE_TTL", "21600") if a.cache else "0",
+        "CONVERSATION_PATH": os.path.join(workdir, "conversations.sqlite3"),
+        "CHAT_LOG_DIR": os.path.join(workdir, "chatlog"),
+        # le banc simule beaucoup de visiteurs depuis 127.0.0.1 : pas de limite de débit par IP
+        "RATE_LIMIT_PATH": os.path.join(workdir, "ratelimit.sqlite3"),
+        "RATE_FAST_PER_MIN": "0",
+        "RATE_MODEL_PER_MIN": "0",
+        "GUNICORN_ACCESSLOG": os.devnull,
+        "PYTHONPATH": ROOT,
+    })
+    if a.server == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"), "app:app"]
+    else:
+        cmd = [sys.executable, os.path.join(ROOT, "app.py")]
+    app_proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    procs = [stub, app_proc]
+    base_url = f"http://127.0.0.1:{app_port}"
+    try:
+        wait_http(f"http://127.0.0.1:{stub_port}/")
+        wait_http(f"{base_url}/readyz")  # prêt : client LLM et base chargés
+    except RuntimeError:
+        stop(procs)
+        raise
+    return procs, base_url
+
+def stop(procs: list[subprocess.Popen]) -> None:
+    for p in procs:
+        p.terminate()
+    for p in procs:
+        try:
+            p.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+def run_http(a) -> dict:
+    import requests
+    rng = random.Random(a.seed)
+    corpus = build_corpus(a.requests, a.seed_file, rng)
+    local = threading.local()
+    results: list[tuple[float, int, float | None]] = []  # (latence, code, délai 1er octet)
+    lock = threading.Lock()
+
+    def one(msg: str) -> None:
+        s = getattr(local, "session", None)
+        if s is None:
+            s = local.session = requests.Session()
+        t0 = time.perf_counter()
+        ttfb = None
+        try:
+            if a.stream:
+                with s.post(f"{base_url}/chat/stream", json={"message": msg}, stream=True, timeout=120) as r:
+                    code = r.status_code
+                    for chunk in r.iter_content(chunk_size=None):
+                        if ttfb is None:
+                            ttfb = time.perf_counter() - t0
+                        if b"event: error" in chunk:
+                            code = 599
+            else:
+                r = s.post(f"{base_url}/chat", json={"message": msg}, timeout=120)
+                code = r.status_code
+        except requests.RequestException:
+            code = 0
+        with lock:
+            results.append((time.perf_counter() - t0, code, ttfb))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        procs, base_url = start_servers(a, workdir)
+        try:
+            for msg in corpus[: a.warmup]:
+                one(msg)
+            results.clear()
+            before = reply_sources(base_url)
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=a.concurrency) as pool:
+                list(pool.map(one, corpus))
+            elapsed = time.perf_counter() - t0
+            time.sleep(1.2)  # laisse les workers écrire leurs métriques
+            after = reply_sources(base_url)
+        finally:
+            stop(procs)
+
+    lat = [r[0] * 1000 for r in results]
+    codes: dict[str, int] = {}
+    for _, code, _ in results:
+        codes[str(code)] = codes.get(str(code), 0) + 1
+    errors = sum(1 for _, code, _ in results if code != 200)
+    sources = {k: after.get(k, 0) - before.get(k, 0) for k in after}
+    served = sum(sources.values())
+    ttfbs = [r[2] * 1000 for r in results if r[2] is not None]
+    return {
+        "mode": "stream" if a.stream else "json",
+        "server": a.server,
+        "requests": len(results),
+        "concurrency": a.concurrency,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(lat, 50), 1),
+            "p95": round(percentile(lat, 95), 1),
+            "p99": round(percentile(lat, 99), 1),
+            "max": round(max(lat), 1),
+        },
+        "ttfb_ms_p50": round(percentile(ttfbs, 50), 1) if ttfbs else None,
+        "error_rate": round(errors / len(results), 4) if results else None,
+        "status": codes,
+        "sources": sources,
+        "fast_path_rate": round(sources.get("fast", 0) / served, 4) if served else None,
+        "stub": {"latency_ms": a.latency_ms, "jitter": a.jitter, "tokens_per_s": a.tokens_per_s,
+                 "error_rate": a.error_rate},
+    }
+
+# =========================
+# Mode micro
+# =========================
+LINK_SAMPLES = [
+    "Voir [le planning](https://www.dansedelphineletort.com/cours) et [les tarifs](https://www.dansedelphineletort.com/tarifs).",
+    "Réponse sans lien, assez longue pour ressembler à une vraie réponse de Betty sur les cours de jazz.",
+    "[A](https://a.fr) [B](https://b.fr) [C](https://c.fr) puis du texte après les liens.",
+]
+
+def bench(fn, inputs: list, repeat: int = 5) -> float:
+    """Meilleur temps moyen par appel (µs) sur `repeat` passes."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for x in inputs:
+            fn(x)
+        best = min(best, (time.perf_counter() - t0) / len(inputs))
+    return round(best * 1e6, 2)
+
+def run_micro(a) -> dict:
+    os.environ.setdefault("OPENAI_API_KEY", "bench")  # app.py exige une clé à l'import
+    os.environ.setdefault("METRICS_DIR", "")
+    import app
+    from fuzzy import norm, fuzzy_has
+
+    app.STARTUP.wait()  # LAZY_INIT : base de connaissances chargée en arrière-plan
+
+    rng = random.Random(a.seed)
+    corpus = build_corpus(a.requests, a.seed_file, rng)
+    normed = [norm(m) for m in corpus]
+    replies = [rng.choice(LINK_SAMPLES) for _ in corpus]
+    analyses = [app.MessageAnalysis(m) for m in corpus]
+    return {
+        "mode": "micro",
+        "inputs": len(corpus),
+        "us_per_call": {
+            "norm": bench(norm, corpus),
+            "fuzzy_has[clothes]": bench(lambda t: fuzzy_has(t, app.CLOTHES_TERMS), normed),
+            "quick_course_answer": bench(app.quick_course_answer, corpus),
+            "first_clickable_link_only": bench(app.first_clickable_link_only, replies),
+            "MessageAnalysis": bench(app.MessageAnalysis, corpus),
+            "FAQ.match": bench(app.KNOWLEDGE.current.faq.match, corpus),
+            "postprocess": bench(lambda ra: app.postprocess(ra[0], ra[1], 3), list(zip(replies, analyses))),
+        },
+    }
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmarks Betty")
+    ap.add_argument("mode", choices=["http", "micro"])
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--warmup", type=int, default=10)
+    ap.add_argument("--server", choices=["flask", "gunicorn"], default="flask")
+    ap.add_argument("--stream", action="store_true", help="POST /chat/stream au lieu de /chat")
+    ap.add_argument("--cache", action="store_true", help="active le cache de réponses (désactivé par défaut)")
+    ap.add_argument("--seed-file", action="append", default=[os.path.join(ROOT, "requests.jsonl")],
+                    help="JSONL de questions supplémentaires (répétable)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--latency-ms", type=float, default=600)
+    ap.add_argument("--jitter", type=float, default=0.4)
+    ap.add_argument("--tokens-per-s", type=float, default=0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    a = ap.parse_args()
+    report = run_http(a) if a.mode == "http" else run_micro(a)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
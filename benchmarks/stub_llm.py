@@ -0,0 +1,116 @@
+# benchmarks/stub_llm.py — faux serveur compatible OpenAI (/v1/chat/completions) pour les tests de charge
+#
+#   python benchmarks/stub_llm.py --port 8765 --latency-ms 600 --jitter 0.4 --tokens-per-s 60 --error-rate 0.02
+#
+# - latence avant le 1er token : loi log-normale (médiane `latency-ms`, dispersion `jitter`)
+# - débit de génération : `tokens-per-s` (0 → réponse instantanée)
+# - erreurs : une proportion `error-rate` de réponses `error-status` (503 par défaut)
+# - streaming SSE (stream=true) avec usage dans le dernier fragment
+
+import argparse, json, math, random, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+REPLY = (
+    "Bonjour ! Le Centre de Danse Delphine Letort propose des cours pour tous les âges. "
+    "Le mieux est de consulter le planning puis de venir essayer un cours. "
+    "N'hésitez pas à nous écrire si vous avez la moindre question."
+)
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 600, jitter: float = 0.4, tokens_per_s: float = 60,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int | None = None):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.tokens_per_s = tokens_per_s
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def draw(self) -> tuple[float, bool]:
+        """(délai avant le 1er token, réponse en erreur ?) pour une requête."""
+        with self.lock:
+            self.calls += 1
+            z = self.rng.gauss(0, 1)
+            fail = self.rng.random() < self.error_rate
+        return self.latency_ms / 1000 * math.exp(self.jitter * z), fail
+
+def make_handler(cfg: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self._send(200, b'{"status": "ok", "calls": %d}' % cfg.calls)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            delay, fail = cfg.draw()
+            time.sleep(delay)
+            if fail:
+                self._send(cfg.error_status, b'{"error": {"message": "stub overloaded"}}',
+                           {"Retry-After": "1"})
+                return
+            words = REPLY.split(" ")
+            prompt = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+            usage = {"prompt_tokens": prompt, "completion_tokens": len(words)}
+            step = 1 / cfg.tokens_per_s if cfg.tokens_per_s > 0 else 0
+            if not body.get("stream"):
+                time.sleep(step * len(words))
+                out = json.dumps({"choices": [{"message": {"role": "assistant", "content": REPLY}}],
+                                  "usage": usage}).encode()
+                self._send(200, out)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, w in enumerate(words):
+                if i and step:
+                    time.sleep(step)
+                self._chunk({"choices": [{"delta": {"content": w + (" " if i < len(words) - 1 else "")}}]})
+            self._chunk({"choices": [], "usage": usage})
+            self._chunk_raw(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _send(self, status: int, body: bytes, headers: dict | None = None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, payload: dict):
+            self._chunk_raw(f"data: {json.dumps(payload)}\n\n".encode())
+
+        def _chunk_raw(self, data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    return Handler
+
+def serve(port: int, cfg: StubConfig) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(cfg))
+    server.daemon_threads = True
+    return server
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Faux serveur LLM compatible OpenAI")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=600)
+    ap.add_argument("--jitter", type=float, default=0.4)
+    ap.add_argument("--tokens-per-s", type=float, default=60)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--error-status", type=int, default=503)
+    ap.add_argument("--seed", type=int, default=None)
+    a = ap.parse_args()
+    cfg = StubConfig(a.latency_ms, a.jitter, a.tokens_per_s, a.error_rate, a.error_status, a.seed)
+    serve(a.port, cfg).serve_forever()
+
+if __name__ == "__main__":
+    main()
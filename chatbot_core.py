@@ -1,80 +1,87 @@
 """
 Version enrichie de chatbot_core.py pour Betty
 
-Cette version charge automatiquement les fichiers `.md` et `.txt` de `data/` et
-`personnalisées/`, gère la promotion de septembre pour les cours d'essai gratuits,
-et ajoute une réponse spécifique aux questions sur les cours de K‑Pop. Elle
-inclut également un contexte raccourci extrait des documents pour alimenter
-l'appel OpenAI.
+Cette version charge automatiquement les fichiers de `data/` et `personnalisées/`
+(Markdown, texte, JSON et PDF, via le snapshot de `kb_ingest.py`), gère la
+promotion de septembre pour les cours d'essai gratuits, et ajoute une réponse
+spécifique aux questions sur les cours de K‑Pop. Elle
+inclut également un contexte raccourci — les passages des documents les plus
+pertinents pour la question (index BM25, voir `retrieval.py`) — pour alimenter
+l'appel OpenAI. La base est rechargée à chaud quand `data/` ou
+`personnalisées/` changent (voir `kb_live.py`). Avec LAZY_INIT=1 (défaut), le
+client LLM et la base sont initialisés en arrière-plan (voir `startup.py`).
 
 Pour l'ajouter à votre projet, remplacez votre fichier `chatbot_core.py` par
 ce fichier et redéployez.
 """
 
-import os
-import glob
-import json
+import os, sys
 from datetime import date
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict
 
-import openai
-from dotenv import load_dotenv
+from startup import Startup
+STARTUP = Startup("chatbot_core")
+
+with STARTUP.step("dotenv", kind="import"):
+    from dotenv import load_dotenv
+with STARTUP.step("prompt_budget", kind="import"):
+    from prompt_budget import PromptBudget, TokenLedger
+with STARTUP.step("deadline", kind="import"):
+    from deadline import Deadline, DeadlineExceeded
+with STARTUP.step("routing", kind="import"):
+    from fuzzy import norm
+    from routing import classify, routes_from_env
+
+if TYPE_CHECKING:  # importés par init_components() (requests, numpy : hors du chemin critique)
+    from kb_live import Knowledge, LiveKnowledge
+    from provider_client import ProviderClient
 
 # ----------------------------------------------------------------------
-# ENV & OpenAI (API v0.28)
+# ENV & fournisseurs LLM (OpenAI / OpenRouter, voir provider_client.py)
 # ----------------------------------------------------------------------
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 MODEL_ID = os.getenv("MODEL_ID", "gpt-3.5-turbo")
+LAZY_INIT = os.getenv("LAZY_INIT", "1") != "0"
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", 20))
+LLM: "ProviderClient | None" = None  # créé par init_components()
+
+# délai de réponse (deadline.py) : au-delà, passage de la base ou message d'attente ;
+# l'appel modèle se termine en arrière-plan (compteurs : DEADLINE.stats())
+REPLY_DEADLINE_S = float(os.getenv("REPLY_DEADLINE_S", 8))  # 0 → on attend le modèle
+FALLBACK_SNIPPET_MIN_SCORE = float(os.getenv("FALLBACK_SNIPPET_MIN_SCORE", 4.0))
+DEADLINE = Deadline(max_background=int(os.getenv("DEADLINE_MAX_BACKGROUND", 16)))
+ERROR_MSG = "Désolée, je rencontre un souci pour répondre. N’hésite pas à réessayer bientôt."
+HOLDING_MSG = "Je vérifie cette information pour te répondre précisément 🙏 Repose-moi la question dans un instant."
+
+# routage par classe de question (routing.py) : réponse courte et palier rapide pour « c'est où ? »,
+# budgets historiques (550 tokens, 3 passages) pour les questions complexes ou mal reconnues
+ROUTES, ROUTE_STATS = routes_from_env(MODEL_ID, dict(tier="large", max_tokens=550, top_k=3, temperature=0.4))
 
 # ----------------------------------------------------------------------
 # FAQ LOCALE
 # ----------------------------------------------------------------------
 FAQ_PATH = "data/faq_danse.json"
-try:
-    with open(FAQ_PATH, "r", encoding="utf-8") as f:
-        faq_data = json.load(f)
-except Exception:
-    faq_data = []
-
-faq_index = {
-    str(item.get("question", "")).lower(): item.get("answer", "")
-    for item in faq_data
-    if isinstance(item, dict)
-}
-
-def chercher_reponse_locale(question: str):
-    """Cherche une réponse dans la FAQ locale (matching simple)."""
-    q = (question or "").lower()
-    for k, v in faq_index.items():
-        if k and (k in q or q in k):
-            return v
-    return None
 
 # ----------------------------------------------------------------------
-# BASE DE CONNAISSANCES (fichiers .md / .txt)
+# BASE DE CONNAISSANCES (snapshot KB : md / txt / json / pdf, voir kb_ingest.py)
+# + index BM25 partagé avec app.py (même artefact) + FAQ, rechargés à chaud (kb_live.py)
 # ----------------------------------------------------------------------
-def _read_text_file(path: str) -> str:
-    try:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
-    except Exception:
-        return ""
-
-def load_kb_texts() -> List[Dict[str, str]]:
-    """Charge les textes depuis data/ et personnalisées/ (md/txt)."""
-    texts: List[Dict[str, str]] = []
-    for folder in ["data", "personnalisées"]:
-        if not os.path.isdir(folder):
-            continue
-        for p in glob.glob(os.path.join(folder, "**", "*.*"), recursive=True):
-            if p.lower().endswith((".md", ".txt")):
-                txt = _read_text_file(p)
-                if txt.strip():
-                    texts.append({"source": p, "text": txt})
-    return texts
+KNOWLEDGE: "LiveKnowledge | None" = None  # créé par init_components()
+
+def current_knowledge() -> "Knowledge":
+    """Version courante de la base (attend la fin de l'initialisation, READY_TIMEOUT au plus)."""
+    if not STARTUP.wait(READY_TIMEOUT):
+        raise RuntimeError(f"base de connaissances indisponible ({STARTUP.error or 'initialisation en cours'})")
+    return KNOWLEDGE.current
+
+def chercher_reponse_locale(question: str, kb: "Knowledge | None" = None):
+    """Cherche une réponse dans la FAQ locale (seulement si la correspondance est sûre)."""
+    match = (kb or current_knowledge()).faq.answer(question or "")
+    return match.answer if match else None
 
-KB_DOCS = load_kb_texts()
+def load_kb_texts(kb: "Knowledge | None" = None) -> List[Dict[str, str]]:
+    """Textes de data/ et personnalisées/ (un par fichier), lus depuis le snapshot."""
+    return (kb or current_knowledge()).derive("documents", lambda kb: kb.snapshot.documents())
 
 def extract_offer_snippet(kb_docs: List[Dict[str, str]]) -> str:
     """Essaie d'extraire la section OFFRE SEPTEMBRE dans les .md si présente."""
@@ -91,10 +98,15 @@ def extract_offer_snippet(kb_docs: List[Dict[str, str]]) -> str:
             return snippet[:900]
     return ""
 
-OFFER_SNIPPET = extract_offer_snippet(KB_DOCS)
+def offer_snippet(kb: "Knowledge") -> str:
+    """Extrait de l'offre de septembre, calculé une fois par version de la base."""
+    return kb.derive("offer_snippet", lambda kb: extract_offer_snippet(load_kb_texts(kb)))
 
 def build_small_context(kb_docs: List[Dict[str, str]], limit_chars: int = 1200) -> str:
-    """Construit un petit contexte concaténé et safe (~1200 chars)."""
+    """Construit un petit contexte concaténé et safe (~1200 chars).
+
+    Conservé pour compatibilité : le prompt utilise désormais les passages de l'index BM25.
+    """
     parts: List[str] = []
     total = 0
     preferred_first = sorted(
@@ -113,7 +125,18 @@ def build_small_context(kb_docs: List[Dict[str, str]], limit_chars: int = 1200)
         total += len(chunk)
     return "\n\n".join(parts)
 
-SMALL_CONTEXT = build_small_context(KB_DOCS)
+# anciens noms du module (calculés au chargement), désormais dérivés de la version courante de la base
+COMPAT_NAMES = {
+    "KB_DOCS": lambda kb: load_kb_texts(kb),
+    "OFFER_SNIPPET": offer_snippet,
+    "SMALL_CONTEXT": lambda kb: kb.derive("small_context", lambda kb: build_small_context(load_kb_texts(kb))),
+    "faq_index": lambda kb: {str(e.get("question", "")).lower(): e.get("answer", "") for e in kb.faq.entries},
+}
+
+def __getattr__(name: str):
+    if name in COMPAT_NAMES:
+        return COMPAT_NAMES[name](current_knowledge())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ----------------------------------------------------------------------
 # RÈGLES MÉTIER : PROMO SEPTEMBRE ET K-POP
@@ -174,6 +197,33 @@ KPOP_MSG = (
     "L'année test est **offerte** à 100 % pour les élèves; les inscriptions se font début septembre (places limitées)."
 )
 
+# ----------------------------------------------------------------------
+# PROMPT (persona fixe + extraits + consignes, sous budget de tokens)
+# ----------------------------------------------------------------------
+SYSTEM_MSG = (
+    "Tu es Cendrillon, l’assistante humaine (et non un robot) du Centre de Danse Delphine Letort. "
+    "Tu réponds avec bienveillance, clarté et douceur. Ne mentionne jamais que tu es une IA.\n"
+    "Infos clés :\n"
+    "- Delphine Letort (diplômée d'État) enseigne classique (dès 6 ans), street jazz et lyrical jazz.\n"
+    "- Marie anime l’éveil à la danse (dès 3 ans) le samedi matin.\n"
+    "- Parcours recommandé : éveil (dès 3 ans) → classique (dès 6 ans).\n"
+    "- Aucune limite d’âge supérieure pour s’inscrire.\n"
+    "- Autres cours : soul jazz, jazz new school, technique création, breakdance dès 8 ans, street ados/adultes.\n"
+    "- Sophrologie : Marie OLICHET (06 69 16 13 50).\n"
+    "- Liens utiles : planning https://www.dansedelphineletort.com/cours ; "
+    "tarifs https://www.dansedelphineletort.com/tarifs\n"
+    "- Contact : 06 63 11 15 75 / contactdelphineletort@gmail.com ; "
+    "Adresse : 53 avenue Bollée, Le Mans.\n"
+    "Règles : ne pas répéter l’intro à chaque réponse ; ne pas inventer ; rester gentil et rediriger vers le site si doute.\n"
+)
+
+PROMPT_BUDGET = PromptBudget(
+    SYSTEM_MSG,
+    max_prompt=int(os.getenv("PROMPT_MAX_TOKENS", 1500)),
+    max_knowledge=int(os.getenv("PROMPT_KNOWLEDGE_TOKENS", 300)),
+)
+TOKENS = TokenLedger()
+
 # ----------------------------------------------------------------------
 # RÉPONSE BOT
 # ----------------------------------------------------------------------
@@ -192,10 +242,16 @@ def get_bot_response(user_input: str) -> str:
     if wants_kpop(user_input):
         return KPOP_MSG
 
+    # client LLM et base prêts (LAZY_INIT : les règles ci-dessus répondent même pendant le démarrage)
+    if not STARTUP.wait(READY_TIMEOUT):
+        return ERROR_MSG
+    KNOWLEDGE.watch()
+    kb = KNOWLEDGE.current  # même version de la base pour toute la réponse
+
     # 1) Promo septembre — réponse proactive si pertinent
     proactive_offer = ""
     if promo_septembre_active() and wants_offer(user_input):
-        details = OFFER_SNIPPET or (
+        details = offer_snippet(kb) or (
             "Du 1er au 30 septembre : 1 cours d’essai gratuit par personne, sur le cours de votre choix "
             "(dans la limite des places). Réservation obligatoire en ligne/WhatsApp. "
             "Venez 10 minutes en avance avec une tenue adaptée."
@@ -204,7 +260,7 @@ def get_bot_response(user_input: str) -> str:
 
     # 2) FAQ locale si pas de proactive_offer
     if not proactive_offer:
-        local = chercher_reponse_locale(user_input)
+        local = chercher_reponse_locale(user_input, kb)
         if local:
             if promo_septembre_active() and must_attach_offer(user_input, local):
                 local += "\n\n" + PROMO_MSG
@@ -212,50 +268,37 @@ def get_bot_response(user_input: str) -> str:
 
     # 3) OpenAI (contexte court + promo en consigne)
     try:
-        system_msg = (
-            "Tu es Cendrillon, l’assistante humaine (et non un robot) du Centre de Danse Delphine Letort. "
-            "Tu réponds avec bienveillance, clarté et douceur. Ne mentionne jamais que tu es une IA.\n"
-            "Infos clés :\n"
-            "- Delphine Letort (diplômée d'État) enseigne classique (dès 6 ans), street jazz et lyrical jazz.\n"
-            "- Marie anime l’éveil à la danse (dès 3 ans) le samedi matin.\n"
-            "- Parcours recommandé : éveil (dès 3 ans) → classique (dès 6 ans).\n"
-            "- Aucune limite d’âge supérieure pour s’inscrire.\n"
-            "- Autres cours : soul jazz, jazz new school, technique création, breakdance dès 8 ans, street ados/adultes.\n"
-            "- Sophrologie : Marie OLICHET (06 69 16 13 50).\n"
-            "- Liens utiles : planning https://www.dansedelphineletort.com/cours ; "
-            "tarifs https://www.dansedelphineletort.com/tarifs\n"
-            "- Contact : 06 63 11 15 75 / contactdelphineletort@gmail.com ; "
-            "Adresse : 53 avenue Bollée, Le Mans.\n"
-            "Règles : ne pas répéter l’intro à chaque réponse ; ne pas inventer ; rester gentil et rediriger vers le site si doute.\n"
-        )
-
+        # consignes du moment après le persona : le 1er message reste identique d'une requête à l'autre
+        consignes = []
         if promo_septembre_active():
-            system_msg += (
-                "\nIMPORTANT (période courante) : En septembre, proposer proactivement l’offre "
+            consignes.append(
+                "IMPORTANT (période courante) : En septembre, proposer proactivement l’offre "
                 "« 1 cours d’essai gratuit par personne ». Rappeler que la réservation est obligatoire "
                 "via le lien Inscription (places limitées)."
             )
-
-        context_block = ""
-        if SMALL_CONTEXT:
-            context_block = (
-                "\n\nContexte (extraits internes, ne pas citer textuellement si inutile) :\n"
-                + SMALL_CONTEXT
-            )
-
-        messages = [{"role": "system", "content": system_msg + context_block}]
         if proactive_offer:
-            messages.append({"role": "system", "content": "Rappelle l'offre d'essai gratuite en septembre si pertinent."})
-        messages.append({"role": "user", "content": user_input or ""})
-
-        chat_completion = openai.ChatCompletion.create(
-            model=MODEL_ID,
-            messages=messages,
-            temperature=0.4,
-            max_tokens=550,
+            consignes.append("Rappelle l'offre d'essai gratuite en septembre si pertinent.")
+        route = ROUTES[classify(norm(user_input or "").split(), (user_input or "").count("?"), 0,
+                                bool(proactive_offer))]
+        if route.hint:
+            consignes.append(route.hint)
+
+        plan = PROMPT_BUDGET.build(
+            user_input or "",
+            knowledge=kb.index.blocks(user_input or "", k=route.top_k),
+            context="\n".join(consignes),
+            knowledge_title="Contexte (extraits internes, ne pas citer textuellement si inutile) :",
         )
+        def ask():
+            res = LLM.chat(plan.messages, route.model, temperature=route.temperature, max_tokens=route.max_tokens)
+            entry = TOKENS.record(plan, res.text, res.usage, latency=res.latency, provider=res.provider)
+            ROUTE_STATS.record(route, entry["latency_s"], entry["prompt_tokens"], entry["completion_tokens"])
+            return res
 
-        draft = chat_completion["choices"][0]["message"]["content"].strip()
+        try:
+            draft = DEADLINE.run(ask, REPLY_DEADLINE_S if REPLY_DEADLINE_S > 0 else None).text
+        except DeadlineExceeded:
+            draft = fallback_reply(user_input or "", kb)
 
         # 4) Post-traitement : garantir l'annonce de la promo si pertinent
         if promo_septembre_active() and wants_offer(user_input) and PROMO_MSG not in draft:
@@ -269,7 +312,44 @@ def get_bot_response(user_input: str) -> str:
         return draft
 
     except Exception as e:
-        return (
-            "Désolée, je rencontre un souci pour répondre. N’hésite pas à réessayer bientôt. "
-            f"(Erreur : {str(e)})"
+        # détail dans les logs du serveur seulement, jamais dans la réponse
+        print(f"[chatbot_core] {type(e).__name__}: {e}", file=sys.stderr, flush=True)
+        return ERROR_MSG
+
+def fallback_reply(user_input: str, kb: "Knowledge") -> str:
+    """Modèle hors délai : passage le plus pertinent de la base s'il est assez sûr, sinon message d'attente."""
+    hits = kb.index.search(user_input, k=1)
+    if hits and hits[0][0] >= FALLBACK_SNIPPET_MIN_SCORE:
+        text = " ".join(hits[0][1]["text"].split())
+        if len(text) > 400:
+            text = text[:400].rsplit(" ", 1)[0] + "…"
+        return f"Voici ce que j’ai trouvé à ce sujet :\n\n{text}"
+    return HOLDING_MSG
+
+# ----------------------------------------------------------------------
+# INITIALISATION (immédiate, ou en arrière-plan si LAZY_INIT)
+# ----------------------------------------------------------------------
+def init_components() -> None:
+    global LLM, KNOWLEDGE
+    with STARTUP.step("provider_client (requests)", kind="import"):
+        from provider_client import ProviderClient
+    with STARTUP.step("client LLM"):
+        llm = ProviderClient.from_env()
+        llm.on_discard = lambda res: TOKENS.record_discarded(res.text, res.usage)  # perdante d'un hedge
+    with STARTUP.step("kb_live (numpy)", kind="import"):
+        from kb_live import LiveKnowledge
+    with STARTUP.step("base de connaissances (snapshot, index, FAQ)"):
+        kb = LiveKnowledge(
+            os.getenv("KB_SNAPSHOT_PATH", "instance/kb_snapshot.bin"),
+            os.getenv("KB_INDEX_PATH", "instance/kb_index.npz"),
+            FAQ_PATH,
+            interval=float(os.getenv("KB_WATCH_INTERVAL", 30)),
+            # TF-IDF de n-grammes de caractères (faq_match.py) : tolère fautes et reformulations
+            faq_options={
+                "min_confidence": float(os.getenv("FAQ_MIN_CONFIDENCE", 0.8)),
+                "min_score": float(os.getenv("FAQ_MIN_SCORE", 0.4)),
+            },
         )
+    LLM, KNOWLEDGE = llm, kb
+
+STARTUP.run(init_components, lazy=LAZY_INIT)
@@ -0,0 +1,167 @@
+# chatlog.py — journal des échanges (JSONL), écrit hors du chemin des requêtes
+#
+# - log() ne fait qu'une mise en file (sans attente) : file pleine → enregistrement
+#   abandonné et compté (`dropped`), jamais de requête ralentie par le disque
+# - un fil d'écriture par processus vide la file par lots, sérialise, écrit, puis
+#   fsync au plus toutes les `fsync_interval` secondes
+# - un fichier par worker (pid dans le nom) : aucun verrou entre workers gunicorn
+#   chat-<date>-<pid>-<n>.jsonl ; rotation au changement de jour ou au-delà de
+#   `max_bytes`, segment fermé compressé en .jsonl.gz (optionnel) par le même fil
+
+import atexit, gzip, json, os, queue, shutil, threading, time
+
+class ChatLog:
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024, compress: bool = True,
+                 queue_size: int = 10000, batch: int = 500, flush_interval: float = 1.0,
+                 fsync_interval: float = 5.0):
+        self.directory = directory        # vide → journal désactivé
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.queue_size = queue_size
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.last_error = ""
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._pid = 0
+        self._thread: threading.Thread | None = None
+        self._file = None
+        self._path = ""
+        self._day = ""
+        self._seq = 0
+        self._size = 0
+        self._synced = 0.0
+        if directory:
+            atexit.register(self.close)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    # -------------------------
+    # Côté requête
+    # -------------------------
+    def log(self, record: dict) -> bool:
+        """Met `record` en file ; faux s'il a été abandonné (journal désactivé ou file pleine)."""
+        if not self.directory:
+            return False
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # processus forké (gunicorn --preload) : file et fichier propres à ce worker
+            self._queue = queue.Queue(self.queue_size)
+            self._file, self._path, self._day, self._seq = None, "", "", 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="chatlog", daemon=True)
+            self._thread.start()
+
+    # -------------------------
+    # Fil d'écriture
+    # -------------------------
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            try:
+                items = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                items = []
+            while items and len(items) < self.batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items:  # close()
+                stop = True
+                items = [r for r in items if r is not None]
+            try:
+                self._write(items)
+                if self._file and (stop or time.monotonic() - self._synced >= self.fsync_interval):
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._synced = time.monotonic()
+            except (OSError, TypeError, ValueError) as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.dropped += len(items)
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write(self, items: list[dict]) -> None:
+        if not items:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in items).encode("utf-8")
+        day = time.strftime("%Y-%m-%d")
+        full = self.max_bytes and self._size and self._size + len(data) > self.max_bytes
+        if self._file is None or day != self._day or full:
+            self._rotate(day)
+        self._file.write(data)
+        self._size += len(data)
+        self.written += len(items)
+
+    def _rotate(self, day: str) -> None:
+        closed = ""
+        if self._file is not None:
+            self._file.close()
+            closed = self._path
+            self.rotations += 1
+        if day != self._day:
+            self._day, self._seq = day, 0
+        else:
+            self._seq += 1
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            path = os.path.join(self.directory, f"chat-{day}-{self._pid}-{self._seq:03d}.jsonl")
+            if not os.path.exists(f"{path}.gz"):
+                break
+            self._seq += 1  # pid réutilisé après un redémarrage : segment déjà archivé
+        self._path = path
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        if closed and self.compress:
+            self._gzip(closed)
+
+    @staticmethod
+    def _gzip(path: str) -> None:
+        with open(path, "rb") as src, gzip.open(f"{path}.gz.tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(f"{path}.gz.tmp", f"{path}.gz")
+        os.remove(path)
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Vide la file et ferme le fichier (à la sortie du processus)."""
+        t = self._thread
+        if t is None or self._pid != os.getpid() or not t.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        t.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "file": self._path or None,
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "last_error": self.last_error or None,
+        }
@@ -0,0 +1,72 @@
+# concurrency.py — limiteur de concurrence pour les appels modèle (par worker)
+#
+# Au plus `max_active` appels en parallèle ; au-delà, une file d'attente bornée
+# (`max_waiting`, `wait_timeout`). File pleine ou attente trop longue → Overloaded,
+# que /chat transforme en réponse 503 rapide plutôt que d'empiler les requêtes.
+# acquire(timeout) : attente plus courte (ex. délai de réponse) → GateTimeout.
+
+import threading, time
+from contextlib import contextmanager
+
+class Overloaded(Exception):
+    """Plus de place (ni en cours, ni en file d'attente)."""
+
+class GateTimeout(Overloaded):
+    """Pas de place libérée dans le temps d'attente."""
+
+class ConcurrencyGate:
+    def __init__(self, max_active: int = 4, max_waiting: int = 8, wait_timeout: float = 10.0):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float | None = None) -> None:
+        """Prend une place ; `timeout` (défaut `wait_timeout`) borne l'attente dans la file."""
+        with self._cond:
+            if self.active < self.max_active and not self.waiting:
+                self.active += 1
+                return
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise Overloaded("file d'attente pleine")
+            self.waiting += 1
+            deadline = time.monotonic() + (self.wait_timeout if timeout is None else timeout)
+            try:
+                while self.active >= self.max_active:
+                    remain = deadline - time.monotonic()
+                    if remain <= 0:
+                        self.timeouts += 1
+                        raise GateTimeout("attente trop longue")
+                    self._cond.wait(remain)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_active": self.max_active,
+                "max_waiting": self.max_waiting,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
@@ -0,0 +1,216 @@
+# conversation.py — mémoire de conversation côté serveur (clé = identifiant de session)
+#
+# - on garde les `keep_turns` derniers échanges mot pour mot ; les plus anciens sont
+#   repliés dans un résumé compact (une ligne question → début de réponse), lui-même
+#   borné à `summary_chars` : la taille du prompt reste stable quelle que soit la durée
+# - LRU + TTL en mémoire (au plus `max_sessions` conversations) ; ou SQLite (WAL),
+#   partagé par tous les workers gunicorn, avec les mêmes bornes
+
+import json, os, re, sqlite3, threading, time
+from collections import OrderedDict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    sid     TEXT PRIMARY KEY,
+    turns   TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations(updated);
+"""
+
+def _clip(text: str, limit: int) -> str:
+    text = re.sub(r"\s+", " ", text or "").strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def _first_sentence(text: str, limit: int) -> str:
+    text = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text or "")  # liens → ancre seule
+    text = text.replace("**", "")
+    m = re.match(r"(.+?[.!?])(\s|$)", text.strip(), re.S)
+    return _clip(m.group(1) if m else text, limit)
+
+# Relance : le message ne se comprend qu'avec l'échange précédent (mots normalisés, fuzzy.norm)
+FOLLOW_UP_STARTS = {"et", "mais", "alors", "donc", "sinon", "aussi", "puis"}  # pas « ou » : « où » s'écrit pareil une fois normalisé
+ANAPHORA_TERMS = {
+    "il", "ils", "elle", "elles", "lui", "leur", "leurs", "ca", "cela", "ceci", "celui", "celle",
+    "ceux", "celles", "cet", "cette", "ces", "meme", "memes", "pareil", "autre", "autres", "dernier",
+    "precedent",
+}
+IMPERSONAL = {"y", "faut", "reste"}  # « il y a », « il faut », « il reste » : pas d'anaphore
+FOLLOW_UP_WORDS = 3  # message court sans sujet reconnu : suite de la conversation
+
+def is_follow_up(words: list[str], topical: bool = False) -> bool:
+    """Vrai si la réponse dépend de l'historique (anaphore, « et … ? », message très court hors sujet).
+
+    Les questions autonomes peuvent alors partager cache et regroupement entre sessions.
+    """
+    if not words:
+        return False
+    if words[0] in FOLLOW_UP_STARTS:
+        return True
+    for i, w in enumerate(words):
+        if w in ANAPHORA_TERMS and not (w == "il" and i + 1 < len(words) and words[i + 1] in IMPERSONAL):
+            return True
+    return len(words) <= FOLLOW_UP_WORDS and not topical
+
+class Conversation:
+    __slots__ = ("turns", "summary")
+
+    def __init__(self, turns: list[dict] | None = None, summary: str = ""):
+        self.turns = turns or []      # [{"user": ..., "assistant": ...}, ...] du plus ancien au plus récent
+        self.summary = summary
+
+    @property
+    def empty(self) -> bool:
+        return not self.turns and not self.summary
+
+    def messages(self) -> list[dict]:
+        out = []
+        for t in self.turns:
+            out.append({"role": "user", "content": t["user"]})
+            out.append({"role": "assistant", "content": t["assistant"]})
+        return out
+
+class ConversationStore:
+    def __init__(self, path: str = "", ttl: float = 1800, max_sessions: int = 2000,
+                 keep_turns: int = 4, summary_chars: int = 600, turn_chars: int = 600):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.keep_turns = keep_turns
+        self.summary_chars = summary_chars
+        self.turn_chars = turn_chars
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._mem: OrderedDict[str, tuple[float, Conversation]] = OrderedDict()
+        self.evicted = 0
+        if self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db().executescript(SCHEMA)
+            except Exception:
+                self.path = ""  # SQLite indisponible → repli en mémoire
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    # -------------------------
+    # API
+    # -------------------------
+    def get(self, sid: str) -> Conversation:
+        if not sid:
+            return Conversation()
+        now = time.time()
+        if self.path:
+            try:
+                row = self._db().execute(
+                    "SELECT turns, summary FROM conversations WHERE sid = ? AND updated > ?",
+                    (sid, now - self.ttl),
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+            return Conversation(json.loads(row[0]), row[1]) if row else Conversation()
+        with self._lock:
+            entry = self._mem.get(sid)
+            if entry is None:
+                return Conversation()
+            updated, convo = entry
+            if updated <= now - self.ttl:
+                del self._mem[sid]
+                return Conversation()
+            self._mem.move_to_end(sid)
+            return Conversation(list(convo.turns), convo.summary)
+
+    def append(self, sid: str, user: str, assistant: str) -> Conversation:
+        """Ajoute un échange ; au-delà de `keep_turns`, les plus anciens rejoignent le résumé."""
+        if not sid:
+            return Conversation()
+        convo = self.get(sid)
+        convo.turns.append({"user": _clip(user, self.turn_chars), "assistant": _clip(assistant, self.turn_chars)})
+        while len(convo.turns) > self.keep_turns:
+            old = convo.turns.pop(0)
+            convo.summary = self._fold(convo.summary, old)
+        self._save(sid, convo)
+        return convo
+
+    def reset(self, sid: str) -> None:
+        if not sid:
+            return
+        if self.path:
+            try:
+                self._db().execute("DELETE FROM conversations WHERE sid = ?", (sid,))
+            except sqlite3.Error:
+                pass
+            return
+        with self._lock:
+            self._mem.pop(sid, None)
+
+    def stats(self) -> dict:
+        if self.path:
+            try:
+                (count,) = self._db().execute("SELECT COUNT(*) FROM conversations").fetchone()
+            except sqlite3.Error:
+                count = None
+        else:
+            count = len(self._mem)
+        return {
+            "backend": "sqlite" if self.path else "memory",
+            "sessions": count,
+            "max_sessions": self.max_sessions,
+            "evicted": self.evicted,
+            "keep_turns": self.keep_turns,
+        }
+
+    # -------------------------
+    # Internes
+    # -------------------------
+    def _fold(self, summary: str, turn: dict) -> str:
+        line = f"- {_clip(turn['user'], 120)} → {_first_sentence(turn['assistant'], 160)}"
+        lines = [l for l in summary.split("\n") if l] + [line]
+        while len(lines) > 1 and len("\n".join(lines)) > self.summary_chars:
+            lines.pop(0)
+        text = "\n".join(lines)
+        return text if len(text) <= self.summary_chars else text[:self.summary_chars - 1] + "…"
+
+    def _save(self, sid: str, convo: Conversation) -> None:
+        now = time.time()
+        if self.path:
+            try:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO conversations(sid, turns, summary, updated) VALUES(?, ?, ?, ?)",
+                    (sid, json.dumps(convo.turns, ensure_ascii=False), convo.summary, now),
+                )
+                self._evict_db(db, now)
+            except sqlite3.Error:
+                pass
+            return
+        with self._lock:
+            self._mem[sid] = (now, convo)
+            self._mem.move_to_end(sid)
+            # TTL : les plus anciennes sont en tête
+            while self._mem:
+                first_sid, (updated, _) = next(iter(self._mem.items()))
+                if updated > now - self.ttl and len(self._mem) <= self.max_sessions:
+                    break
+                del self._mem[first_sid]
+                self.evicted += 1
+
+    def _evict_db(self, db: sqlite3.Connection, now: float) -> None:
+        cur = db.execute("DELETE FROM conversations WHERE updated <= ?", (now - self.ttl,))
+        self.evicted += max(cur.rowcount, 0)
+        (count,) = db.execute("SELECT COUNT(*) FROM conversations").fetchone()
+        if count > self.max_sessions:
+            db.execute(
+                "DELETE FROM conversations WHERE sid IN "
+                "(SELECT sid FROM conversations ORDER BY updated ASC LIMIT ?)",
+                (count - self.max_sessions,),
+            )
+            self.evicted += count - self.max_sessions
@@ -0,0 +1,296 @@
+# coverage_report.py — questions qui échappent encore aux réponses rapides (journal chatlog.py)
+#
+#   python coverage_report.py instance/chatlog --top 15
+#   python coverage_report.py logs/ --tenant delphine-letort --since 2026-09-01 --json rapport.json
+#
+# - lit les chat-*.jsonl(.gz) en flux ; garde les questions parties vers le modèle (source
+#   model / cache / degraded) : réponses rapides et FAQ n'ont rien trouvé pour elles
+# - regroupe les questions proches par similarité de Jaccard des trigrammes (norm / trigrams,
+#   comme fuzzy.py) sans comparer toutes les paires : signatures MinHash, LSH par bandes,
+#   seules les paires d'un même seau sont vérifiées (union-find)
+# - classe les groupes par temps passé en amont (étape "model" du journal) ou par volume
+# - pour les premiers groupes : mot-clé caractéristique → entrées COURSE_FAST / INTENT_MAP
+#   à compléter, puis rejeu des questions avec ces mots-clés (même index et même seuil 0.40
+#   que quick_course_match) → taux de réponses rapides estimé avant / après
+#
+# Hors ligne, sans import de app.py : seulement fuzzy.py et numpy.
+
+import argparse, gzip, json, os, re, sys, time, zlib
+from collections import Counter
+
+import numpy as np
+
+from fuzzy import norm, trigrams, KeywordMatcher
+
+MISS_SOURCES = ("model", "cache", "degraded")  # fast path manqué (le cache évite l'appel, pas le passage au modèle)
+FAST_SOURCES = ("fast",)
+QUICK_THRESHOLD = 0.40              # seuil de MessageAnalysis.course_kw
+
+STOPWORDS = set("""
+a ai au aux avec avez avoir bien bonjour c ca ce cela ces cest comment combien d dans de des
+du elle en est et etre fait faire faut il ils j je l la le les leur lui m ma mais me merci mes
+moi mon n ne nous on ou par pas peut peux plus possible pour pourquoi puis qu quand que quel
+quelle quelles quels qui quoi s sa sans se ses si sil son sont suis sur svp t ta te tes toi ton
+tres tu un une vos votre vous y oui non plait aussi cours danse ans
+""".split())
+
+# =========================
+# Lecture du journal
+# =========================
+def log_files(paths: list[str]) -> list[str]:
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(os.path.join(p, fn) for fn in os.listdir(p)
+                            if fn.startswith("chat-") and fn.endswith((".jsonl", ".jsonl.gz")))
+        else:
+            files.append(p)
+    return files
+
+def read_log(files: list[str]):
+    for path in files:
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue  # ligne tronquée (worker arrêté pendant une écriture)
+                    if isinstance(row, dict):
+                        yield row
+        except (OSError, EOFError) as e:
+            print(f"[coverage] {path} ignoré : {e}", file=sys.stderr)
+
+class Question:
+    """Une question normalisée distincte, avec son volume et le temps amont cumulé."""
+    __slots__ = ("text", "count", "model_s", "tokens")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.count = 0
+        self.model_s = 0.0
+        self.tokens = 0
+
+def collect(files: list[str], tenant: str = "", since: float = 0.0) -> tuple[Counter, dict[str, Question]]:
+    """(enregistrements par origine, questions manquées par texte normalisé)."""
+    sources: Counter = Counter()
+    missed: dict[str, Question] = {}
+    for row in read_log(files):
+        if tenant and row.get("tenant") != tenant:
+            continue
+        if since and (row.get("ts") or 0) < since:
+            continue
+        source = row.get("source") or "?"
+        sources[source] += 1
+        if source not in MISS_SOURCES:
+            continue
+        text = norm(row.get("text") or "")
+        if not text:
+            continue
+        qu = missed.get(text)
+        if qu is None:
+            qu = missed[text] = Question(text)
+        qu.count += 1
+        qu.model_s += (row.get("stages") or {}).get("model", 0.0)
+        tokens = row.get("tokens") or {}
+        qu.tokens += sum(v for v in tokens.values() if isinstance(v, (int, float))) if isinstance(tokens, dict) else 0
+    return sources, missed
+
+# =========================
+# Regroupement : MinHash + LSH
+# =========================
+PRIME = (1 << 31) - 1
+
+class MinHashLSH:
+    """`bands` × `rows` permutations ; deux textes de Jaccard J partagent un seau avec
+    une probabilité 1 - (1 - J^rows)^bands (≈ 0.4 à J = 0.45 avec 16 × 4)."""
+
+    def __init__(self, bands: int = 16, rows: int = 4, seed: int = 7):
+        rng = np.random.default_rng(seed)
+        n = bands * rows
+        self.bands, self.rows = bands, rows
+        self.a = rng.integers(1, PRIME, n, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, n, dtype=np.uint64)
+
+    def signatures(self, grams: list[set], chunk: int = 2000) -> np.ndarray:
+        """Signatures (len(grams) × permutations) calculées par paquets vectorisés."""
+        out = np.empty((len(grams), len(self.a)), dtype=np.uint64)
+        for start in range(0, len(grams), chunk):
+            part = grams[start:start + chunk]
+            sizes = np.fromiter((len(g) for g in part), dtype=np.int64, count=len(part))
+            h = np.fromiter((zlib.crc32(g.encode("utf-8")) & PRIME for gs in part for g in gs),
+                            dtype=np.uint64, count=int(sizes.sum()))
+            offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+            values = (self.a[:, None] * h[None, :] + self.b[:, None]) % PRIME
+            out[start:start + len(part)] = np.minimum.reduceat(values, offsets, axis=1).T
+        return out
+
+    def buckets(self, grams: list[set]) -> dict[tuple, list[int]]:
+        keep = [i for i, g in enumerate(grams) if g]
+        sigs = self.signatures([grams[i] for i in keep])
+        out: dict[tuple, list[int]] = {}
+        for band in range(self.bands):
+            rows = np.ascontiguousarray(sigs[:, band * self.rows:(band + 1) * self.rows])
+            for i, key in zip(keep, rows.view(f"V{rows.itemsize * self.rows}").ravel().tolist()):
+                out.setdefault((band, key), []).append(i)
+        return out
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def content(text: str) -> str:
+    """Mots porteurs de sens (sans mots outils) : « est ce qu il y a un vestiaire » → « vestiaire »."""
+    return " ".join(w for w in text.split() if w not in STOPWORDS) or text
+
+def cluster(texts: list[str], threshold: float = 0.45, window: int = 20) -> list[list[int]]:
+    """Groupes d'indices de `texts` ; paires candidates (même seau LSH) vérifiées à `threshold`
+    sur les trigrammes des mots porteurs de sens.
+
+    Dans un seau très peuplé, chaque texte n'est comparé qu'aux `window` précédents.
+    """
+    grams = [trigrams(content(t)) for t in texts]
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for members in MinHashLSH().buckets(grams).values():
+        for k, i in enumerate(members):
+            for j in members[max(0, k - window):k]:
+                ri, rj = find(i), find(j)
+                if ri != rj and jaccard(grams[i], grams[j]) >= threshold:
+                    parent[ri] = rj
+    groups: dict[int, list[int]] = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+# =========================
+# Candidats (mot-clé par groupe) et rejeu
+# =========================
+def terms(text: str) -> set[str]:
+    words = [w for w in text.split() if len(w) >= 3 and w not in STOPWORDS and not w.isdigit()]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+def best_term(members: list[Question], volume: Counter, total: int) -> str | None:
+    """Terme présent dans le plus de questions du groupe et le moins ailleurs (volume pondéré)."""
+    inside: Counter = Counter()
+    for qu in members:
+        for t in terms(qu.text):
+            inside[t] += qu.count
+    size = sum(qu.count for qu in members)
+    rest = max(1, total - size)
+    # à score égal, le terme le plus court (un mot plutôt qu'une paire) : plus de variantes couvertes
+    scored = [(inside[t] / size - (volume[t] - inside[t]) / rest, -len(t), t) for t in inside]
+    return max(scored)[2] if scored else None
+
+def python_repr(s: str) -> str:
+    return json.dumps(s, ensure_ascii=False)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Questions envoyées au modèle, regroupées → nouvelles réponses rapides")
+    ap.add_argument("paths", nargs="*", default=[os.getenv("CHAT_LOG_DIR") or "instance/chatlog"],
+                    help="dossiers du journal ou fichiers chat-*.jsonl(.gz)")
+    ap.add_argument("--tenant", default="", help="un seul studio (les règles sont propres à chaque studio)")
+    ap.add_argument("--since", default="", help="date AAAA-MM-JJ")
+    ap.add_argument("--threshold", type=float, default=0.45, help="similarité trigrammes pour grouper deux questions")
+    ap.add_argument("--sort", choices=("latency", "volume"), default="latency")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--min-size", type=int, default=3, help="questions minimum pour proposer une règle")
+    ap.add_argument("--json", default="", help="rapport complet en JSON")
+    args = ap.parse_args()
+
+    files = log_files(args.paths)
+    if not files:
+        sys.exit(f"aucun fichier chat-*.jsonl dans {', '.join(args.paths)}")
+    since = time.mktime(time.strptime(args.since, "%Y-%m-%d")) if args.since else 0.0
+    t0 = time.perf_counter()
+    sources, missed = collect(files, args.tenant, since)
+    questions = sorted(missed.values(), key=lambda qu: -qu.count)
+    groups = cluster([qu.text for qu in questions], args.threshold)
+    elapsed = time.perf_counter() - t0
+
+    volume: Counter = Counter()
+    for qu in questions:
+        for t in terms(qu.text):
+            volume[t] += qu.count
+    miss_total = sum(qu.count for qu in questions)
+
+    clusters = []
+    for g in groups:
+        members = sorted((questions[i] for i in g), key=lambda qu: (-qu.count, len(qu.text)))
+        size = sum(qu.count for qu in members)
+        clusters.append({
+            "size": size,
+            "distinct": len(members),
+            "model_s": round(sum(qu.model_s for qu in members), 3),
+            "tokens": sum(qu.tokens for qu in members),
+            "examples": [qu.text for qu in members[:5]],
+            "keyword": best_term(members, volume, miss_total) if size >= args.min_size else None,
+            "texts": {qu.text for qu in members},
+        })
+    order = "model_s" if args.sort == "latency" else "size"
+    clusters.sort(key=lambda c: (-c[order], -c["size"]))
+    top, seen = [], set()
+    for c in clusters:
+        if c["keyword"] and c["keyword"] not in seen and len(top) < args.top:
+            seen.add(c["keyword"])
+            top.append(c)
+
+    # rejeu : premier candidat au-dessus du seuil, dans l'ordre (comme course_fast)
+    keywords = [c["keyword"] for c in top]
+    gained, gained_s = Counter(), Counter()
+    outside = Counter()
+    if keywords:
+        matcher = KeywordMatcher({"candidates": keywords})
+        owner = {c["keyword"]: c for c in top}
+        for qu in questions:
+            kw = matcher.scan(qu.text).first("candidates", threshold=QUICK_THRESHOLD)
+            if kw:
+                gained[kw] += qu.count
+                gained_s[kw] += qu.model_s
+                if qu.text not in owner[kw]["texts"]:
+                    outside[kw] += qu.count
+    fast = sum(sources[s] for s in FAST_SOURCES)
+    base = fast + miss_total
+    before = fast / base if base else 0.0
+    after = (fast + sum(gained.values())) / base if base else 0.0
+
+    print(f"[coverage] {len(files)} fichiers, {sum(sources.values())} échanges ({dict(sources.most_common())})")
+    print(f"[coverage] {miss_total} questions au modèle, {len(questions)} distinctes, "
+          f"{len(clusters)} groupes ({elapsed:.1f} s)")
+    print(f"[coverage] réponses rapides : {before:.1%} → {after:.1%} estimé avec les {len(keywords)} règles proposées\n")
+    print("# --- candidats COURSE_FAST (réponses à rédiger) ---")
+    for c in top:
+        kw = c["keyword"]
+        print(f"# {c['size']} questions, {c['model_s']:.1f} s en amont, rejeu : {gained[kw]} couvertes "
+              f"dont {outside[kw]} hors groupe — ex. {' / '.join(c['examples'][:3])}")
+        print(f"({python_repr(kw)}, \"À compléter\"),")
+    print("\n# --- candidats INTENT_MAP (clé d'URL à ajouter au studio) ---")
+    for c in top:
+        key = re.sub(r"\W+", "_", c["keyword"]).strip("_")
+        pattern = r"\s+".join(re.escape(w) + ("" if w.endswith("s") else "s?") for w in c["keyword"].split())  # pluriel toléré, comme INTENT_MAP
+        print(f"(re.compile(r\"\\b({pattern})\\b\", re.I), (\"À compléter\", {python_repr(key)})),")
+
+    if args.json:
+        report = {
+            "files": len(files),
+            "sources": dict(sources),
+            "missed": miss_total,
+            "distinct": len(questions),
+            "fast_rate_before": round(before, 4),
+            "fast_rate_after": round(after, 4),
+            "model_s_saved": round(sum(gained_s.values()), 3),
+            "clusters": [{**{k: v for k, v in c.items() if k != "texts"},
+                          "replay_hits": gained[c["keyword"]], "replay_outside": outside[c["keyword"]]}
+                         for c in top],
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
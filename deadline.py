@@ -0,0 +1,77 @@
+# deadline.py — réponse dans un délai (SLO), l'appel lent continue en arrière-plan
+#
+# - Deadline.run(fn, timeout) : exécute `fn` dans un thread d'arrière-plan et attend au plus
+#   `timeout` secondes. Dépassé → DeadlineExceeded, la requête sert une réponse locale ;
+#   l'appel n'est pas annulé : il se termine seul (dans app.py il remplit le cache de
+#   réponses, et le visiteur suivant a la vraie réponse tout de suite)
+# - au plus `max_background` appels en cours : au-delà (fournisseur bloqué, appels orphelins
+#   qui s'accumulent), DeadlineExceeded immédiat, sans nouvel appel amont
+# - compteurs : à l'heure, dépassements, saturation, fins tardives (réussies / en échec)
+# Seul l'appel amont doit passer par ici : une attente (file MODEL_GATE, résultat d'un autre
+# visiteur) se borne avec un timeout dans le thread de la requête, sans occuper de place.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+class DeadlineExceeded(Exception):
+    """Pas de réponse dans le délai ; l'appel continue en arrière-plan."""
+
+class DeadlineSaturated(DeadlineExceeded):
+    """Trop d'appels en arrière-plan : `fn` n'a pas été lancée."""
+
+class Deadline:
+    def __init__(self, max_background: int = 16, on_event=None):
+        self.max_background = max_background
+        self.on_event = on_event          # on_event(nom du compteur), ex. métriques Prometheus
+        self._slots = threading.BoundedSemaphore(max_background)
+        self._pool = ThreadPoolExecutor(max_background, thread_name_prefix="deadline")
+        self._lock = threading.Lock()
+        self.running = 0
+        self.counts = {"on_time": 0, "timeouts": 0, "saturated": 0, "late_ok": 0, "late_error": 0}
+
+    def run(self, fn, timeout: float | None):
+        """Résultat de `fn()` (ou son exception) s'il arrive dans `timeout` secondes ; None → pas de délai."""
+        if timeout is None:
+            return fn()
+        if not self._slots.acquire(blocking=False):
+            self._count("saturated")
+            raise DeadlineSaturated("trop d'appels en arrière-plan")
+        late: list[bool] = []
+        with self._lock:
+            self.running += 1
+        future = self._pool.submit(fn)
+        future.add_done_callback(lambda f: self._done(f, late))
+        try:
+            result = future.result(max(0.0, timeout))
+        except FutureTimeout:
+            with self._lock:
+                if not future.done():
+                    late.append(True)   # lu par _done (sous le même verrou)
+            if late:
+                self._count("timeouts")
+                raise DeadlineExceeded(f"pas de réponse en {timeout:.1f} s") from None
+            result = future.result()    # terminé entre-temps
+        self._count("on_time")
+        return result
+
+    def expire(self) -> None:
+        """Délai écoulé avant l'appel (attente hors d'ici) : compté comme dépassement."""
+        self._count("timeouts")
+
+    def _done(self, future, late: list[bool]) -> None:
+        self._slots.release()
+        with self._lock:
+            self.running -= 1
+            if not late:
+                return
+        self._count("late_error" if future.exception() else "late_ok")
+
+    def _count(self, event: str) -> None:
+        with self._lock:
+            self.counts[event] += 1
+        if self.on_event:
+            self.on_event(event)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"running": self.running, "max_background": self.max_background, **self.counts}
@@ -0,0 +1,184 @@
+# faq_match.py — réponse directe depuis la FAQ (data/faq_danse.json), sans appel modèle
+#
+# - chaque question de la FAQ devient un vecteur TF-IDF de n-grammes de caractères
+#   (3 à 5, par mot) : robuste aux fautes, pluriels et formulations libres ;
+#   la matrice (entrées × n-grammes, lignes normées) est calculée une fois au démarrage
+# - une question entrante = un seul produit matrice × vecteur → cosinus avec chaque entrée
+# - confiance calibrée sur la FAQ elle-même : les questions de la FAQ sont distinctes,
+#   leurs similarités mutuelles donnent la distribution des scores « hors sujet » ;
+#   confiance = part de ces scores battue par le meilleur score, pondérée par l'écart
+#   avec le 2e candidat (deux entrées presque à égalité → question ambiguë)
+# - réponse directe seulement si la question de la FAQ couvre chaque mot porteur de sens
+#   de la question entrante : « annuler mon inscription » ressemble à « comment s'effectue
+#   l'inscription » mais « annuler » n'y figure pas → pas de réponse directe
+
+import json, math
+
+import numpy as np
+
+from fuzzy import norm
+from retrieval import STOPWORDS
+
+NGRAMS = (3, 4, 5)
+MARGIN = 0.15  # écart de cosinus avec le 2e candidat au-delà duquel la question n'est plus ambiguë
+# présents dans presque toute question au centre : ne distinguent aucune entrée
+DOMAIN_WORDS = {"centre", "danse", "delphine", "letort", "cours"}
+# tournures de la question, sans objet propre : n'ont pas à figurer dans l'entrée de la FAQ
+FILLER_WORDS = {
+    "comment", "quel", "quels", "quelle", "quelles", "est", "veux", "voudrais", "aimerais",
+    "souhaite", "souhaiterais", "peux", "peut", "pouvez", "puis", "savoir", "passe", "fait", "faire",
+    "bonjour", "merci", "svp", "possible",
+}
+COVERAGE = 0.5  # part des n-grammes d'un mot présents dans l'entrée pour qu'il soit couvert
+
+def _grams(w: str) -> set[str]:
+    w = f" {w} "
+    return {w[i:i + n] for n in NGRAMS for i in range(max(len(w) - n + 1, 1))}
+
+def ngrams(text: str) -> dict[str, int]:
+    """N-grammes de caractères de chaque mot (avec bornes), mots vides exclus."""
+    out: dict[str, int] = {}
+    for w in norm(text).split():
+        if w in STOPWORDS or w in DOMAIN_WORDS or len(w) < 2:
+            continue
+        w = f" {w} "
+        for n in NGRAMS:
+            for i in range(max(len(w) - n + 1, 1)):
+                g = w[i:i + n]
+                out[g] = out.get(g, 0) + 1
+    return out
+
+def content_words(text: str) -> list[str]:
+    """Mots porteurs de sens : ni mots vides, ni mots du domaine, ni tournures (FILLER_WORDS)."""
+    return [w for w in norm(text).split()
+            if len(w) > 2 and w not in STOPWORDS and w not in DOMAIN_WORDS and w not in FILLER_WORDS]
+
+class FAQMatch:
+    __slots__ = ("question", "answer", "score", "confidence", "index")
+
+    def __init__(self, question: str, answer: str, score: float, confidence: float, index: int):
+        self.question = question
+        self.answer = answer
+        self.score = score              # cosinus TF-IDF avec la meilleure entrée
+        self.confidence = confidence    # 0..1, voir FAQMatcher.confidence
+        self.index = index
+
+class FAQMatcher:
+    """Matrice TF-IDF (n-grammes de caractères) des questions de la FAQ."""
+
+    def __init__(self, entries: list[dict], min_confidence: float = 0.8, min_score: float = 0.4):
+        self.entries = [e for e in entries
+                        if isinstance(e, dict) and e.get("question") and e.get("answer")]
+        self.min_confidence = min_confidence
+        self.min_score = min_score
+        docs = [ngrams(e["question"]) for e in self.entries]
+        self.grams = [set(grams) for grams in docs]   # couverture des mots (uncovered)
+        self.vocab: dict[str, int] = {}
+        for grams in docs:
+            for g in grams:
+                self.vocab.setdefault(g, len(self.vocab))
+        n = len(docs)
+        tf = np.zeros((n, max(len(self.vocab), 1)), dtype=np.float32)
+        for i, grams in enumerate(docs):
+            for g, c in grams.items():
+                tf[i, self.vocab[g]] = 1 + math.log(c)   # tf sous-linéaire
+        df = (tf > 0).sum(axis=0)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        self.idf_unseen = math.log(1 + n) + 1   # df = 0
+        self.matrix = self._normalize(tf * self.idf)
+        self.null = self._null_scores()
+
+    @classmethod
+    def from_file(cls, path: str, **kw) -> "FAQMatcher":
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = []
+        return cls(entries if isinstance(entries, list) else [], **kw)
+
+    @staticmethod
+    def _normalize(m: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(m, axis=-1, keepdims=True)
+        return m / np.where(norms > 0, norms, 1)
+
+    def _null_scores(self) -> np.ndarray:
+        """Meilleure similarité de chaque question de la FAQ avec une *autre* entrée (triée)."""
+        if len(self.entries) < 2:
+            return np.zeros(0, dtype=np.float32)
+        sims = self.matrix @ self.matrix.T
+        np.fill_diagonal(sims, -1)
+        return np.sort(sims.max(axis=1))
+
+    def vector(self, text: str) -> np.ndarray:
+        """Vecteur de la question, normé en comptant aussi les n-grammes absents de la FAQ :
+        une question qui parle d'autre chose (« âge » au lieu de « tenue ») perd du score."""
+        v = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        unseen = 0.0
+        for g, c in ngrams(text).items():
+            j = self.vocab.get(g)
+            if j is None:
+                unseen += ((1 + math.log(c)) * self.idf_unseen) ** 2
+            else:
+                v[j] = (1 + math.log(c)) * self.idf[j]
+        total = math.sqrt(float(v @ v) + unseen)
+        return v / total if total else v
+
+    def confidence(self, best: float, second: float) -> float:
+        """Part des scores « hors sujet » sous `best`, × écart avec le 2e candidat (plafonné à 1)."""
+        if best <= 0:
+            return 0.0
+        if len(self.null):
+            beaten = float(np.searchsorted(self.null, best, side="left")) / len(self.null)
+        else:
+            beaten = best
+        margin = min(1.0, (best - max(second, 0.0)) / MARGIN)
+        return round(beaten * margin, 4)
+
+    def scores(self, text: str) -> np.ndarray:
+        if not self.entries:
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix @ self.vector(text)
+
+    def match(self, text: str) -> FAQMatch | None:
+        """Meilleure entrée (même peu sûre) ; None si aucun n-gramme commun."""
+        scores = self.scores(text)
+        if not len(scores):
+            return None
+        top = np.argsort(-scores)[:2]
+        best = float(scores[top[0]])
+        if best <= 0:
+            return None
+        second = float(scores[top[1]]) if len(top) > 1 else 0.0
+        e = self.entries[int(top[0])]
+        return FAQMatch(e["question"], e["answer"], best, self.confidence(best, second), int(top[0]))
+
+    def uncovered(self, text: str, index: int) -> list[str]:
+        """Mots porteurs de sens de `text` absents (à COVERAGE près) de la question `index`."""
+        entry = self.grams[index]
+        out = []
+        for w in content_words(text):
+            g = _grams(w)
+            if len(g & entry) < COVERAGE * len(g):
+                out.append(w)
+        return out
+
+    def answer(self, text: str) -> FAQMatch | None:
+        """Entrée retenue seulement si la confiance et le score dépassent les seuils
+        et si elle couvre tous les mots porteurs de sens de la question."""
+        m = self.match(text)
+        if m is None or m.confidence < self.min_confidence or m.score < self.min_score:
+            return None
+        if self.uncovered(text, m.index):
+            return None
+        return m
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "ngrams": len(self.vocab),
+            "min_confidence": self.min_confidence,
+            "min_score": self.min_score,
+            "coverage": COVERAGE,
+            "null_max": round(float(self.null[-1]), 4) if len(self.null) else None,
+        }
@@ -0,0 +1,118 @@
+# fuzzy.py — normalisation & fuzzy-match (typos), partagé par app.py et les caches/index
+
+import re, unicodedata
+
+def norm(s: str) -> str:
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(c for c in s if unicodedata.category(c) != "Mn")
+    s = s.lower()
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    s = re.sub(r"(.)\1{2,}", r"\1\1", s)  # aaa -> aa
+    return s.strip()
+
+def trigrams(s: str) -> set:
+    s = f"  {s}  "
+    return {s[i:i+3] for i in range(len(s)-2)}
+
+def unit_trigrams(t: str) -> dict[str, set]:
+    """Trigrammes de chaque mot d'un texte normalisé, et du texte entier."""
+    return {unit: trigrams(unit) for unit in set(t.split()) | {t}}
+
+def similar(a: str, b: str) -> float:
+    A, B = trigrams(a), trigrams(b)
+    if not A or not B: return 0.0
+    return len(A & B) / len(A | B)
+
+def fuzzy_has(text: str, keywords: list[str], threshold: float = 0.45) -> bool:
+    t = norm(text)
+    words = t.split()
+    for kw in keywords:
+        k = norm(kw)
+        if k in t:
+            return True
+        for w in words:
+            if similar(w, k) >= threshold:
+                return True
+        if similar(t, k) >= threshold:
+            return True
+    return False
+
+# -------------------------
+# Index inverté de trigrammes (toutes les listes de mots-clés en une passe)
+# -------------------------
+class KeywordMatch:
+    """Scores d'un message contre chaque liste : {liste: {mot_clé: score}}.
+
+    score = 1.0 si le mot-clé normalisé est contenu dans le texte, sinon la
+    meilleure similarité trigrammes (mots du texte ou texte entier) — donc
+    `has(liste, seuil)` == `fuzzy_has(texte, liste, seuil)`.
+    """
+    __slots__ = ("scores",)
+
+    def __init__(self, scores: dict[str, dict[str, float]]):
+        self.scores = scores
+
+    def has(self, table: str, threshold: float = 0.45) -> bool:
+        return any(s >= threshold for s in self.scores[table].values())
+
+    def first(self, table: str, threshold: float = 0.45) -> str | None:
+        """Premier mot-clé (dans l'ordre de la liste) au-dessus du seuil."""
+        for kw, s in self.scores[table].items():
+            if s >= threshold:
+                return kw
+        return None
+
+    def hits(self, threshold: float = 0.45) -> dict[str, dict[str, float]]:
+        return {
+            table: {kw: s for kw, s in kws.items() if s >= threshold}
+            for table, kws in self.scores.items()
+            if any(s >= threshold for s in kws.values())
+        }
+
+class KeywordMatcher:
+    """Compile une fois des listes de mots-clés ; `scan()` les évalue toutes d'un coup."""
+
+    def __init__(self, tables: dict[str, list[str]]):
+        self.tables: dict[str, list[tuple[str, int]]] = {}
+        self.keys: list[str] = []          # mots-clés normalisés (dédoublonnés)
+        self.sizes: list[int] = []         # |trigrammes(k)|
+        self.postings: dict[str, list[int]] = {}
+        ids: dict[str, int] = {}
+        for table, keywords in tables.items():
+            entries = []
+            for kw in keywords:
+                k = norm(kw)
+                if k not in ids:
+                    ids[k] = len(self.keys)
+                    self.keys.append(k)
+                    grams = trigrams(k)
+                    self.sizes.append(len(grams))
+                    for g in grams:
+                        self.postings.setdefault(g, []).append(ids[k])
+                entries.append((kw, ids[k]))
+            self.tables[table] = entries
+
+    def scan(self, text: str) -> KeywordMatch:
+        t = norm(text)
+        return self.scan_units(t, unit_trigrams(t))
+
+    def scan_units(self, t: str, units: dict[str, set]) -> KeywordMatch:
+        """Comme `scan`, sur un texte déjà normalisé et ses trigrammes (`unit_trigrams`)."""
+        best = [0.0] * len(self.keys)
+        for grams in units.values():
+            counts: dict[int, int] = {}
+            for g in grams:
+                for i in self.postings.get(g, ()):
+                    counts[i] = counts.get(i, 0) + 1
+            n = len(grams)
+            for i, inter in counts.items():
+                score = inter / (n + self.sizes[i] - inter)
+                if score > best[i]:
+                    best[i] = score
+        for i, k in enumerate(self.keys):
+            if k in t:
+                best[i] = 1.0
+        return KeywordMatch({
+            table: {kw: best[i] for kw, i in entries}
+            for table, entries in self.tables.items()
+        })
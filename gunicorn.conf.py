@@ -0,0 +1,46 @@
+# gunicorn.conf.py — point d'entrée production :  gunicorn -c gunicorn.conf.py app:app
+#
+# Workers threadés par défaut (gthread) : un appel modèle bloquant n'immobilise
+# qu'un thread, pas tout le worker. Tout est réglable par variables d'environnement.
+# gevent est possible (GUNICORN_WORKER_CLASS=gevent) si le paquet est installé.
+
+import multiprocessing, os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", min(4, max(2, multiprocessing.cpu_count()))))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+if worker_class == "gevent":
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 200))
+
+# un appel modèle peut être long, mais pas indéfiniment
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 20))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+backlog = int(os.getenv("GUNICORN_BACKLOG", 256))
+
+# recycle les workers de temps en temps (fuites mémoire éventuelles)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+# métriques Prometheus (metrics.py) : dernière écriture à l'arrêt du worker,
+# puis son fichier rejoint l'archive
+def worker_exit(server, worker):
+    import sys
+    app_module = sys.modules.get("app")
+    if app_module is not None and hasattr(app_module, "METRICS"):
+        app_module.METRICS.flush()
+
+def child_exit(server, worker):
+    path = os.getenv("METRICS_DIR", "instance/metrics")
+    if path:
+        from metrics import archive_worker
+        try:
+            archive_worker(path, worker.pid)
+        except OSError:
+            pass
@@ -0,0 +1,549 @@
+# kb_ingest.py — ingestion de la base de connaissances (data/ + personnalisées/) → snapshot compact
+#
+# - détecte le vrai format de chaque fichier (PDF renommé en .md, JSON, Markdown, texte)
+# - extrait le texte des PDF avec zlib seulement (flux FlateDecode + CMaps ToUnicode)
+# - normalise, découpe en passages et dédoublonne (hash du texte normalisé)
+# - écrit un snapshot versionné (passages + métadonnées + hashes) lu par mmap au démarrage
+# - ré-ingestion incrémentale : seuls les fichiers dont le hash a changé sont retraités
+#
+# Usage (build/déploiement) :  python kb_ingest.py  [chemin_snapshot]
+
+import glob, hashlib, json, mmap, os, re, struct, sys, time, unicodedata, zlib
+
+KB_FOLDERS = ["data", "personnalisées"]
+SNAPSHOT_MAGIC = b"BETTYKB1"
+SNAPSHOT_FORMAT = 1
+EXTRACTOR_VERSION = 1  # à incrémenter quand l'extraction/découpage change (invalide la réutilisation)
+
+# =========================
+# Détection de format
+# =========================
+def detect_format(path: str, head: bytes) -> str:
+    """pdf | json | markdown | text | binary — d'après le contenu, pas l'extension."""
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if b"\x00" in head[:1024]:
+        return "binary"
+    try:
+        sample = head[:4096].decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start < len(head[:4096]) - 4:  # pas juste un caractère coupé en fin d'échantillon
+            return "binary"
+        sample = head[:e.start].decode("utf-8")
+    stripped = sample.lstrip("﻿ \t\r\n")
+    if path.lower().endswith(".json") or stripped[:1] in ("[", "{"):
+        return "json"
+    if path.lower().endswith(".md") or re.search(r"^#{1,6} ", sample, re.M):
+        return "markdown"
+    return "text"
+
+# =========================
+# Extraction PDF (stdlib : zlib)
+# =========================
+PDF_OBJ_RE = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+PDF_REF_RE = rb"(\d+)\s+\d+\s+R"
+
+def _pdf_dict_value(d: bytes, key: bytes) -> bytes | None:
+    """Valeur brute d'une clé de dictionnaire PDF (référence, nom, nombre, <<...>> ou [...])."""
+    m = re.search(rb"/" + key + rb"(?![A-Za-z0-9])\s*", d)
+    if not m:
+        return None
+    i = m.end()
+    if d[i:i + 2] == b"<<" or d[i:i + 1] == b"[":
+        opener, closer = (b"<<", b">>") if d[i:i + 2] == b"<<" else (b"[", b"]")
+        depth, j = 0, i
+        while j < len(d):
+            if d.startswith(opener, j):
+                depth += 1
+                j += len(opener)
+            elif d.startswith(closer, j):
+                depth -= 1
+                j += len(closer)
+                if depth == 0:
+                    return d[i:j]
+            else:
+                j += 1
+        return d[i:]
+    ref = re.match(PDF_REF_RE, d[i:])
+    if ref:
+        return ref.group(0)
+    tok = re.match(rb"[^/\s<>\[\]()]+|/[^/\s<>\[\]()]+", d[i:])
+    return tok.group(0) if tok else None
+
+def _pdf_objects(data: bytes) -> dict[int, tuple[bytes, bytes | None]]:
+    """Tous les objets {numéro: (dictionnaire, flux décompressé ou None)}, object streams inclus."""
+    objs: dict[int, tuple[bytes, bytes | None]] = {}
+    for m in PDF_OBJ_RE.finditer(data):
+        num, start = int(m.group(1)), m.end()
+        end = data.find(b"endobj", start)
+        body = data[start:end if end != -1 else len(data)]
+        s = re.search(rb"stream\r?\n", body)
+        if not s:
+            objs[num] = (body.strip(), None)
+            continue
+        head, raw = body[:s.start()], body[s.end():]
+        length = _pdf_dict_value(head, b"Length")
+        if length and length.isdigit() and int(length) <= len(raw):
+            raw = raw[:int(length)]
+        else:
+            raw = raw[:raw.rfind(b"endstream")]
+        stream = None
+        if b"/FlateDecode" in head:
+            try:
+                stream = zlib.decompressobj().decompress(raw)
+            except zlib.error:
+                stream = None
+        elif b"/Filter" not in head:
+            stream = raw
+        objs[num] = (head.strip(), stream)
+
+    # objets compressés dans des /ObjStm
+    for head, stream in list(objs.values()):
+        if stream is None or b"/ObjStm" not in head:
+            continue
+        first = int(_pdf_dict_value(head, b"First") or 0)
+        nums = [int(x) for x in stream[:first].split()]
+        pairs = list(zip(nums[0::2], nums[1::2]))
+        for k, (num, off) in enumerate(pairs):
+            end = first + pairs[k + 1][1] if k + 1 < len(pairs) else len(stream)
+            objs.setdefault(num, (stream[first + off:end].strip(), None))
+    return objs
+
+def _parse_cmap(cmap: bytes) -> tuple[dict[int, str], int]:
+    """CMap ToUnicode → ({code: texte}, largeur des codes en octets)."""
+    mapping: dict[int, str] = {}
+    width = 1
+    cs = re.search(rb"begincodespacerange\s*<([0-9A-Fa-f]+)>", cmap)
+    if cs:
+        width = max(1, len(cs.group(1)) // 2)
+
+    def u(hexstr: bytes) -> str:
+        b = bytes.fromhex(hexstr.decode())
+        return b.decode("utf-16-be", errors="ignore")
+
+    for block in re.findall(rb"beginbfchar(.*?)endbfchar", cmap, re.S):
+        for src, dst in re.findall(rb"<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]*)>", block):
+            mapping[int(src, 16)] = u(dst)
+    for block in re.findall(rb"beginbfrange(.*?)endbfrange", cmap, re.S):
+        for lo, hi, dst in re.findall(rb"<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(<[0-9A-Fa-f]*>|\[[^\]]*\])", block):
+            lo, hi = int(lo, 16), int(hi, 16)
+            if dst.startswith(b"["):
+                for k, d in enumerate(re.findall(rb"<([0-9A-Fa-f]*)>", dst)):
+                    mapping[lo + k] = u(d)
+            else:
+                base = dst.strip(b"<>")
+                start = int(base, 16) if base else 0
+                for k in range(hi - lo + 1):
+                    mapping[lo + k] = chr(start + k) if start + k < 0x110000 else ""
+    return mapping, width
+
+PDF_TOKEN_RE = re.compile(
+    rb"\((?:\\.|[^\\)])*\)"          # chaîne littérale
+    rb"|<[0-9A-Fa-f\s]*>"            # chaîne hexadécimale
+    rb"|/[^\s/<>\[\]()]+"            # nom
+    rb"|[-+]?(?:\d+\.?\d*|\.\d+)"    # nombre
+    rb"|\[|\]"
+    rb"|[A-Za-z'\"*]+",              # opérateur
+    re.S,
+)
+
+def _pdf_string(tok: bytes) -> bytes:
+    if tok.startswith(b"<"):
+        h = re.sub(rb"\s", b"", tok[1:-1])
+        return bytes.fromhex((h + b"0" * (len(h) % 2)).decode())
+    s = tok[1:-1]
+    s = re.sub(rb"\\([0-7]{1,3})", lambda m: bytes([int(m.group(1), 8) & 0xFF]), s)
+    esc = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+    return re.sub(rb"\\(.)", lambda m: esc.get(m.group(1), m.group(1)), s, flags=re.S)
+
+def _decode(raw: bytes, font: tuple[dict[int, str], int] | None) -> str:
+    if not font:
+        return raw.decode("latin-1")
+    mapping, width = font
+    out = []
+    for i in range(0, len(raw) - width + 1, width):
+        code = int.from_bytes(raw[i:i + width], "big")
+        out.append(mapping.get(code, ""))
+    return "".join(out)
+
+def _content_text(content: bytes, fonts: dict[bytes, tuple[dict[int, str], int]]) -> str:
+    lines: list[str] = []
+    line = ""
+    font, size, y, last_y = None, 12.0, 0.0, None
+    stack: list = []
+    array: list | None = None
+
+    def show(txt: str):
+        nonlocal line, last_y
+        if last_y is not None and abs(y - last_y) > 0.5:
+            lines.append(line)
+            if abs(y - last_y) > 1.8 * size:
+                lines.append("")  # grand saut vertical → nouveau paragraphe
+            line = ""
+        elif line and txt and stack_gap[0] and txt[0].isalnum() and not line[-1].isspace() \
+                and line[-1] not in "'’(«-/":
+            line += " "
+        line += txt
+        last_y = y
+        stack_gap[0] = False
+
+    stack_gap = [False]  # repositionnement horizontal depuis le dernier texte
+    for tok in PDF_TOKEN_RE.findall(content):
+        if tok == b"[":
+            array = []
+        elif tok == b"]":
+            stack.append(array or [])
+            array = None
+        elif tok[:1] in (b"(", b"<"):
+            (array if array is not None else stack).append(_pdf_string(tok))
+        elif tok[:1] == b"/":
+            (array if array is not None else stack).append(tok[1:])
+        elif re.match(rb"[-+.\d]", tok):
+            (array if array is not None else stack).append(float(tok))
+        else:
+            op = tok
+            if op == b"Tf" and len(stack) >= 2:
+                font, size = stack[-2], abs(float(stack[-1])) or size
+            elif op == b"Tm" and len(stack) >= 6:
+                y = float(stack[-1])
+                stack_gap[0] = True
+            elif op in (b"Td", b"TD") and len(stack) >= 2:
+                y += float(stack[-1])
+                stack_gap[0] = True
+            elif op in (b"T*", b"'", b'"'):
+                y += size  # ligne suivante
+                if op != b"T*" and stack and isinstance(stack[-1], bytes):
+                    show(_decode(stack[-1], fonts.get(font)))
+            elif op == b"Tj" and stack and isinstance(stack[-1], bytes):
+                show(_decode(stack[-1], fonts.get(font)))
+            elif op == b"TJ" and stack and isinstance(stack[-1], list):
+                parts = []
+                for el in stack[-1]:
+                    if isinstance(el, bytes):
+                        parts.append(_decode(el, fonts.get(font)))
+                    elif isinstance(el, float) and el < -250:
+                        parts.append(" ")  # grand espacement = espace entre mots
+                show("".join(parts))
+            stack = []
+    lines.append(line)
+    return "\n".join(lines)
+
+def extract_pdf_text(data: bytes) -> str:
+    """Texte d'un PDF (pages dans l'ordre), via les flux FlateDecode et les CMaps ToUnicode."""
+    objs = _pdf_objects(data)
+
+    def resolve(val: bytes | None) -> bytes:
+        while val is not None:
+            ref = re.fullmatch(PDF_REF_RE, val.strip())
+            if not ref:
+                return val
+            val = objs.get(int(ref.group(1)), (b"", None))[0]
+        return b""
+
+    def ref_num(val: bytes | None) -> int | None:
+        ref = re.fullmatch(PDF_REF_RE, (val or b"").strip())
+        return int(ref.group(1)) if ref else None
+
+    cmaps: dict[int, tuple[dict[int, str], int]] = {}
+
+    def font_cmap(font_num: int | None):
+        if font_num is None or font_num not in objs:
+            return None
+        if font_num not in cmaps:
+            tu = ref_num(_pdf_dict_value(objs[font_num][0], b"ToUnicode"))
+            stream = objs.get(tu, (b"", None))[1] if tu is not None else None
+            cmaps[font_num] = _parse_cmap(stream) if stream else None
+        return cmaps[font_num]
+
+    # pages dans l'ordre du document (arbre /Pages), sinon ordre des objets
+    pages: list[int] = []
+
+    def walk(num: int | None, depth: int = 0):
+        if num is None or num not in objs or depth > 32:
+            return
+        d = objs[num][0]
+        if re.search(rb"/Type\s*/Page(?![s\w])", d):
+            pages.append(num)
+        for kid in re.findall(PDF_REF_RE, _pdf_dict_value(d, b"Kids") or b""):
+            walk(int(kid), depth + 1)
+
+    root = next((h for h, _ in objs.values() if re.search(rb"/Type\s*/Catalog", h)), None)
+    walk(ref_num(_pdf_dict_value(root or b"", b"Pages")))
+    if not pages:
+        pages = sorted(n for n, (h, _) in objs.items() if re.search(rb"/Type\s*/Page(?![s\w])", h))
+
+    texts: list[str] = []
+    for num in pages:
+        d = objs[num][0]
+        res = resolve(_pdf_dict_value(d, b"Resources"))
+        parent = d
+        while not res and (parent := objs.get(ref_num(_pdf_dict_value(parent, b"Parent")) or -1, (b"", None))[0]):
+            res = resolve(_pdf_dict_value(parent, b"Resources"))
+        font_dict = resolve(_pdf_dict_value(res, b"Font"))
+        fonts = {
+            name: font_cmap(int(n))
+            for name, n in re.findall(rb"/([^\s/<>\[\]()]+)\s+(\d+)\s+\d+\s+R", font_dict)
+        }
+        contents = _pdf_dict_value(d, b"Contents") or b""
+        for c in re.findall(PDF_REF_RE, contents):
+            stream = objs.get(int(c), (b"", None))[1]
+            if stream:
+                texts.append(_content_text(stream, fonts))
+    return "\n\n".join(t for t in texts if t.strip())
+
+# =========================
+# Normalisation & découpage
+# =========================
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", text.replace("\r\n", "\n").replace("\r", "\n"))
+    text = text.replace("﻿", "").replace(" ", " ").replace("‑", "-")
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.S)   # commentaires HTML (Markdown)
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+def split_passages(text: str, chunk_chars: int = 700) -> list[str]:
+    """Découpe par paragraphes (titres Markdown = nouvelle section), ~chunk_chars par passage."""
+    passages: list[str] = []
+    heading, buf = "", ""
+
+    def flush():
+        nonlocal buf
+        if buf.strip():
+            passages.append(f"{heading}\n{buf.strip()}" if heading and heading not in buf else buf.strip())
+        buf = ""
+
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        if para.startswith("#"):
+            flush()
+            heading = para.splitlines()[0].lstrip("#").strip()
+        if buf and len(buf) + len(para) > chunk_chars:
+            flush()
+        while len(para) > chunk_chars:
+            cut = para.rfind(" ", 0, chunk_chars)
+            cut = cut if cut > 0 else chunk_chars
+            buf = para[:cut]
+            flush()
+            para = para[cut:].strip()
+        buf = f"{buf}\n\n{para}" if buf else para
+    flush()
+    return passages
+
+def _json_strings(value) -> list[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [s for v in value.values() for s in _json_strings(v)]
+    if isinstance(value, list):
+        return [s for v in value for s in _json_strings(v)]
+    return []
+
+def file_chunks(path: str, data: bytes, fmt: str) -> list[str]:
+    """Passages normalisés d'un fichier selon son format détecté."""
+    if fmt == "binary":
+        return []
+    if fmt == "pdf":
+        text = normalize_text(extract_pdf_text(data))
+        text = re.sub(r"^[\s•\d]*$", "", text, flags=re.M)      # puces / renvois de notes isolés
+        text = re.sub(r"(?<!\n)\n(?!\n)", " ", text)             # lignes recollées dans un paragraphe
+        return split_passages(normalize_text(text))
+    text = data.decode("utf-8", errors="ignore")
+    if fmt == "json":
+        try:
+            items = json.loads(text.lstrip("﻿"))
+        except ValueError:
+            return split_passages(normalize_text(text))
+        chunks = []
+        for it in items if isinstance(items, list) else [items]:
+            if isinstance(it, dict) and it.get("question") and it.get("answer"):
+                q, a = normalize_text(str(it["question"])), normalize_text(str(it["answer"]))
+                chunks.append(f"Q: {q}\nR: {a}")
+            else:
+                chunks.extend(split_passages(normalize_text("\n\n".join(_json_strings(it)))))
+        return chunks
+    return split_passages(normalize_text(text))
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+# =========================
+# Snapshot (mmap)
+# =========================
+#   SNAPSHOT_MAGIC | u32 taille de l'en-tête | en-tête JSON | textes UTF-8 concaténés
+class Snapshot:
+    """Snapshot en lecture seule, mappé en mémoire ; les textes sont décodés à la demande."""
+
+    def __init__(self, header: dict, blob, path: str = ""):
+        self.header = header
+        self.blob = blob          # mmap (ou bytes) du fichier
+        self.path = path
+        self.version: str = header["version"]
+        self.files: list[dict] = header["files"]
+        self.chunks: list[dict] = header["chunks"]
+        self._base = header["_base"]
+
+    @classmethod
+    def from_buffer(cls, buf, path: str = "") -> "Snapshot":
+        if buf[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path or 'snapshot'}: pas un snapshot KB")
+        (hlen,) = struct.unpack_from("<I", buf, len(SNAPSHOT_MAGIC))
+        start = len(SNAPSHOT_MAGIC) + 4
+        header = json.loads(bytes(buf[start:start + hlen]).decode("utf-8"))
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path or 'snapshot'}: format de snapshot obsolète")
+        header["_base"] = start + hlen
+        return cls(header, buf, path)
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_buffer(mm, path)
+
+    def text(self, i: int) -> str:
+        c = self.chunks[i]
+        off = self._base + c["offset"]
+        return bytes(self.blob[off:off + c["length"]]).decode("utf-8")
+
+    def passages(self) -> list[dict]:
+        return [{"source": c["source"], "text": self.text(i)} for i, c in enumerate(self.chunks)]
+
+    def documents(self) -> list[dict]:
+        """Un texte par fichier (passages recollés), pour les règles qui lisent un document entier."""
+        docs: dict[str, list[str]] = {}
+        for i, c in enumerate(self.chunks):
+            docs.setdefault(c["path"], []).append(self.text(i))
+        return [{"source": p, "text": "\n\n".join(parts)} for p, parts in docs.items()]
+
+def pack_snapshot(files: list[dict], chunk_texts: list[tuple[dict, str]]) -> bytes:
+    blob = bytearray()
+    chunks = []
+    for meta, text in chunk_texts:
+        raw = text.encode("utf-8")
+        chunks.append({**meta, "offset": len(blob), "length": len(raw)})
+        blob += raw
+    version = hashlib.sha1(
+        json.dumps([f["sha1"] for f in files] + [c["sha1"] for c in chunks]).encode()
+    ).hexdigest()[:16]
+    header = json.dumps({
+        "format": SNAPSHOT_FORMAT,
+        "extractor": EXTRACTOR_VERSION,
+        "version": version,
+        "created": time.time(),
+        "files": files,
+        "chunks": chunks,
+    }, ensure_ascii=False).encode("utf-8")
+    return SNAPSHOT_MAGIC + struct.pack("<I", len(header)) + header + bytes(blob)
+
+def write_snapshot(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# =========================
+# Ingestion (incrémentale)
+# =========================
+def source_files(folders: list[str] = KB_FOLDERS, extra: list[str] = ()) -> list[str]:
+    paths = [p for p in extra if os.path.isfile(p)]
+    for folder in folders:
+        if os.path.isdir(folder):
+            paths += [p for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True) if os.path.isfile(p)]
+    return sorted(set(os.path.normpath(p) for p in paths))
+
+def _stat_key(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def is_fresh(snap: Snapshot, paths: list[str]) -> bool:
+    """Vrai si aucun fichier n'a été ajouté/supprimé/modifié (stat seulement, sans lecture)."""
+    known = {f["path"]: (f["size"], f["mtime_ns"]) for f in snap.files}
+    if set(known) != set(paths):
+        return False
+    try:
+        return all(_stat_key(p) == tuple(known[p]) for p in paths)
+    except OSError:
+        return False
+
+def ingest(snapshot_path: str, folders: list[str] = KB_FOLDERS, extra: list[str] = (),
+           previous: Snapshot | None = None) -> Snapshot:
+    """(Ré)ingère les sources ; les fichiers au hash inchangé réutilisent leurs passages."""
+    paths = source_files(folders, extra)
+    if previous is None and snapshot_path and os.path.exists(snapshot_path):
+        try:
+            previous = Snapshot.open(snapshot_path)
+        except (OSError, ValueError):
+            previous = None
+    reuse: dict[str, list[str]] = {}
+    if previous is not None and previous.header.get("extractor") != EXTRACTOR_VERSION:
+        previous = None
+    if previous is not None:
+        for i, c in enumerate(previous.chunks):
+            reuse.setdefault(c["file_sha1"], []).append(previous.text(i))
+        prev_files = {f["sha1"]: f for f in previous.files}
+    else:
+        prev_files = {}
+
+    files, chunk_texts, seen_files, seen_chunks = [], [], set(), set()
+    for p in paths:
+        try:
+            with open(p, "rb") as f:
+                data = f.read()
+            size, mtime_ns = _stat_key(p)
+        except OSError:
+            continue
+        sha = hashlib.sha1(data).hexdigest()
+        if sha in prev_files:
+            fmt = prev_files[sha]["format"]
+            texts = reuse.get(sha, [])
+        else:
+            fmt = detect_format(p, data[:8192])
+            texts = file_chunks(p, data, fmt)
+        files.append({"path": p, "format": fmt, "sha1": sha, "size": size, "mtime_ns": mtime_ns,
+                      "duplicate": sha in seen_files})
+        if sha in seen_files:
+            continue  # même contenu qu'un fichier déjà ingéré
+        seen_files.add(sha)
+        for t in texts:
+            h = text_hash(t)
+            if not t.strip() or h in seen_chunks:
+                continue
+            seen_chunks.add(h)
+            chunk_texts.append(({"path": p, "source": os.path.basename(p), "file_sha1": sha, "sha1": h}, t))
+
+    data = pack_snapshot(files, chunk_texts)
+    if not snapshot_path:
+        return Snapshot.from_buffer(data)  # pas de chemin : snapshot en mémoire
+    write_snapshot(snapshot_path, data)
+    return Snapshot.open(snapshot_path)
+
+def load_snapshot(snapshot_path: str, folders: list[str] = KB_FOLDERS, extra: list[str] = ()) -> Snapshot:
+    """Snapshot à jour : mmap direct si les sources n'ont pas bougé, sinon ré-ingestion incrémentale."""
+    previous = None
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            previous = Snapshot.open(snapshot_path)
+            if previous.header.get("extractor") == EXTRACTOR_VERSION and \
+                    is_fresh(previous, source_files(folders, extra)):
+                return previous
+        except (OSError, ValueError):
+            previous = None
+    return ingest(snapshot_path, folders, extra, previous=previous)
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.getenv("KB_SNAPSHOT_PATH", "instance/kb_snapshot.bin")
+    t0 = time.perf_counter()
+    snap = load_snapshot(path, extra=[os.getenv("FAQ_PATH", "data/faq_danse.json")])
+    print(json.dumps({
+        "snapshot": path,
+        "version": snap.version,
+        "files": [{k: f[k] for k in ("path", "format", "duplicate")} for f in snap.files],
+        "chunks": len(snap.chunks),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }, ensure_ascii=False, indent=2))
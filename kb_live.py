@@ -0,0 +1,154 @@
+# kb_live.py — base de connaissances rechargée à chaud (sans redéploiement)
+#
+# - Knowledge : une version figée (snapshot KB + index BM25 + FAQ) ; jamais modifiée
+#   une fois publiée, les requêtes en cours gardent donc une vue cohérente
+# - LiveKnowledge : un fil par worker surveille les dossiers sources (data/, personnalisées/) par stat
+#   (taille + mtime, aucune API propre à l'OS) ; au moindre changement, ré-ingestion
+#   incrémentale (kb_ingest : seuls les fichiers au hash modifié sont ré-extraits),
+#   nouvel index, puis publication par simple remplacement de référence
+# - callbacks `on_swap(old, new)` : invalidation des caches liés à l'ancienne version
+
+import os, threading, time
+
+from faq_match import FAQMatcher
+from kb_ingest import KB_FOLDERS, Snapshot, ingest, is_fresh, load_snapshot, source_files
+from retrieval import KBIndex, load_or_build_index
+
+class Knowledge:
+    """Version publiée de la base : snapshot + index + FAQ (+ valeurs dérivées, calculées à la demande)."""
+
+    def __init__(self, snapshot: Snapshot, index: KBIndex, faq: FAQMatcher, faq_sha1: str = ""):
+        self.snapshot = snapshot
+        self.index = index
+        self.faq = faq
+        self.faq_sha1 = faq_sha1
+        self.version = snapshot.version
+        self.loaded_at = time.time()
+        self._derived: dict = {}
+        self._lock = threading.Lock()
+
+    def derive(self, name: str, fn):
+        """`fn(self)` calculé une seule fois pour cette version (ex. extrait de l'offre)."""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = fn(self)
+            return self._derived[name]
+
+class LiveKnowledge:
+    def __init__(self, snapshot_path: str, index_path: str, faq_path: str,
+                 folders: list[str] = KB_FOLDERS, interval: float = 30.0, faq_options: dict | None = None):
+        self.snapshot_path = snapshot_path
+        self.index_path = index_path
+        self.faq_path = faq_path
+        self.folders = folders
+        self.interval = interval          # 0 → pas de surveillance (rechargement manuel seulement)
+        self.faq_options = faq_options or {}
+        self.on_swap: list = []
+        self.reloads = 0
+        self.last_reload_s: float | None = None
+        self.last_check: float | None = None
+        self.last_error = ""
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pid = 0
+        t0 = time.perf_counter()
+        self.current = self._build(load_snapshot(snapshot_path, folders, [faq_path]), None)
+        self.last_reload_s = round(time.perf_counter() - t0, 4)
+
+    # -------------------------
+    # Construction d'une version
+    # -------------------------
+    def _faq_sha1(self, snapshot: Snapshot) -> str:
+        path = os.path.normpath(self.faq_path)
+        return next((f["sha1"] for f in snapshot.files if f["path"] == path), "")
+
+    def _build(self, snapshot: Snapshot, old: Knowledge | None) -> Knowledge:
+        if old is not None and snapshot.version == old.version:
+            index = old.index   # contenu identique (mtime seul modifié)
+        else:
+            index = load_or_build_index(self.index_path, snapshot)
+        faq_sha1 = self._faq_sha1(snapshot)
+        if old is not None and faq_sha1 == old.faq_sha1:
+            faq = old.faq
+        else:
+            faq = FAQMatcher.from_file(self.faq_path, **self.faq_options)
+        return Knowledge(snapshot, index, faq, faq_sha1)
+
+    # -------------------------
+    # Rechargement
+    # -------------------------
+    def check(self) -> bool:
+        """Recharge si une source a été ajoutée, supprimée ou modifiée ; vrai si une nouvelle version est publiée."""
+        self.last_check = time.time()
+        if is_fresh(self.current.snapshot, source_files(self.folders, [self.faq_path])):
+            return False
+        return self.reload()
+
+    def reload(self) -> bool:
+        with self._reload_lock:
+            old = self.current
+            t0 = time.perf_counter()
+            try:
+                if self.snapshot_path:
+                    # un autre worker a peut-être déjà ré-ingéré : on reprend alors son snapshot tel quel
+                    snapshot = load_snapshot(self.snapshot_path, self.folders, [self.faq_path])
+                else:
+                    snapshot = ingest("", self.folders, [self.faq_path], previous=old.snapshot)
+                new = self._build(snapshot, old)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+            self.current = new  # publication atomique (remplacement de référence)
+            self.last_error = ""
+            self.reloads += 1
+            self.last_reload_s = round(time.perf_counter() - t0, 4)
+        if new.version != old.version:
+            for fn in self.on_swap:
+                try:
+                    fn(old, new)
+                except Exception:
+                    pass
+        return new.version != old.version
+
+    # -------------------------
+    # Surveillance (1 fil par processus, relancé après fork)
+    # -------------------------
+    def watch(self) -> None:
+        if not self.interval or self._pid == os.getpid() or self._stop.is_set():
+            return
+        with self._reload_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._watch_loop, name="kb-watch", daemon=True).start()
+
+    def _watch_loop(self) -> None:
+        pid = self._pid
+        while pid == os.getpid() and not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def stop(self) -> None:
+        """Arrête la surveillance (base libérée, ex. studio évincé du LRU de tenants.py)."""
+        self._stop.set()
+
+    def stats(self) -> dict:
+        kb = self.current
+        return {
+            "version": kb.version,
+            "loaded_at": round(kb.loaded_at, 3),
+            "files": len(kb.snapshot.files),
+            "passages": len(kb.snapshot.chunks),
+            "faq_entries": len(kb.faq.entries),
+            "reloads": self.reloads,
+            "last_reload_s": self.last_reload_s,
+            "last_check": round(self.last_check, 3) if self.last_check else None,
+            "last_error": self.last_error or None,
+            "watch_interval_s": self.interval,
+        }
@@ -0,0 +1,204 @@
+# metrics.py — compteurs et histogrammes au format texte Prometheus (sans dépendance)
+#
+# Chaque worker gunicorn garde ses valeurs en mémoire et un fil d'arrière-plan les recopie
+# (au plus une fois par `flush_interval`) dans `<dir>/<pid>-<id>.json`. /metrics additionne les fichiers de
+# tous les workers : les compteurs restent cumulés quel que soit le worker qui répond.
+# Quand un worker s'arrête, gunicorn (child_exit) fusionne son fichier dans
+# `_archive.json` pour que les totaux ne reculent pas.
+# Sans dossier (`path` vide) : métriques du seul processus courant.
+
+import atexit, glob, json, os, threading, time, uuid
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ARCHIVE = "_archive.json"
+
+def _key(labels: dict) -> str:
+    return json.dumps(sorted((k, str(v)) for k, v in labels.items()), ensure_ascii=False)
+
+def _fmt_labels(pairs, extra: tuple = ()) -> str:
+    items = [*pairs, *extra]
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def _fmt_num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+class Counter:
+    def __init__(self, registry: "Registry", name: str, help: str):
+        self.registry, self.name, self.help = registry, name, help
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self.registry._add(self.name, _key(labels), amount)
+
+class Histogram:
+    def __init__(self, registry: "Registry", name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.registry, self.name, self.help = registry, name, help
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        self.registry._observe(self, _key(labels), value)
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+class Registry:
+    def __init__(self, path: str = "", flush_interval: float = 1.0, prefix: str = "betty"):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.prefix = prefix
+        self.metrics: dict[str, Counter | Histogram] = {}
+        self._values: dict[str, dict] = {}   # nom → {labels: valeur | [buckets..., somme, nombre]}
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._pid = 0  # processus propriétaire du fichier / du fil d'écriture (change après fork)
+        self.worker_file = ""
+        if self.path:
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                atexit.register(self.flush)
+            except OSError:
+                self.path = ""
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(self, f"{self.prefix}_{name}", help))
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, f"{self.prefix}_{name}", help, buckets))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        self._values.setdefault(metric.name, {})
+        return metric
+
+    # -------------------------
+    # Écriture
+    # -------------------------
+    def _add(self, name: str, key: str, amount: float) -> None:
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0.0) + amount
+        self._touch()
+
+    def _observe(self, h: Histogram, key: str, value: float) -> None:
+        with self._lock:
+            series = self._values[h.name]
+            row = series.get(key)
+            if row is None:
+                row = series[key] = [0] * (len(h.buckets) + 2)
+            for i, b in enumerate(h.buckets):
+                if value <= b:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+        self._touch()
+
+    def _touch(self) -> None:
+        if not self.path:
+            return
+        if self._pid != os.getpid():
+            self._start_worker()
+        self._dirty.set()
+
+    def _start_worker(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid:
+                # processus forké (gunicorn --preload) : on repart de zéro, le parent compte pour lui
+                for series in self._values.values():
+                    series.clear()
+            self._pid = os.getpid()
+            self.worker_file = os.path.join(self.path, f"{self._pid}-{uuid.uuid4().hex[:6]}.json")
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        pid = self._pid
+        while pid == os.getpid():
+            self._dirty.wait()
+            time.sleep(self.flush_interval)
+            self._dirty.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.path or self._pid != os.getpid():
+            return
+        with self._lock:
+            data = json.dumps(self._values)
+        tmp = f"{self.worker_file}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.worker_file)
+        except OSError:
+            pass
+
+    # -------------------------
+    # Lecture (agrégation multi-workers)
+    # -------------------------
+    def collect(self) -> dict[str, dict]:
+        if not self.path:
+            with self._lock:
+                return json.loads(json.dumps(self._values))
+        self.flush()
+        return merge_files(glob.glob(os.path.join(self.path, "*.json")))
+
+    def render(self) -> str:
+        values = self.collect()
+        out: list[str] = []
+        for name, metric in self.metrics.items():
+            series = values.get(name, {})
+            kind = "histogram" if isinstance(metric, Histogram) else "counter"
+            out.append(f"# HELP {name} {metric.help}")
+            out.append(f"# TYPE {name} {kind}")
+            for key in sorted(series):
+                labels = [tuple(p) for p in json.loads(key)]
+                v = series[key]
+                if kind == "counter":
+                    out.append(f"{name}{_fmt_labels(labels)} {_fmt_num(v)}")
+                    continue
+                for b, n in zip(metric.buckets, v):
+                    out.append(f"{name}_bucket{_fmt_labels(labels, (('le', _fmt_num(b)),))} {_fmt_num(n)}")
+                out.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {_fmt_num(v[-1])}")
+                out.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_num(round(v[-2], 6))}")
+                out.append(f"{name}_count{_fmt_labels(labels)} {_fmt_num(v[-1])}")
+        return "\n".join(out) + "\n"
+
+def merge_files(paths: list[str]) -> dict[str, dict]:
+    total: dict[str, dict] = {}
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, series in data.items():
+            dst = total.setdefault(name, {})
+            for key, v in series.items():
+                if isinstance(v, list):
+                    cur = dst.get(key)
+                    dst[key] = v if cur is None else [a + b for a, b in zip(cur, v)]
+                else:
+                    dst[key] = dst.get(key, 0.0) + v
+    return total
+
+def archive_worker(path: str, pid: int) -> None:
+    """Fusionne les fichiers d'un worker arrêté dans l'archive (hook gunicorn child_exit)."""
+    mine = glob.glob(os.path.join(path, f"{pid}-*.json"))
+    if not mine:
+        return
+    archive = os.path.join(path, ARCHIVE)
+    merged = merge_files([archive, *mine] if os.path.exists(archive) else mine)
+    tmp = f"{archive}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(merged, f)
+    os.replace(tmp, archive)
+    for p in mine:
+        os.remove(p)
@@ -0,0 +1,197 @@
+# profiling.py — profilage à la demande d'une requête (piles repliées + pstats), anneau de fichiers
+#
+# - Sampler : un seul fil par processus relève, toutes les `interval` s, la pile des threads
+#   suivis (sys._current_frames) → piles repliées « a;b;c N », lisibles par flamegraph.pl,
+#   speedscope, inferno… Temps mur : l'attente du fournisseur apparaît aussi (provider_client.py)
+# - cProfile en plus (fichier .prof pour pstats / snakeviz) quand on le demande : plus précis,
+#   plus coûteux, réservé aux captures déclenchées à la main
+# - Profiler : capture = <id>.json (métadonnées, répartition python / amont / attente, fonctions
+#   les plus échantillonnées) + <id>.collapsed (+ <id>.prof) ; au plus `keep` captures dans `directory`
+#   (les plus anciennes supprimées), partagé par les workers
+# Rien ne tourne tant qu'aucune requête n'est profilée (le fil du Sampler dort).
+
+import cProfile, json, os, random, sys, threading, time, uuid
+from collections import Counter
+
+# appel au fournisseur LLM (réseau compris), ou attente de sa réponse : délai de réponse
+# (l'appel tourne dans un thread de deadline.py), regroupement derrière un autre visiteur
+UPSTREAM_FRAMES = ("provider_client.py:", "deadline.py:Deadline.run", "singleflight.py:")
+WAIT_FRAMES = ("threading.py:Condition.wait", "threading.py:Event.wait")  # verrous, file MODEL_GATE…
+
+def frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+
+def collapse(frame, max_depth: int = 200) -> str:
+    """Pile d'un thread, de la racine à la fonction en cours, au format replié."""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class Sampler:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._targets: dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = 0
+
+    def start(self, ident: int) -> None:
+        with self._lock:
+            self._targets[ident] = Counter()
+            if self._pid != os.getpid():  # 1er usage dans ce processus (ou worker forké)
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="profiler", daemon=True).start()
+        self._wake.set()
+
+    def stop(self, ident: int) -> Counter:
+        with self._lock:
+            return self._targets.pop(ident, Counter())
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                idents = [i for i in self._targets if i != me]
+                if not idents:
+                    self._wake.clear()
+            if not idents:
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            stacks = {i: collapse(frames[i]) for i in idents if i in frames}
+            with self._lock:
+                for i, stack in stacks.items():
+                    if i in self._targets:
+                        self._targets[i][stack] += 1
+            time.sleep(self.interval)
+
+def breakdown(stacks: Counter) -> dict[str, float]:
+    """Part des échantillons dans l'appel amont, en attente (verrous, délai) et dans notre Python."""
+    total = sum(stacks.values()) or 1
+    parts = Counter()
+    for stack, n in stacks.items():
+        if any(m in stack for m in UPSTREAM_FRAMES):
+            parts["upstream"] += n
+        elif stack.endswith(WAIT_FRAMES):
+            parts["waiting"] += n
+        else:
+            parts["python"] += n
+    return {k: round(parts[k] / total, 3) for k in ("python", "upstream", "waiting")}
+
+def top_self(stacks: Counter, n: int = 10) -> list[dict]:
+    """Fonctions où le thread se trouvait le plus souvent (temps « propre »)."""
+    leaves = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return [{"frame": fr, "samples": c} for fr, c in leaves.most_common(n)]
+
+class Capture:
+    __slots__ = ("id", "ident", "started", "t0", "reason", "cprofile")
+
+    def __init__(self, reason: str, cprofile: bool):
+        self.started = time.time()
+        ms = int(self.started * 1000) % 1000
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))}.{ms:03d}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.ident = threading.get_ident()
+        self.t0 = time.perf_counter()
+        self.reason = reason              # "header" (demandé) ou "sample" (tirage aléatoire)
+        self.cprofile = cProfile.Profile() if cprofile else None
+
+class Profiler:
+    def __init__(self, directory: str, keep: int = 50, sample_rate: float = 0.0,
+                 interval: float = 0.005, min_ms: float = 250.0):
+        self.directory = directory        # vide → profilage désactivé
+        self.keep = keep
+        self.sample_rate = sample_rate    # part des requêtes profilées d'office (0 → aucune)
+        self.min_ms = min_ms              # captures tirées au sort gardées seulement au-delà
+        self.sampler = Sampler(interval)
+        self.captures = 0
+        self.kept = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, reason: str, cprofile: bool = False) -> Capture:
+        cap = Capture(reason, cprofile)
+        self.sampler.start(cap.ident)
+        if cap.cprofile:
+            cap.cprofile.enable()
+        self.captures += 1
+        return cap
+
+    def finish(self, cap: Capture, meta: dict) -> dict | None:
+        """Arrête la capture et l'écrit (sauf capture tirée au sort plus rapide que `min_ms`)."""
+        if cap.cprofile:
+            cap.cprofile.disable()
+        stacks = self.sampler.stop(cap.ident)
+        elapsed_ms = (time.perf_counter() - cap.t0) * 1000
+        if cap.reason == "sample" and elapsed_ms < self.min_ms:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, cap.id)
+        files = {"collapsed": f"{cap.id}.collapsed"}
+        with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {n}\n" for stack, n in sorted(stacks.items()))
+        if cap.cprofile:
+            cap.cprofile.dump_stats(f"{base}.prof")
+            files["pstats"] = f"{cap.id}.prof"
+        meta = {
+            "id": cap.id,
+            "ts": round(cap.started, 3),
+            "elapsed_ms": round(elapsed_ms, 1),
+            "reason": cap.reason,
+            **meta,
+            "samples": sum(stacks.values()),
+            "interval_ms": self.sampler.interval * 1000,
+            "breakdown": breakdown(stacks),
+            "top_self": top_self(stacks),
+            "files": files,
+        }
+        with open(f"{base}.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(f"{base}.json.tmp", f"{base}.json")  # listée seulement une fois complète
+        self.kept += 1
+        self._trim()
+        return meta
+
+    def _trim(self) -> None:
+        """Anneau : garde les `keep` captures les plus récentes (noms horodatés)."""
+        ids = sorted(fn[:-5] for fn in os.listdir(self.directory) if fn.endswith(".json"))
+        for old in ids[:-self.keep] if self.keep else ():
+            for ext in (".json", ".collapsed", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, old + ext))
+                except FileNotFoundError:
+                    pass  # déjà supprimée par un autre worker
+
+    def recent(self, limit: int = 20, slowest: bool = True) -> list[dict]:
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        items = []
+        for fn in os.listdir(self.directory):
+            if not fn.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, fn), encoding="utf-8") as f:
+                    items.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # supprimée entre-temps
+        key = (lambda m: m["elapsed_ms"]) if slowest else (lambda m: m["ts"])
+        return sorted(items, key=key, reverse=True)[:limit]
+
+    def path(self, name: str) -> str | None:
+        """Chemin d'un fichier de capture (nom simple seulement, pas de ../)."""
+        if not self.directory or os.path.basename(name) != name or not name.endswith((".collapsed", ".prof", ".json")):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "sample_rate": self.sample_rate, "min_ms": self.min_ms,
+                "keep": self.keep, "captures": self.captures, "kept": self.kept}
@@ -0,0 +1,192 @@
+# prompt_budget.py — construction des prompts sous budget de tokens + comptabilité
+#
+# - count_tokens : approximation locale du tokenizer (pas de dépendance tiktoken)
+# - PromptBudget.build : persona (statique) → historique de conversation → extraits KB
+#   → consignes du moment → message, chaque partie bornée ; le 1er message système est
+#   identique octet pour octet d'une requête à l'autre, ce qui permet le cache de préfixe
+#   côté fournisseur
+# - TokenLedger : tokens prompt/complétion par requête (usage du fournisseur,
+#   sinon estimation), tokens servis depuis le cache de préfixe, temps au 1er token
+
+import math, re, threading, time
+from collections import deque
+
+# ~4 caractères par token pour le français, 1 token par signe de ponctuation
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.U)
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return sum(math.ceil(len(p) / 4) if p[0].isalnum() or p[0] == "_" else 1
+               for p in _PIECE_RE.findall(text))
+
+def message_tokens(messages: list[dict]) -> int:
+    # ~4 tokens de structure par message (rôle, séparateurs) + 3 pour l'amorce de réponse
+    return sum(4 + count_tokens(m.get("content", "")) for m in messages) + 3
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Coupe `text` (sur une frontière de mot) pour tenir dans `max_tokens`."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    total, end = 0, 0
+    for m in _PIECE_RE.finditer(text):
+        p = m.group()
+        total += math.ceil(len(p) / 4) if p[0].isalnum() or p[0] == "_" else 1
+        if total > max_tokens:
+            break
+        end = m.end()
+    return text[:end].rstrip() + " …"
+
+# =========================
+# Construction du prompt
+# =========================
+class PromptPlan:
+    __slots__ = ("messages", "parts", "tokens", "dropped")
+
+    def __init__(self, messages: list[dict], parts: dict[str, int], dropped: int):
+        self.messages = messages
+        self.parts = parts          # tokens estimés par partie (persona, history, knowledge, context, user)
+        self.tokens = message_tokens(messages)
+        self.dropped = dropped      # extraits KB écartés faute de budget
+
+class PromptBudget:
+    """Budget de tokens du prompt, réparti entre persona, historique, extraits KB, consignes et message."""
+
+    def __init__(self, persona: str, max_prompt: int = 1500, max_knowledge: int = 700,
+                 max_context: int = 150, max_user: int = 300, max_history: int = 400):
+        self.persona = persona
+        self.persona_tokens = count_tokens(persona)
+        self.max_prompt = max_prompt
+        self.max_knowledge = max_knowledge
+        self.max_context = max_context
+        self.max_user = max_user
+        self.max_history = max_history
+
+    @property
+    def signature(self) -> str:
+        return f"{self.max_prompt}/{self.max_knowledge}/{self.max_context}/{self.max_user}/{self.max_history}"
+
+    def build(self, user_text: str, knowledge: list[str] = (), context: str = "",
+              knowledge_title: str = "Infos utiles (extraits pertinents):",
+              history: list[dict] = (), summary: str = "") -> PromptPlan:
+        user = truncate_tokens(user_text or "", self.max_user)
+        context = truncate_tokens(context, self.max_context) if context else ""
+        past = self._history(history, summary)
+        used = (self.persona_tokens + count_tokens(user) + count_tokens(context)
+                + sum(4 + count_tokens(m["content"]) for m in past) + 15)
+        room = min(self.max_knowledge, self.max_prompt - used - count_tokens(knowledge_title))
+
+        kept: list[str] = []
+        dropped = 0
+        for block in knowledge:
+            t = count_tokens(block) + 1
+            if t > room:
+                if not kept and room >= 80:  # au moins un extrait, quitte à le couper
+                    block = truncate_tokens(block, room - 1)
+                    kept.append(block)
+                    room = 0
+                    continue
+                dropped += 1
+                continue
+            kept.append(block)
+            room -= t
+
+        # le persona seul dans le 1er message (préfixe stable), l'historique, puis le variable
+        messages = [{"role": "system", "content": self.persona}, *past]
+        dynamic = []
+        if kept:
+            dynamic.append(knowledge_title + "\n" + "\n\n".join(kept))
+        if context:
+            dynamic.append(context)
+        if dynamic:
+            messages.append({"role": "system", "content": "\n\n".join(dynamic)})
+        messages.append({"role": "user", "content": user})
+        parts = {
+            "persona": self.persona_tokens,
+            "history": sum(count_tokens(m["content"]) for m in past),
+            "knowledge": sum(count_tokens(b) for b in kept),
+            "context": count_tokens(context),
+            "user": count_tokens(user),
+        }
+        return PromptPlan(messages, parts, dropped)
+
+    def _history(self, history: list[dict], summary: str) -> list[dict]:
+        """Résumé + derniers échanges (les plus récents d'abord gardés) dans `max_history`."""
+        room = self.max_history
+        head = []
+        if summary:
+            summary = truncate_tokens(summary, room // 3)
+            head = [{"role": "system", "content": f"Résumé de la conversation :\n{summary}"}]
+            room -= 4 + count_tokens(head[0]["content"])
+        kept: list[dict] = []
+        for i in range(len(history) - 2, -1, -2):  # échange = (user, assistant)
+            pair = history[i:i + 2]
+            t = sum(4 + count_tokens(m["content"]) for m in pair)
+            if t > room:
+                break
+            kept[:0] = pair
+            room -= t
+        return head + kept
+
+# =========================
+# Comptabilité des tokens
+# =========================
+class TokenLedger:
+    """Compteurs de tokens par worker + les dernières requêtes (détail)."""
+
+    def __init__(self, recent: int = 200):
+        self._lock = threading.Lock()
+        self.recent: deque[dict] = deque(maxlen=recent)
+        self.totals = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                       "cached_tokens": 0, "estimated": 0, "discarded_tokens": 0}
+
+    def record(self, plan: PromptPlan, reply: str, usage: dict | None = None,
+               latency: float = 0.0, ttft: float | None = None, provider: str = "") -> dict:
+        usage = usage or {}
+        details = usage.get("prompt_tokens_details") or {}
+        entry = {
+            "ts": round(time.time(), 3),
+            "provider": provider,
+            "prompt_tokens": usage.get("prompt_tokens") or plan.tokens,
+            "prompt_tokens_est": plan.tokens,
+            "completion_tokens": usage.get("completion_tokens") or count_tokens(reply),
+            "cached_tokens": details.get("cached_tokens") or 0,
+            "estimated": not usage,
+            "parts": plan.parts,
+            "dropped": plan.dropped,
+            "latency_s": round(latency, 3),
+            "ttft_s": round(ttft, 3) if ttft is not None else None,
+        }
+        with self._lock:
+            self.recent.append(entry)
+            t = self.totals
+            t["requests"] += 1
+            t["prompt_tokens"] += entry["prompt_tokens"]
+            t["completion_tokens"] += entry["completion_tokens"]
+            t["cached_tokens"] += entry["cached_tokens"]
+            t["estimated"] += int(entry["estimated"])
+        return entry
+
+    def record_discarded(self, reply: str, usage: dict | None = None) -> int:
+        """Réponse payée mais jetée (perdante d'un hedge) : tokens comptés à part, hors moyennes."""
+        usage = usage or {}
+        tokens = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or count_tokens(reply))
+        with self._lock:
+            self.totals["discarded_tokens"] += tokens
+        return tokens
+
+    def stats(self, last: int = 20) -> dict:
+        with self._lock:
+            t = dict(self.totals)
+            recent = list(self.recent)
+        n = t["requests"] or 1
+        ttfts = [e["ttft_s"] for e in recent if e["ttft_s"] is not None]
+        return {
+            **t,
+            "avg_prompt_tokens": round(t["prompt_tokens"] / n, 1),
+            "avg_completion_tokens": round(t["completion_tokens"] / n, 1),
+            "prefix_cache_ratio": round(t["cached_tokens"] / t["prompt_tokens"], 4) if t["prompt_tokens"] else 0.0,
+            # temps jusqu'au 1er token ≈ traitement du prompt (streaming uniquement)
+            "avg_ttft_s": round(sum(ttfts) / len(ttfts), 3) if ttfts else None,
+            "last": recent[-last:],
+        }
@@ -0,0 +1,403 @@
+# provider_client.py — client LLM (API compatible OpenAI) : OpenAI et/ou OpenRouter
+#
+# - connexions keep-alive mutualisées (requests.Session + pool HTTP)
+# - timeout par tentative (connexion / lecture)
+# - nouvelles tentatives avec backoff exponentiel « jitteré » sur 429 / 5xx / erreurs réseau
+# - hedging optionnel : si le 1er fournisseur n'a rien produit après un délai basé sur
+#   son p95 récent, on lance la même requête chez l'autre ; la 1re réponse gagne
+# - bascule automatique + disjoncteur (circuit breaker) quand un fournisseur se dégrade
+
+import json, os, random, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """En-tête Retry-After : nombre de secondes ou date HTTP (« Wed, 21 Oct 2026 07:28:00 GMT »)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+class ProviderError(Exception):
+    """Échec d'un appel fournisseur (après nouvelles tentatives)."""
+
+    def __init__(self, message: str, status: int | None = None, retryable: bool = True,
+                 retry_after: float | None = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+class ChatResult:
+    __slots__ = ("text", "provider", "usage", "latency")
+
+    def __init__(self, text: str, provider: str, usage: dict | None, latency: float):
+        self.text = text
+        self.provider = provider
+        self.usage = usage or {}
+        self.latency = latency
+
+# =========================
+# Disjoncteur
+# =========================
+class CircuitBreaker:
+    """closed → (N échecs consécutifs) → open → (cooldown) → half-open (1 essai) → closed/open."""
+
+    def __init__(self, failures: int = 3, cooldown: float = 30.0):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_at = 0.0  # essai half-open en cours (0 = aucun)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.max_failures:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            now = time.monotonic()
+            # un essai réservé mais jamais conclu n'est pas bloquant au-delà d'un cooldown
+            if state == "half-open" and (not self.trial_at or now - self.trial_at >= self.cooldown):
+                self.trial_at = now
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.trial_at = 0.0
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_at = 0.0
+            if self.failures >= self.max_failures:
+                self.opened_at = time.monotonic()
+
+# =========================
+# Fournisseur
+# =========================
+class Provider:
+    def __init__(self, name: str, base_url: str, api_key: str, pool_size: int = 16,
+                 breaker: CircuitBreaker | None = None, headers: dict | None = None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: deque[float] = deque(maxlen=200)  # délai jusqu'au 1er contenu
+        self.calls = self.errors = 0
+        self.status_counts: dict[str, int] = {}
+        self._lock = threading.Lock()  # compteurs mis à jour par les threads de hedging
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            **(headers or {}),
+        })
+
+    def model_name(self, model: str) -> str:
+        # OpenRouter attend « openai/gpt-4o-mini », OpenAI « gpt-4o-mini »
+        if self.name == "openai":
+            return model.split("/", 1)[1] if model.startswith("openai/") else model
+        return model if "/" in model else f"openai/{model}"
+
+    def p95(self) -> float | None:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def count_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def count_status(self, status, error: bool = False) -> None:
+        key = str(status)
+        with self._lock:
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+            self.errors += int(error)
+
+# =========================
+# Client
+# =========================
+class ProviderClient:
+    def __init__(self, providers: list[Provider], connect_timeout: float = 3.0, read_timeout: float = 25.0,
+                 retries: int = 2, backoff: float = 0.4, hedge: bool = False,
+                 hedge_min_delay: float = 1.5, hedge_max_delay: float = 8.0):
+        self.providers = providers
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedges_fired = self.hedges_won = self.failovers = 0
+        self.on_status = None  # rappel optionnel (fournisseur, statut) : métriques
+        self.on_discard = None  # rappel optionnel (ChatResult perdant d'un hedge, payé quand même) : budget
+        self.hedges_discarded = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge") if hedge else None
+
+    @classmethod
+    def from_env(cls) -> "ProviderClient":
+        failures = int(os.getenv("LLM_BREAKER_FAILURES", 3))
+        cooldown = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+        pool = int(os.getenv("LLM_POOL_SIZE", 16))
+        providers = []
+        if os.getenv("OPENAI_API_KEY"):
+            providers.append(Provider(
+                "openai", os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
+                os.getenv("OPENAI_API_KEY"), pool, CircuitBreaker(failures, cooldown)))
+        if os.getenv("OPENROUTER_API_KEY"):
+            providers.append(Provider(
+                "openrouter", os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1"),
+                os.getenv("OPENROUTER_API_KEY"), pool, CircuitBreaker(failures, cooldown),
+                headers={"X-Title": os.getenv("OPENROUTER_APP_TITLE", "Betty")}))
+        if os.getenv("LLM_PRIMARY") == "openrouter":
+            providers.reverse()
+        return cls(
+            providers,
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", 3)),
+            read_timeout=float(os.getenv("LLM_READ_TIMEOUT", 25)),
+            retries=int(os.getenv("LLM_RETRIES", 2)),
+            hedge=os.getenv("LLM_HEDGE", "0") == "1",
+            hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", 1.5)),
+            hedge_max_delay=float(os.getenv("LLM_HEDGE_MAX_DELAY", 8)),
+        )
+
+    # -------------------------
+    # API
+    # -------------------------
+    def chat(self, messages: list[dict], model: str, temperature: float = 0.35,
+             max_tokens: int = 600) -> ChatResult:
+        def attempt(p: Provider) -> ChatResult:
+            t0 = time.monotonic()
+            resp = self._post(p, self._payload(p, messages, model, temperature, max_tokens))
+            try:
+                data = resp.json()
+                text = data["choices"][0]["message"]["content"] or ""
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise ProviderError(f"{p.name}: réponse illisible ({e})")
+            latency = time.monotonic() - t0
+            p.latencies.append(latency)
+            return ChatResult(text.strip(), p.name, data.get("usage"), latency)
+
+        return self._run(attempt, discard=self._discarded)
+
+    def stream(self, messages: list[dict], model: str, temperature: float = 0.35,
+               max_tokens: int = 600, info: dict | None = None):
+        """Fragments de texte au fil de l'eau. `info` (optionnel) reçoit provider/usage."""
+        def attempt(p: Provider):
+            t0 = time.monotonic()
+            payload = self._payload(p, messages, model, temperature, max_tokens)
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}  # usage dans le dernier fragment
+            resp = self._post(p, payload, stream=True)
+            events = self._sse_deltas(resp, info)
+            try:
+                first = next(events)  # le hedging porte sur le délai jusqu'au 1er contenu
+            except StopIteration:
+                first = ""
+            except (requests.RequestException, ValueError) as e:
+                resp.close()
+                self._record_failure(p, None)
+                raise ProviderError(f"{p.name}: flux interrompu ({e})")
+            p.latencies.append(time.monotonic() - t0)
+            return p, resp, first, events
+
+        p, resp, first, events = self._run(attempt, discard=lambda r: r[1].close())
+        if info is not None:
+            info["provider"] = p.name
+        try:
+            if first:
+                yield first
+            yield from events
+        finally:
+            resp.close()
+
+    def stats(self) -> dict:
+        return {
+            "hedging": self.hedge,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedges_discarded": self.hedges_discarded,
+            "failovers": self.failovers,
+            "providers": {
+                p.name: {
+                    "circuit": p.breaker.state,
+                    "calls": p.calls,
+                    "errors": p.errors,
+                    "status": p.status_counts.copy(),
+                    "p95_s": round(p.p95(), 3) if p.p95() is not None else None,
+                }
+                for p in self.providers
+            },
+        }
+
+    # -------------------------
+    # Internes
+    # -------------------------
+    def _payload(self, p: Provider, messages, model, temperature, max_tokens) -> dict:
+        return {
+            "model": p.model_name(model),
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+
+    def _count_status(self, p: Provider, status, error: bool = False) -> None:
+        p.count_status(status, error)
+        if self.on_status is not None:
+            self.on_status(p.name, status)
+
+    def _record_failure(self, p: Provider, status) -> None:
+        self._count_status(p, status if status is not None else "network", error=True)
+        p.breaker.failure()
+
+    def _discarded(self, result: ChatResult) -> None:
+        # la requête perdante est allée au bout : ses tokens sont facturés
+        self._count("hedges_discarded")
+        if self.on_discard is not None:
+            self.on_discard(result)
+
+    def _post(self, p: Provider, payload: dict, stream: bool = False) -> requests.Response:
+        """Un appel chez `p`, avec nouvelles tentatives jitterées sur erreurs transitoires."""
+        last: ProviderError | None = None
+        for i in range(self.retries + 1):
+            if i:
+                delay = self.backoff * (2 ** (i - 1)) * random.uniform(0.5, 1.5)
+                if last and last.retry_after:
+                    delay = max(delay, min(last.retry_after, 5.0))
+                time.sleep(delay)
+            p.count_call()
+            try:
+                resp = p.session.post(f"{p.base_url}/chat/completions", json=payload,
+                                      timeout=self.timeout, stream=stream)
+            except requests.RequestException as e:
+                self._record_failure(p, None)
+                last = ProviderError(f"{p.name}: {type(e).__name__}")
+                continue
+            if resp.status_code == 200:
+                self._count_status(p, 200)
+                p.breaker.success()
+                return resp
+            retry_after = resp.headers.get("Retry-After")
+            body = resp.text[:200]
+            resp.close()
+            self._record_failure(p, resp.status_code)
+            last = ProviderError(
+                f"{p.name}: HTTP {resp.status_code} {body}",
+                status=resp.status_code,
+                retryable=resp.status_code in RETRYABLE_STATUS,
+                retry_after=retry_after_seconds(retry_after),
+            )
+            if not last.retryable:
+                break
+        raise last
+
+    def _sse_deltas(self, resp: requests.Response, info: dict | None):
+        for line in resp.iter_lines():
+            if not line or not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                return
+            chunk = json.loads(data)
+            if info is not None and chunk.get("usage"):
+                info["usage"] = chunk["usage"]
+            choices = chunk.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+    def _count(self, name: str) -> None:
+        with self._lock:  # aussi appelé depuis les threads de hedging
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _available(self) -> tuple[list[Provider], bool]:
+        """(fournisseurs à essayer, forcé ?) ; l'état seul est lu ici, l'essai half-open est
+        réservé par `allow()` juste avant l'envoi (voir _guarded)."""
+        usable = [p for p in self.providers if p.breaker.state != "open"]
+        if usable:
+            return usable, False
+        # tous les disjoncteurs ouverts : on tente quand même le moins récemment ouvert
+        return sorted(self.providers, key=lambda p: p.breaker.opened_at)[:1], True
+
+    def _guarded(self, attempt, forced: bool):
+        def run(p: Provider):
+            if not forced and not p.breaker.allow():
+                raise ProviderError(f"{p.name}: disjoncteur ouvert (essai déjà en cours)")
+            return attempt(p)
+        return run
+
+    def _hedge_delay(self, p: Provider) -> float:
+        p95 = p.p95()
+        if p95 is None:
+            return self.hedge_min_delay
+        return min(max(p95, self.hedge_min_delay), self.hedge_max_delay)
+
+    def _run(self, attempt, discard=None):
+        providers, forced = self._available()
+        if not providers:
+            raise ProviderError("aucun fournisseur LLM configuré", retryable=False)
+        attempt = self._guarded(attempt, forced)
+        if not self.hedge or len(providers) < 2:
+            last = None
+            for k, p in enumerate(providers):
+                try:
+                    return attempt(p)
+                except ProviderError as e:
+                    last = e
+                    if k + 1 < len(providers):
+                        self._count("failovers")
+            raise last
+
+        primary, backup = providers[0], providers[1]
+        futures = {self._pool.submit(attempt, primary): primary}
+        done, _ = wait(futures, timeout=self._hedge_delay(primary))
+        if done:
+            f = done.pop()
+            try:
+                return f.result()
+            except ProviderError:
+                self._count("failovers")
+                return attempt(backup)
+        self._count("hedges_fired")
+        futures[self._pool.submit(attempt, backup)] = backup
+        errors: list[ProviderError] = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                try:
+                    result = f.result()
+                except ProviderError as e:
+                    errors.append(e)
+                    continue
+                if futures[f] is backup:
+                    self._count("hedges_won")
+                if discard:
+                    for other in (done - {f}) | pending:
+                        other.add_done_callback(lambda o: o.exception() is None and discard(o.result()))
+                return result
+        raise errors[-1]
@@ -0,0 +1,217 @@
+# ratelimit.py — limitation de débit par client (seau à jetons) + budget quotidien d'appels modèle
+#
+# - RateLimiter : un seau par clé (session, IP) ; `burst` jetons au plus, rechargés
+#   à `rate` jetons/seconde. En mémoire (LRU borné à `max_keys`) ou SQLite (WAL),
+#   partagé par tous les workers gunicorn
+# - DailyBudget : appels et tokens amont consommés dans la journée ; une fois la limite
+#   atteinte, l'appli passe en mode « FAQ / réponses rapides seulement » jusqu'au lendemain
+# Refus → RateLimited / BudgetExhausted, transformées par /chat en réponse aimable.
+
+import os, sqlite3, threading, time
+from collections import OrderedDict
+from datetime import date
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name    TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (name, key)
+);
+CREATE INDEX IF NOT EXISTS buckets_updated ON buckets(updated);
+CREATE TABLE IF NOT EXISTS budget (
+    day    TEXT PRIMARY KEY,
+    calls  INTEGER NOT NULL DEFAULT 0,
+    tokens INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+class RateLimited(Exception):
+    """Trop de messages pour ce client ; réessayer dans `retry_after` secondes."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"réessayer dans {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+class BudgetExhausted(Exception):
+    """Budget quotidien d'appels modèle épuisé."""
+
+class _SQLite:
+    """Connexion SQLite par thread (même réglages que les autres stores partagés)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db().executescript(SCHEMA)
+
+    def db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+def _open(path: str) -> _SQLite | None:
+    if not path:
+        return None
+    try:
+        return _SQLite(path)
+    except Exception:
+        return None  # SQLite indisponible → repli en mémoire
+
+# =========================
+# Seau à jetons
+# =========================
+class RateLimiter:
+    def __init__(self, name: str, rate: float, burst: float, path: str = "", max_keys: int = 10000):
+        self.name = name
+        self.rate = rate            # jetons rechargés par seconde (0 → pas de limite)
+        self.burst = burst          # capacité du seau
+        self.max_keys = max_keys
+        self.store = _open(path)
+        self._lock = threading.Lock()
+        self._mem: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.allowed = 0
+        self.refused = 0
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def take(self, key: str, cost: float = 1.0) -> float:
+        """Prélève `cost` jetons ; renvoie 0 si accepté, sinon l'attente (s) avant d'avoir assez de jetons."""
+        if self.rate <= 0 or not key:
+            return 0.0
+        now = time.time()
+        wait = self._take_db(key, cost, now) if self.store else self._take_mem(key, cost, now)
+        if wait is None:  # erreur SQLite : on laisse passer plutôt que de bloquer les visiteurs
+            wait = 0.0
+        if wait:
+            self.refused += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    def check(self, key: str, cost: float = 1.0) -> None:
+        """Comme `take`, mais lève RateLimited si le seau est à sec."""
+        wait = self.take(key, cost)
+        if wait:
+            raise RateLimited(wait)
+
+    def _take_mem(self, key: str, cost: float, now: float) -> float:
+        with self._lock:
+            tokens, updated = self._mem.get(key, (self.burst, now))
+            tokens = self._refill(tokens, updated, now)
+            wait = 0.0 if tokens >= cost else (cost - tokens) / self.rate
+            self._mem[key] = (tokens - cost if not wait else tokens, now)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_keys:
+                self._mem.popitem(last=False)  # seau le moins récent (plein depuis longtemps, en pratique)
+            return wait
+
+    def _take_db(self, key: str, cost: float, now: float) -> float | None:
+        db = self.store.db()
+        try:
+            db.execute("BEGIN IMMEDIATE")  # lecture + écriture atomiques entre workers
+            try:
+                row = db.execute("SELECT tokens, updated FROM buckets WHERE name = ? AND key = ?",
+                                 (self.name, key)).fetchone()
+                tokens = self._refill(*row, now) if row else self.burst
+                wait = 0.0 if tokens >= cost else (cost - tokens) / self.rate
+                db.execute("INSERT OR REPLACE INTO buckets(name, key, tokens, updated) VALUES(?, ?, ?, ?)",
+                           (self.name, key, tokens - cost if not wait else tokens, now))
+                # seau inactif assez longtemps pour être plein : inutile de le garder
+                db.execute("DELETE FROM buckets WHERE name = ? AND updated < ?",
+                           (self.name, now - self.burst / self.rate - 60))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            return wait
+        except sqlite3.Error:
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_min": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "backend": "sqlite" if self.store else "memory",
+            "allowed": self.allowed,
+            "refused": self.refused,
+        }
+
+# =========================
+# Budget quotidien (appels + tokens amont)
+# =========================
+class DailyBudget:
+    def __init__(self, max_calls: int = 0, max_tokens: int = 0, path: str = ""):
+        self.max_calls = max_calls      # 0 → illimité
+        self.max_tokens = max_tokens    # 0 → illimité
+        self.store = _open(path)
+        self._lock = threading.Lock()
+        self._day = ""
+        self._calls = 0
+        self._tokens = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_calls or self.max_tokens)
+
+    def usage(self) -> tuple[int, int]:
+        """(appels, tokens) consommés aujourd'hui."""
+        today = date.today().isoformat()
+        if self.store:
+            try:
+                row = self.store.db().execute("SELECT calls, tokens FROM budget WHERE day = ?", (today,)).fetchone()
+                return (row[0], row[1]) if row else (0, 0)
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            if self._day != today:
+                self._day, self._calls, self._tokens = today, 0, 0
+            return self._calls, self._tokens
+
+    def exhausted(self) -> bool:
+        if not self.enabled:
+            return False
+        calls, tokens = self.usage()
+        return bool((self.max_calls and calls >= self.max_calls) or
+                    (self.max_tokens and tokens >= self.max_tokens))
+
+    def check(self) -> None:
+        if self.exhausted():
+            raise BudgetExhausted()
+
+    def spend(self, calls: int = 1, tokens: int = 0) -> None:
+        today = date.today().isoformat()
+        if self.store:
+            try:
+                db = self.store.db()
+                db.execute("INSERT OR IGNORE INTO budget(day) VALUES(?)", (today,))
+                db.execute("UPDATE budget SET calls = calls + ?, tokens = tokens + ? WHERE day = ?",
+                           (calls, tokens, today))
+                db.execute("DELETE FROM budget WHERE day < date(?, '-30 day')", (today,))
+                return
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            if self._day != today:
+                self._day, self._calls, self._tokens = today, 0, 0
+            self._calls += calls
+            self._tokens += tokens
+
+    def stats(self) -> dict:
+        calls, tokens = self.usage()
+        return {
+            "day": date.today().isoformat(),
+            "calls": calls,
+            "tokens": tokens,
+            "max_calls": self.max_calls or None,
+            "max_tokens": self.max_tokens or None,
+            "exhausted": self.exhausted(),
+            "backend": "sqlite" if self.store else "memory",
+        }
@@ -0,0 +1,281 @@
+# response_cache.py — cache des réponses modèle (clé = question normalisée + version du prompt)
+#
+# - TTL + éviction LRU (sur la date du dernier hit)
+# - recherche « proche » optionnelle par similarité de trigrammes (fuzzy.similar) : balayage
+#   linéaire, limité aux `near_candidates` entrées les plus récemment servies de l'espace de
+#   noms — prévue pour un petit cache (quelques milliers d'entrées), pas pour un gros volume
+# - backend SQLite en mode WAL : un seul cache partagé par tous les workers gunicorn
+#   (chemin vide → cache en mémoire, propre au processus)
+# - compteurs hit/miss + latence économisée, partagés eux aussi via SQLite
+# - lecture sans écriture systématique : date du dernier hit réécrite au plus une fois par
+#   `touch_interval` et par entrée, compteurs regroupés (au plus 1 écriture / `flush_interval`)
+
+import hashlib, os, sqlite3, threading, time
+from collections import OrderedDict
+
+from fuzzy import norm, similar
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key      TEXT PRIMARY KEY,
+    ns       TEXT NOT NULL,
+    qnorm    TEXT NOT NULL,
+    reply    TEXT NOT NULL,
+    created  REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    hits     INTEGER NOT NULL DEFAULT 0,
+    latency  REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_ns ON entries(ns);
+CREATE INDEX IF NOT EXISTS entries_last_hit ON entries(last_hit);
+CREATE TABLE IF NOT EXISTS stats (
+    name  TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+STAT_NAMES = ("hits", "near_hits", "misses", "stores", "saved_seconds")
+
+def cache_key(qnorm: str, ns: str) -> str:
+    return hashlib.sha1(f"{ns}\x00{qnorm}".encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Cache question → réponse modèle brute (avant post-traitement)."""
+
+    def __init__(self, path: str = "", ttl: float = 6 * 3600, max_entries: int = 2000,
+                 near_threshold: float = 0.0, near_candidates: int = 500,
+                 touch_interval: float = 60.0, flush_interval: float = 1.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.near_threshold = near_threshold  # 0 → recherche proche désactivée
+        self.near_candidates = near_candidates
+        self.touch_interval = touch_interval
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._mem: OrderedDict[str, dict] = OrderedDict()
+        self._counts = dict.fromkeys(STAT_NAMES, 0.0)
+        self._unflushed = dict.fromkeys(STAT_NAMES, 0.0)  # compteurs pas encore écrits dans SQLite
+        self._flushed_at = time.monotonic()
+        self._pending_hits: dict[str, int] = {}           # hits pas encore écrits, par clé
+        if self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db().executescript(SCHEMA)
+            except Exception:
+                self.path = ""  # SQLite indisponible → repli en mémoire
+
+    # -------------------------
+    # SQLite (1 connexion par thread)
+    # -------------------------
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, **deltas: float) -> None:
+        with self._lock:
+            for name, d in deltas.items():
+                self._counts[name] += d
+                self._unflushed[name] += d
+        if self.path and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Écrit les compteurs accumulés dans la table partagée (une transaction)."""
+        with self._lock:
+            deltas = [(k, v) for k, v in self._unflushed.items() if v]
+            self._unflushed = dict.fromkeys(STAT_NAMES, 0.0)
+            self._flushed_at = time.monotonic()
+        if not deltas:
+            return
+        try:
+            self._db().executemany(
+                "INSERT INTO stats(name, value) VALUES(?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                deltas,
+            )
+        except sqlite3.Error:
+            pass
+
+    # -------------------------
+    # API
+    # -------------------------
+    def get(self, user_text: str, ns: str, record: bool = True) -> str | None:
+        """Réponse en cache ou None. `record=False` : simple consultation (sans compteurs)."""
+        qnorm = norm(user_text)
+        if not qnorm:
+            return None
+        try:
+            hit = self._get_exact(qnorm, ns)
+            kind = "hits"
+            if hit is None and self.near_threshold > 0:
+                hit = self._get_near(qnorm, ns)
+                kind = "near_hits"
+        except sqlite3.Error:
+            hit = None
+        if hit is None:
+            if record:
+                self._bump(misses=1)
+            return None
+        reply, latency = hit
+        if record:
+            self._bump(**{kind: 1, "saved_seconds": latency})
+        return reply
+
+    def put(self, user_text: str, ns: str, reply: str, latency: float = 0.0) -> None:
+        qnorm = norm(user_text)
+        if not qnorm or not reply:
+            return
+        now = time.time()
+        key = cache_key(qnorm, ns)
+        try:
+            if self.path:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO entries(key, ns, qnorm, reply, created, last_hit, hits, latency) "
+                    "VALUES(?, ?, ?, ?, ?, ?, 0, ?)",
+                    (key, ns, qnorm, reply, now, now, latency),
+                )
+                self._evict_db(db, now)
+            else:
+                with self._lock:
+                    self._mem[key] = {"ns": ns, "qnorm": qnorm, "reply": reply,
+                                      "created": now, "latency": latency}
+                    self._mem.move_to_end(key)
+                    while len(self._mem) > self.max_entries:
+                        self._mem.popitem(last=False)
+        except sqlite3.Error:
+            return
+        self._bump(stores=1)
+
+    def invalidate(self, keep_ns: str | None = None, prefix: str | None = None) -> None:
+        """Vide le cache (ou tout sauf l'espace de noms `keep_ns`, ou les seuls espaces commençant par `prefix`)."""
+        def drop(ns: str) -> bool:
+            if prefix is not None:
+                return ns.startswith(prefix)
+            return keep_ns is None or ns != keep_ns
+        try:
+            if self.path:
+                if prefix is not None:
+                    self._db().execute("DELETE FROM entries WHERE substr(ns, 1, ?) = ?", (len(prefix), prefix))
+                elif keep_ns is None:
+                    self._db().execute("DELETE FROM entries")
+                else:
+                    self._db().execute("DELETE FROM entries WHERE ns != ?", (keep_ns,))
+            else:
+                with self._lock:
+                    for k in [k for k, e in self._mem.items() if drop(e["ns"])]:
+                        del self._mem[k]
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> dict:
+        shared = dict.fromkeys(STAT_NAMES, 0.0)
+        entries = len(self._mem)
+        if self.path:
+            self._flush()
+            try:
+                db = self._db()
+                shared.update(dict(db.execute("SELECT name, value FROM stats").fetchall()))
+                entries = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        else:
+            shared = dict(self._counts)
+        lookups = shared["hits"] + shared["near_hits"] + shared["misses"]
+        return {
+            "backend": "sqlite" if self.path else "memory",
+            "entries": entries,
+            **{k: round(v, 3) for k, v in shared.items()},
+            "hit_rate": round((shared["hits"] + shared["near_hits"]) / lookups, 4) if lookups else 0.0,
+            "process": {k: round(v, 3) for k, v in self._counts.items()},
+        }
+
+    # -------------------------
+    # Internes
+    # -------------------------
+    def _get_exact(self, qnorm: str, ns: str) -> tuple[str, float] | None:
+        key = cache_key(qnorm, ns)
+        now = time.time()
+        if self.path:
+            db = self._db()
+            row = db.execute(
+                "SELECT reply, latency, last_hit FROM entries WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(db, key, row[2], now)
+            return row[0], row[1]
+        with self._lock:
+            e = self._mem.get(key)
+            if e is None:
+                return None
+            if e["created"] <= now - self.ttl:
+                del self._mem[key]
+                return None
+            self._mem.move_to_end(key)
+            return e["reply"], e["latency"]
+
+    def _get_near(self, qnorm: str, ns: str) -> tuple[str, float] | None:
+        now = time.time()
+        # candidats : les `near_candidates` entrées les plus récemment servies (balayage borné)
+        if self.path:
+            rows = self._db().execute(
+                "SELECT key, qnorm, reply, latency, last_hit FROM entries WHERE ns = ? AND created > ? "
+                "ORDER BY last_hit DESC LIMIT ?",
+                (ns, now - self.ttl, self.near_candidates),
+            ).fetchall()
+        else:
+            with self._lock:
+                rows = []
+                for k in reversed(self._mem):
+                    e = self._mem[k]
+                    if e["ns"] == ns and e["created"] > now - self.ttl:
+                        rows.append((k, e["qnorm"], e["reply"], e["latency"], now))
+                        if len(rows) >= self.near_candidates:
+                            break
+        best, best_score = None, self.near_threshold
+        for key, other, reply, latency, last_hit in rows:
+            score = similar(qnorm, other)
+            if score >= best_score:
+                best, best_score = (key, reply, latency, last_hit), score
+        if best is None:
+            return None
+        key, reply, latency, last_hit = best
+        if self.path:
+            self._touch(self._db(), key, last_hit, now)
+        else:
+            with self._lock:
+                if key in self._mem:
+                    self._mem.move_to_end(key)
+        return reply, latency
+
+    def _touch(self, db: sqlite3.Connection, key: str, last_hit: float, now: float) -> None:
+        """Hit compté en mémoire ; (last_hit, hits) réécrits au plus une fois par `touch_interval`."""
+        with self._lock:
+            n = self._pending_hits.get(key, 0) + 1
+            if now - last_hit < self.touch_interval:
+                if len(self._pending_hits) > 2 * self.max_entries:
+                    self._pending_hits.clear()  # clés expirées ou évincées entre-temps
+                self._pending_hits[key] = n
+                return
+            self._pending_hits.pop(key, None)
+        db.execute("UPDATE entries SET last_hit = ?, hits = hits + ? WHERE key = ?", (now, n, key))
+
+    def _evict_db(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM entries WHERE created <= ?", (now - self.ttl,))
+        (count,) = db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count > self.max_entries:
+            db.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY last_hit ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
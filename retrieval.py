@@ -0,0 +1,147 @@
+# retrieval.py — index BM25 (NumPy) sur la base de connaissances (data/ + personnalisées/)
+#
+# Au lieu d'injecter les N premiers caractères de la FAQ dans chaque prompt,
+# on découpe les documents en passages et on ne garde, pour chaque question,
+# que les k passages les plus pertinents dans un budget de caractères.
+# Les passages viennent du snapshot KB (kb_ingest.py) ; l'index est sauvegardé
+# (.npz) et rechargé tel quel au démarrage tant que la version du snapshot
+# n'a pas changé.
+
+import json, os
+
+import numpy as np
+
+from fuzzy import norm
+
+INDEX_FORMAT = 2
+
+# Mots vides (forme normalisée) : n'apportent rien au classement
+STOPWORDS = set("""
+a au aux avec c ce ces cette d dans de des du elle en est et etre il ils j je l la le les leur
+lui m ma mais me mes mon n ne nos notre nous on ou par pas plus pour qu que qui s sa se ses son
+sont sur t ta te tes ton tu un une vos votre vous y
+""".split())
+
+def stem(w: str) -> str:
+    """Racinisation légère : pluriel retiré puis préfixe de 6 lettres
+    (rembourse/remboursement, inscrire/inscription, tarif/tarifs...)."""
+    if len(w) > 3 and w[-1] in "sx":
+        w = w[:-1]
+    return w[:6]
+
+def tokenize(text: str) -> list[str]:
+    return [stem(w) for w in norm(text).split() if w not in STOPWORDS and len(w) > 1]
+
+# -------------------------
+# Index BM25
+# -------------------------
+class KBIndex:
+    """Matrice passages × termes des poids BM25 ; score(question) = somme des colonnes."""
+
+    def __init__(self, chunks: list[dict], vocab: dict[str, int], weights: np.ndarray, signature: str):
+        self.chunks = chunks
+        self.vocab = vocab
+        self.weights = weights
+        self.signature = signature
+
+    @classmethod
+    def build(cls, chunks: list[dict], signature: str, k1: float = 1.5, b: float = 0.75) -> "KBIndex":
+        docs = [tokenize(c["text"]) for c in chunks]
+        vocab: dict[str, int] = {}
+        for toks in docs:
+            for w in toks:
+                vocab.setdefault(w, len(vocab))
+        tf = np.zeros((len(docs), max(len(vocab), 1)), dtype=np.float32)
+        for i, toks in enumerate(docs):
+            for w in toks:
+                tf[i, vocab[w]] += 1
+        if not docs:
+            return cls(chunks, vocab, tf, signature)
+        dl = tf.sum(axis=1, keepdims=True)
+        avgdl = float(dl.mean()) or 1.0
+        df = (tf > 0).sum(axis=0)
+        idf = np.log1p((len(docs) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        weights = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+        return cls(chunks, vocab, weights.astype(np.float32), signature)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"  # un fichier temporaire par worker : pas d'écriture croisée
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    weights=self.weights,
+                    meta=np.array(json.dumps({
+                        "format": INDEX_FORMAT,
+                        "signature": self.signature,
+                        "vocab": self.vocab,
+                    }, ensure_ascii=False)),
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path: str, chunks: list[dict]) -> "KBIndex":
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            if meta.get("format") != INDEX_FORMAT:
+                raise ValueError("format d'index obsolète")
+            weights = z["weights"]
+        if weights.shape[0] != len(chunks):
+            raise ValueError("index et passages désynchronisés")
+        return cls(chunks, meta["vocab"], weights, meta["signature"])
+
+    def search(self, query: str, k: int = 4) -> list[tuple[float, dict]]:
+        ids = [self.vocab[w] for w in tokenize(query) if w in self.vocab]
+        if not ids or not self.chunks:
+            return []
+        scores = self.weights[:, ids].sum(axis=1)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top if scores[i] > 0]
+
+    def blocks(self, query: str, k: int = 4) -> list[str]:
+        """Passages les plus pertinents, préfixés de leur source, du meilleur au moins bon."""
+        return [f"[{c['source']}]\n{c['text']}" for _, c in self.search(query, k)]
+
+    def context(self, query: str, k: int = 4, budget_chars: int = 1800) -> str:
+        """Passages les plus pertinents, concaténés dans la limite de `budget_chars`."""
+        parts: list[str] = []
+        total = 0
+        for block in self.blocks(query, k):
+            if total + len(block) > budget_chars:
+                remain = budget_chars - total
+                if remain < 200:
+                    break
+                block = block[:remain]
+            parts.append(block)
+            total += len(block)
+        return "\n\n".join(parts)
+
+def load_or_build_index(path: str, snapshot) -> KBIndex:
+    """Recharge l'index s'il correspond à la version du snapshot, sinon le reconstruit et le sauvegarde."""
+    signature = f"{snapshot.version}.{INDEX_FORMAT}"
+    chunks = snapshot.passages()
+    if path and os.path.exists(path):
+        try:
+            index = KBIndex.load(path, chunks)
+            if index.signature == signature:
+                return index
+        except Exception:
+            pass
+    index = KBIndex.build(chunks, signature)
+    if path:
+        try:
+            index.save(path)
+        except OSError:
+            pass
+    return index
@@ -0,0 +1,147 @@
+# routing.py — palier de modèle et budgets (sortie, passages de la base) selon le type de question
+#
+# Classification locale, sans appel ni modèle : signaux déjà calculés par MessageAnalysis
+# (intentions INTENT_MAP, mot-clé de cours, âge, inscription, tenues…) + longueur, nombre de
+# questions, mots de raisonnement :
+# - short   : « c'est où ? », « horaires jazz ? » — quelques mots, deux phrases suffisent
+# - factual : question simple sur un sujet reconnu
+# - complex : longue, plusieurs questions ou intentions, comparaison / conseil / explication
+# - open    : aucun signal reconnu (classification peu sûre) → palier supérieur, comme complex
+# Route : palier (→ modèle), max_tokens, passages de la base (top_k), température, consigne
+# de longueur. Table par défaut ici (ROUTING_TABLE), partagée par app.py et chatbot_core.py ;
+# variables d'environnement lues par routes_from_env :
+# - ROUTING=0 : routage désactivé (toutes les classes sur les budgets historiques)
+# - ROUTING_TABLE : surcharge par classe (JSON, ou chemin d'un fichier .json)
+# - MODEL_ID_FAST / MODEL_ID_LARGE : modèle de chaque palier (défaut : le modèle de l'appli)
+# - MODEL_PRICE_FAST / MODEL_PRICE_LARGE : USD par million de tokens « entrée,sortie »
+# RouteStats : appels, latence (p50 / p95), tokens et coût estimé par classe, pour régler la table.
+
+import json, os, threading
+from collections import deque
+
+CLASSES = ("short", "factual", "complex", "open")
+REASONING_TERMS = {"pourquoi", "difference", "differences", "comparer", "compare", "conseil", "conseils",
+                   "conseiller", "conseillez", "hesite", "expliquer", "expliquez", "lequel", "laquelle",
+                   "plutot", "mieux", "choisir", "avantages"}
+SHORT_WORDS = 6       # au plus, sujet reconnu : question courte
+COMPLEX_WORDS = 30    # au-delà : question complexe
+
+# classes absentes ou champs omis : valeurs par défaut de l'appli (palier supérieur, budgets historiques)
+ROUTING_TABLE = {
+    "short": {"tier": "fast", "max_tokens": 160, "top_k": 2, "hint": "Réponds en deux phrases au plus."},
+    "factual": {"tier": "fast", "max_tokens": 350, "top_k": 3, "hint": "Réponds en quelques phrases."},
+    "complex": {},
+    "open": {},
+}
+DEFAULT_PRICE = "0.15,0.60"  # tarif de gpt-4o-mini
+
+def classify(words: list[str], questions: int, intents: int, topical: bool) -> str:
+    """Classe d'une question (mots normalisés, nombre de « ? », d'intentions, sujet reconnu ou non)."""
+    n = len(words)
+    if (n > COMPLEX_WORDS or questions > 1 or intents > 2
+            or (n > 3 and any(w in REASONING_TERMS for w in words))):
+        return "complex"
+    if not (intents or topical):
+        return "open"  # sujet non reconnu, même court : palier complet
+    return "short" if n <= SHORT_WORDS else "factual"
+
+class Route:
+    __slots__ = ("name", "tier", "model", "max_tokens", "top_k", "temperature", "hint")
+
+    def __init__(self, name: str, tier: str, model: str, max_tokens: int, top_k: int,
+                 temperature: float = 0.35, hint: str = ""):
+        self.name = name
+        self.tier = tier
+        self.model = model
+        self.max_tokens = max_tokens
+        self.top_k = top_k
+        self.temperature = temperature
+        self.hint = hint                  # consigne de longueur ajoutée au prompt (reste sous max_tokens)
+
+    @property
+    def signature(self) -> str:
+        """Tout ce qui change la réponse (clé du cache de réponses)."""
+        return f"{self.model}/{self.max_tokens}/{self.top_k}/{self.temperature}/{self.hint}"
+
+def load_routes(table: dict, tiers: dict[str, str], defaults: dict) -> dict[str, Route]:
+    """{classe: Route} ; `table` = {classe: {tier, max_tokens, top_k, temperature, hint}}, complétée par `defaults`."""
+    routes = {}
+    for name in CLASSES:
+        conf = {**defaults, **table.get(name, {})}
+        tier = conf["tier"] if conf["tier"] in tiers else "large"
+        routes[name] = Route(name, tier, tiers[tier], int(conf["max_tokens"]), int(conf["top_k"]),
+                             float(conf["temperature"]), conf.get("hint", ""))
+    return routes
+
+def parse_price(value: str) -> tuple[float, float]:
+    """« entrée,sortie » en USD par million de tokens ; une seule valeur : même prix pour les deux."""
+    p_in, sep, p_out = value.partition(",")
+    p_in = float(p_in or 0)
+    return p_in, float(p_out or 0) if sep else p_in
+
+def routing_table(custom: str = "") -> dict:
+    """ROUTING_TABLE surchargée classe par classe par `custom` (JSON, ou chemin d'un fichier .json)."""
+    overrides = {}
+    if custom:
+        if custom.endswith(".json"):
+            with open(custom, encoding="utf-8") as f:
+                custom = f.read()
+        overrides = json.loads(custom)
+    return {name: {**ROUTING_TABLE.get(name, {}), **overrides.get(name, {})}
+            for name in {*ROUTING_TABLE, *overrides}}
+
+def routes_from_env(model: str, defaults: dict) -> tuple[dict[str, "Route"], "RouteStats"]:
+    """Routes et compteurs configurés par l'environnement ; `model` : modèle des deux paliers par défaut."""
+    tiers = {"fast": os.getenv("MODEL_ID_FAST", model),    # ex. un modèle plus petit, pour les questions simples
+             "large": os.getenv("MODEL_ID_LARGE", model)}
+    table = {} if os.getenv("ROUTING", "1") == "0" else routing_table(os.getenv("ROUTING_TABLE", ""))
+    prices = {tier: parse_price(os.getenv(f"MODEL_PRICE_{tier.upper()}", DEFAULT_PRICE)) for tier in tiers}
+    return load_routes(table, tiers, defaults), RouteStats(prices)
+
+class RouteStats:
+    """Par classe : appels, latence (dernières `recent` valeurs), tokens et coût estimé (USD)."""
+
+    def __init__(self, prices: dict[str, tuple[float, float]], recent: int = 500):
+        self.prices = prices              # palier → (entrée, sortie) en USD par million de tokens
+        self._lock = threading.Lock()
+        self._recent = recent
+        self._stats: dict[str, dict] = {}
+
+    def record(self, route: Route, latency: float, prompt_tokens: int, completion_tokens: int) -> float:
+        p_in, p_out = self.prices.get(route.tier, (0.0, 0.0))
+        cost = (prompt_tokens * p_in + completion_tokens * p_out) / 1e6
+        with self._lock:
+            s = self._stats.get(route.name)
+            if s is None:
+                s = self._stats[route.name] = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                               "truncated": 0, "cost_usd": 0.0,
+                                               "latency": deque(maxlen=self._recent)}
+            s["calls"] += 1
+            s["prompt_tokens"] += prompt_tokens
+            s["completion_tokens"] += completion_tokens
+            s["truncated"] += int(completion_tokens >= route.max_tokens)  # plafond atteint : réponse coupée ?
+            s["cost_usd"] += cost
+            s["latency"].append(latency)
+        return cost
+
+    def stats(self, routes: dict[str, Route]) -> dict:
+        out = {}
+        with self._lock:
+            items = {name: {**s, "latency": sorted(s["latency"])} for name, s in self._stats.items()}
+        for name, route in routes.items():
+            s = items.get(name)
+            row = {"tier": route.tier, "model": route.model, "max_tokens": route.max_tokens, "top_k": route.top_k}
+            if s:
+                lat, n = s["latency"], s["calls"]
+                row.update({
+                    "calls": n,
+                    "latency_p50_s": round(lat[len(lat) // 2], 3) if lat else None,
+                    "latency_p95_s": round(lat[min(len(lat) - 1, int(0.95 * len(lat)))], 3) if lat else None,
+                    "avg_prompt_tokens": round(s["prompt_tokens"] / n, 1),
+                    "avg_completion_tokens": round(s["completion_tokens"] / n, 1),
+                    "truncated": s["truncated"],
+                    "cost_usd": round(s["cost_usd"], 6),
+                    "cost_per_call_usd": round(s["cost_usd"] / n, 6),
+                })
+            out[name] = row
+        return out
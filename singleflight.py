@@ -0,0 +1,201 @@
+# singleflight.py — regroupement des requêtes modèle identiques en vol
+#
+# Quand plusieurs visiteurs posent la même question en même temps, un seul appel
+# amont part ; les autres attendent et partagent son résultat.
+# - entre threads d'un worker : dictionnaire clé → appel en cours
+# - entre workers (optionnel) : bail (lease) SQLite ; les workers qui n'ont pas le
+#   bail attendent que le résultat apparaisse dans le cache partagé (`lookup`)
+# - `runner` (optionnel) : exécute l'appel du meneur, par ex. dans un délai (deadline.py) ;
+#   s'il rend la main avant la fin, l'appel continue et son résultat est publié aux
+#   suiveurs quand il arrive. Les suiveurs attendent dans leur propre thread (`timeout`).
+
+import os, sqlite3, threading, time, uuid
+
+class FlightTimeout(TimeoutError):
+    """Résultat (meneur ou autre worker) pas arrivé dans le `timeout` demandé."""
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self, lease_path: str = "", lease_ttl: float = 30.0, poll: float = 0.1,
+                 wait_timeout: float = 60.0):
+        self.lease_path = lease_path
+        self.lease_ttl = lease_ttl
+        self.poll = poll
+        self.wait_timeout = wait_timeout
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._calls: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counts = {"leaders": 0, "coalesced": 0, "coalesced_cross_worker": 0,
+                       "wait_timeouts": 0, "max_waiters": 0}
+        if self.lease_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.lease_path)), exist_ok=True)
+                self._db().execute(
+                    "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+                )
+            except sqlite3.Error:
+                self.lease_path = ""
+
+    # -------------------------
+    # Entre threads
+    # -------------------------
+    def begin(self, key: str) -> tuple[bool, _Call]:
+        """(True, appel) si on est le meneur pour `key`, sinon (False, appel en cours à attendre)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.counts["leaders"] += 1
+                return True, call
+            call.waiters += 1
+            self.counts["max_waiters"] = max(self.counts["max_waiters"], call.waiters)
+            return False, call
+
+    def finish(self, key: str, call: _Call, result=None, error: BaseException | None = None) -> None:
+        call.result, call.error = result, error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def wait(self, call: _Call, timeout: float | None = None):
+        """Résultat partagé du meneur ; None si l'attente (`wait_timeout` au plus) a expiré."""
+        if not call.done.wait(self.wait_timeout if timeout is None else min(timeout, self.wait_timeout)):
+            with self._lock:
+                self.counts["wait_timeouts"] += 1
+            return None
+        if call.result is not None or call.error is not None:  # meneur sans résultat : rien de partagé
+            with self._lock:
+                self.counts["coalesced"] += 1
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key: str, fn, lookup=None, timeout: float | None = None, runner=None):
+        """Exécute `fn()` une seule fois par clé en vol ; `lookup()` lit le cache partagé (inter-workers).
+
+        `timeout` : attente au plus du meneur ou d'un autre worker, sinon FlightTimeout.
+        `runner(job)` : exécute l'appel (défaut : tout de suite, dans ce thread).
+        """
+        run = runner or (lambda job: job())
+        leader, call = self.begin(key)
+        if not leader:
+            result = self.wait(call, timeout)
+            if result is not None:
+                return result
+            if not call.done.is_set() and timeout is not None and timeout < self.wait_timeout:
+                raise FlightTimeout("pas de résultat du meneur à temps")
+            return run(fn)  # meneur trop lent ou sans résultat : on tente nous-mêmes, via `runner`
+        try:
+            result, leased = self._claim(key, lookup, timeout)
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        if result is not None:
+            self.finish(key, call, result=result)
+            return result
+
+        state = {"started": False, "cancelled": False}
+
+        def job():
+            with self._lock:
+                if state["cancelled"]:
+                    return None
+                state["started"] = True
+            try:
+                result = fn()
+            except BaseException as e:
+                self.finish(key, call, error=e)
+                raise
+            finally:
+                if leased:
+                    self._release_lease(key)
+            self.finish(key, call, result=result)  # même si `runner` a déjà rendu la main
+            return result
+
+        try:
+            return run(job)
+        except BaseException as e:
+            with self._lock:
+                cancel = not state["started"]  # refusé par `runner` avant de démarrer
+                state["cancelled"] = cancel
+            if cancel:
+                if leased:
+                    self._release_lease(key)
+                self.finish(key, call, error=e)
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counts,
+                "in_flight": len(self._calls),
+                "waiters": sum(c.waiters for c in self._calls.values()),
+                "shared": bool(self.lease_path),
+            }
+
+    # -------------------------
+    # Entre workers (bail SQLite)
+    # -------------------------
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.lease_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _try_lease(self, key: str) -> bool:
+        now = time.time()
+        cur = self._db().execute(
+            "INSERT INTO leases(key, owner, expires) VALUES(?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE leases.expires < ?",
+            (key, self.owner, now + self.lease_ttl, now),
+        )
+        return cur.rowcount == 1
+
+    def _release_lease(self, key: str) -> None:
+        try:
+            self._db().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+        except sqlite3.Error:
+            pass
+
+    def _claim(self, key: str, lookup, timeout: float | None) -> tuple[object, bool]:
+        """(résultat d'un autre worker, False) ou (None, bail obtenu ?) : à nous d'appeler."""
+        if not self.lease_path or lookup is None:
+            return None, False
+        try:
+            if self._try_lease(key):
+                return None, True
+        except sqlite3.Error:
+            return None, False
+        # un autre worker calcule déjà : on attend son résultat dans le cache partagé
+        limit = min(self.wait_timeout, self.lease_ttl)
+        bounded = timeout is not None and timeout < limit
+        deadline = time.monotonic() + (timeout if bounded else limit)
+        while time.monotonic() < deadline:
+            time.sleep(self.poll)
+            result = lookup()
+            if result is not None:
+                with self._lock:
+                    self.counts["coalesced_cross_worker"] += 1
+                return result, False
+            try:
+                if self._try_lease(key):  # bail libéré/expiré sans résultat : on prend la main
+                    return None, True
+            except sqlite3.Error:
+                break
+        if bounded:
+            raise FlightTimeout("pas de résultat de l'autre worker à temps")
+        return None, False
@@ -0,0 +1,98 @@
+# startup.py — chronométrage du démarrage + initialisation différée
+#
+# Sur un hébergement qui met le service en veille (Render gratuit), le 1er visiteur
+# paie tout le démarrage. En mode différé, le module ne fait que le strict nécessaire
+# pour servir / et /healthz ; les composants lourds (client LLM, numpy, base de
+# connaissances) sont initialisés dans un fil d'arrière-plan, et les routes qui en
+# ont besoin attendent `wait()` (prêt = readiness, distinct de vivant = liveness).
+# `report()` détaille le coût (import / init) de chaque composant.
+#
+# Sans dépendance : importé en premier pour pouvoir tout chronométrer.
+
+import os, sys, threading, time
+from contextlib import contextmanager
+
+class Startup:
+    def __init__(self, name: str = "app"):
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.steps: list[dict] = []
+        self.lazy = False
+        self.error = ""
+        self.ready_s: float | None = None   # du début de l'import à « prêt »
+        self._done = threading.Event()    # initialisation terminée (réussie ou non)
+        self._lock = threading.Lock()
+        self._fn = None
+        self._pid = 0
+
+    @contextmanager
+    def step(self, component: str, kind: str = "init"):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append({"component": component, "kind": kind,
+                               "seconds": round(time.perf_counter() - t, 4),
+                               "thread": threading.current_thread().name})
+
+    # -------------------------
+    # Initialisation (immédiate ou en arrière-plan)
+    # -------------------------
+    def run(self, fn, lazy: bool = False) -> None:
+        """Exécute `fn` tout de suite (erreur propagée) ou dans un fil (erreur gardée pour /readyz)."""
+        self._fn = fn
+        self.lazy = lazy
+        if lazy:
+            self._start_thread()
+            return
+        self._pid = os.getpid()
+        fn()
+        self._mark_ready()
+
+    def _start_thread(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._background, name=f"{self.name}-warmup", daemon=True).start()
+
+    def _background(self) -> None:
+        try:
+            self._fn()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"[startup] {self.name}: échec de l'initialisation — {self.error}", file=sys.stderr, flush=True)
+            self._done.set()
+            return
+        self._mark_ready()
+
+    def _mark_ready(self) -> None:
+        self.ready_s = round(time.perf_counter() - self.t0, 4)
+        self._done.set()
+        if self.lazy:
+            print(f"[startup] {self.name}: prêt en {self.ready_s:.3f} s", file=sys.stderr, flush=True)
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and not self.error
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Attend la fin de l'initialisation ; vrai si elle a réussi."""
+        if not self._done.is_set() and self.lazy and self._pid != os.getpid():
+            self._start_thread()  # processus forké avant la fin du démarrage (gunicorn --preload)
+        return self._done.wait(timeout) and not self.error
+
+    def report(self) -> dict:
+        by_kind: dict[str, float] = {}
+        for s in self.steps:
+            by_kind[s["kind"]] = round(by_kind.get(s["kind"], 0.0) + s["seconds"], 4)
+        return {
+            "name": self.name,
+            "lazy": self.lazy,
+            "ready": self.ready,
+            "error": self.error or None,
+            "ready_s": self.ready_s,
+            "uptime_s": round(time.perf_counter() - self.t0, 3),
+            "totals": by_kind,
+            "steps": sorted(self.steps, key=lambda s: -s["seconds"]),
+        }
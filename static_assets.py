@@ -0,0 +1,104 @@
+# static_assets.py — ressources statiques précompressées, versionnées, avec ETag
+#
+# Le widget est intégré sur chaque page du site Wix : c'est la requête la plus fréquente.
+# - Asset : contenu figé + variantes gzip / brotli calculées une fois (au démarrage),
+#   gardées seulement si elles font gagner assez d'octets (le GIF, déjà compressé, n'en a pas)
+# - ETag fort par représentation (empreinte du contenu + codage) → 304 sans renvoyer le corps
+# - AssetStore.url() : URL versionnée (/assets/<empreinte>/<chemin>), donc cacheable
+#   « immutable » un an ; tout changement de contenu change l'URL
+# - compress_body : compression à la volée des réponses JSON assez grosses (/chat)
+#
+# brotli est optionnel (pip install brotli) : sans lui, gzip seulement.
+
+import gzip, hashlib, mimetypes, os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ("text/", "application/json", "application/javascript", "image/svg+xml")
+MIN_GAIN = 0.9  # variante gardée si elle fait au plus 90 % de l'original
+
+def encodings() -> tuple[str, ...]:
+    """Codages disponibles, du préféré au moins bon."""
+    return ("br", "gzip") if brotli else ("gzip",)
+
+def compress(data: bytes, encoding: str, fast: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=4 if fast else 11)
+    return gzip.compress(data, compresslevel=5 if fast else 9, mtime=0)  # mtime=0 : sortie stable
+
+def choose_encoding(accept_encoding: str, available=None) -> str:
+    """Meilleur codage accepté par le client (en-tête Accept-Encoding), "" sinon."""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(name.strip())
+    for enc in available if available is not None else encodings():
+        if enc in accepted or ("*" in accepted and enc):
+            return enc
+    return ""
+
+def compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE)
+
+class Asset:
+    __slots__ = ("name", "data", "content_type", "digest", "variants")
+
+    def __init__(self, name: str, data: bytes, content_type: str):
+        self.name = name
+        self.data = data
+        self.content_type = content_type
+        self.digest = hashlib.sha1(data).hexdigest()[:16]
+        self.variants: dict[str, bytes] = {}
+        if compressible(content_type):
+            for enc in encodings():
+                body = compress(data, enc)
+                if len(body) <= len(data) * MIN_GAIN:
+                    self.variants[enc] = body
+
+    def pick(self, accept_encoding: str) -> tuple[str, bytes, str]:
+        """(codage, corps, ETag) de la représentation à servir."""
+        enc = choose_encoding(accept_encoding, tuple(self.variants))
+        body = self.variants[enc] if enc else self.data
+        return enc, body, f"{self.digest}-{enc}" if enc else self.digest
+
+class AssetStore:
+    """Fichiers de `root` (static/) chargés au démarrage + ressources construites (coquille du widget)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.assets: dict[str, Asset] = {}
+        for dirpath, _, files in os.walk(root):
+            for fn in files:
+                if fn.startswith("."):
+                    continue  # .DS_Store & co
+                path = os.path.join(dirpath, fn)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    self.add(name, f.read())
+
+    def add(self, name: str, data: bytes, content_type: str = "") -> Asset:
+        if not content_type:
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if content_type.startswith("text/"):
+                content_type += "; charset=utf-8"
+        asset = self.assets[name] = Asset(name, data, content_type)
+        return asset
+
+    def get(self, name: str) -> Asset | None:
+        return self.assets.get(name)
+
+    def url(self, name: str) -> str:
+        asset = self.assets.get(name)
+        if asset is None:
+            return f"/static/{name}"
+        return f"/assets/{asset.digest}/{name}"
+
+    def stats(self) -> dict:
+        return {name: {"bytes": len(a.data), **{enc: len(b) for enc, b in a.variants.items()}}
+                for name, a in self.assets.items()}
@@ -0,0 +1,219 @@
+# tenants.py — plusieurs studios (tenants) servis par une même instance
+#
+# - Tenant : configuration d'un studio (URLs du site, persona, réponses rapides, boutique,
+#   promo, dossiers de la base de connaissances…). Le studio historique est construit par
+#   app.py à partir de ses constantes ; les autres sont lus dans TENANTS_DIR/<id>/tenant.json
+#   (dossiers commençant par « _ » ignorés : tenants/_exemple/ documente le format)
+# - TenantBundle : la version compilée (mots-clés indexés, budget de prompt avec le persona,
+#   base de connaissances + index + vecteurs FAQ) — c'est elle qui coûte de la mémoire
+# - TenantRegistry : studio résolu par nom d'hôte ou paramètre du widget ; bundles chargés
+#   au 1er message, gardés dans un LRU borné en nombre et en octets, et libérés après
+#   `idle_ttl` secondes sans requête (le studio par défaut reste toujours chargé)
+
+import json, os, threading, time
+from collections import OrderedDict
+
+from fuzzy import KeywordMatcher
+from prompt_budget import PromptBudget
+
+class Tenant:
+    """Configuration d'un studio (données seulement, rien de compilé)."""
+
+    def __init__(self, id: str, name: str, assistant: str = "Betty", hosts: list[str] = (),
+                 urls: dict[str, str] | None = None, persona: str = "",
+                 course_fast: list[tuple[str, str]] = (), specials: list[tuple[str, list[str], str]] = (),
+                 inscription_terms: list[str] = (), clothes_terms: list[str] = (),
+                 shop_name: str = "", shop_blurb: str = "", offer_terms: list[str] = (),
+                 promo_month: int = 0, promo_msg: str = "", age_replies: dict[int, str] | None = None,
+                 signup_hint: str = "", faq_only_msg: str = "", busy_msg: str = "",
+                 rate_limit_msg: str = "", holding_msg: str = "", link_holding_msg: str = "",
+                 avatar: str = "", kb_folders: list[str] = (), faq_path: str = ""):
+        self.id = id
+        self.name = name
+        self.assistant = assistant
+        self.hosts = [h.lower() for h in hosts]
+        self.urls = dict(urls or {})
+        self.persona = persona
+        self.course_fast = [tuple(x) for x in course_fast]         # (mot-clé, phrase)
+        self.specials = [tuple(x) for x in specials]               # (règle, mots-clés, réponse), ex. K-Pop
+        self.inscription_terms = list(inscription_terms)
+        self.clothes_terms = list(clothes_terms)
+        self.shop_name = shop_name                                 # boutique conseillée pour les tenues
+        self.shop_blurb = shop_blurb
+        self.offer_terms = list(offer_terms)
+        self.promo_month = promo_month                             # 0 → pas de promo
+        self.promo_msg = promo_msg
+        self.age_replies = {int(k): v for k, v in (age_replies or {}).items()}  # âge → réponse (lien planning ajouté)
+        self.signup_hint = signup_hint
+        self.faq_only_msg = faq_only_msg
+        # messages d'attente / de refus (vides → ceux du studio par défaut)
+        self.busy_msg = busy_msg
+        self.rate_limit_msg = rate_limit_msg
+        self.holding_msg = holding_msg
+        self.link_holding_msg = link_holding_msg
+        self.avatar = avatar
+        self.kb_folders = list(kb_folders)
+        self.faq_path = faq_path
+
+    @classmethod
+    def from_dir(cls, path: str) -> "Tenant":
+        """TENANTS_DIR/<id>/tenant.json ; chemins relatifs au dossier, `persona` peut être un fichier .md/.txt."""
+        with open(os.path.join(path, "tenant.json"), encoding="utf-8") as f:
+            conf = json.load(f)
+        conf.setdefault("id", os.path.basename(os.path.normpath(path)))
+        persona = conf.get("persona", "")
+        if persona.endswith((".md", ".txt")):
+            with open(os.path.join(path, persona), encoding="utf-8") as f:
+                conf["persona"] = f.read().strip()
+        conf["kb_folders"] = [os.path.join(path, d) for d in conf.get("kb_folders", ["kb"])]
+        conf["faq_path"] = os.path.join(path, conf.get("faq_path", "faq.json"))
+        return cls(**conf)
+
+    def signature(self) -> str:
+        """Tout ce qui change les réponses du modèle pour ce studio (clé de cache)."""
+        return f"{self.id}\n{self.persona}"
+
+class TenantBundle:
+    """Studio compilé : mots-clés indexés, budget de prompt, base de connaissances vivante."""
+
+    def __init__(self, tenant: Tenant, live, budget: dict):
+        self.tenant = tenant
+        self.keywords = KeywordMatcher({
+            **{f"special:{rule}": terms for rule, terms, _ in tenant.specials},
+            "inscription": tenant.inscription_terms,
+            "clothes": tenant.clothes_terms,
+            "offer": tenant.offer_terms,
+            "course_fast": [kw for kw, _ in tenant.course_fast],
+        })
+        self.prompt = PromptBudget(tenant.persona, **budget)
+        self.live = live                  # kb_live.LiveKnowledge
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+
+    @property
+    def nbytes(self) -> int:
+        """Estimation de la mémoire retenue (matrices numpy + passages + vocabulaires)."""
+        kb = self.live.current
+        total = kb.index.weights.nbytes + kb.faq.matrix.nbytes
+        total += sum(len(c["text"]) for c in kb.index.chunks)
+        total += 80 * (len(kb.index.vocab) + len(kb.faq.vocab) + len(self.keywords.postings))
+        return total
+
+    def close(self) -> None:
+        self.live.stop()
+
+class TenantRegistry:
+    def __init__(self, default: Tenant, build, directory: str = "", max_bundles: int = 8,
+                 max_bytes: int = 256 * 1024 * 1024, idle_ttl: float = 1800):
+        self.default = default
+        self.build = build                # Tenant → TenantBundle
+        self.directory = directory
+        self.max_bundles = max_bundles
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl          # 0 → pas d'éviction à l'inactivité
+        self.tenants: dict[str, Tenant] = {}
+        self.hosts: dict[str, str] = {}
+        self.errors: dict[str, str] = {}
+        self._bundles: OrderedDict[str, TenantBundle] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.evictions = 0
+        self._swept = time.time()
+        self.scan()
+
+    def scan(self) -> None:
+        """(Re)lit les configurations de TENANTS_DIR (les bundles déjà chargés sont gardés)."""
+        tenants, errors = {self.default.id: self.default}, {}
+        if self.directory and os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                path = os.path.join(self.directory, name)
+                if name.startswith(("_", ".")) or not os.path.isfile(os.path.join(path, "tenant.json")):
+                    continue
+                try:
+                    t = Tenant.from_dir(path)
+                except (OSError, ValueError, TypeError) as e:
+                    errors[name] = f"{type(e).__name__}: {e}"
+                    continue
+                tenants.setdefault(t.id, t)
+        self.tenants, self.errors = tenants, errors
+        self.hosts = {h: t.id for t in tenants.values() for h in t.hosts}
+
+    def resolve(self, host: str = "", requested: str = "") -> Tenant:
+        """Studio demandé par le widget s'il existe, sinon celui du nom d'hôte, sinon le studio par défaut."""
+        if requested and requested in self.tenants:
+            return self.tenants[requested]
+        host = (host or "").split(":")[0].lower()
+        return self.tenants.get(self.hosts.get(host, ""), self.default)
+
+    # -------------------------
+    # Bundles (LRU)
+    # -------------------------
+    def get(self, tenant_id: str) -> TenantBundle:
+        now = time.time()
+        if self.idle_ttl and now - self._swept > 60:
+            self.sweep()
+        with self._lock:
+            b = self._bundles.get(tenant_id)
+            if b is not None:
+                b.last_used = now
+                self._bundles.move_to_end(tenant_id)
+                return b
+            lock = self._loading.setdefault(tenant_id, threading.Lock())
+        with lock:  # un seul chargement par studio, les autres requêtes l'attendent
+            with self._lock:
+                b = self._bundles.get(tenant_id)
+            if b is None:
+                b = self.build(self.tenants.get(tenant_id, self.default))
+                with self._lock:
+                    self._bundles[b.tenant.id] = b
+                    self.loads += 1
+                    evicted = self._evict(now, keep=b.tenant.id)
+                for old in evicted:
+                    old.close()
+        b.last_used = now
+        return b
+
+    def _evict(self, now: float, keep: str) -> list[TenantBundle]:
+        """Studios inactifs, puis les moins récemment utilisés jusqu'à repasser sous les plafonds."""
+        evicted = []
+        for tid, b in list(self._bundles.items()):
+            if self.idle_ttl and tid not in (self.default.id, keep) and now - b.last_used > self.idle_ttl:
+                evicted.append(self._bundles.pop(tid))
+        sizes = {tid: b.nbytes for tid, b in self._bundles.items()}
+        for tid in list(self._bundles):
+            if len(self._bundles) <= self.max_bundles and sum(sizes.values()) <= self.max_bytes:
+                break
+            if tid in (self.default.id, keep):
+                continue
+            evicted.append(self._bundles.pop(tid))
+            sizes.pop(tid)
+        self.evictions += len(evicted)
+        return evicted
+
+    def sweep(self) -> None:
+        """Libère les studios inactifs (appelé régulièrement, sans attendre un chargement)."""
+        with self._lock:
+            self._swept = time.time()
+            evicted = self._evict(self._swept, keep=self.default.id)
+        for old in evicted:
+            old.close()
+
+    def loaded(self) -> list[TenantBundle]:
+        with self._lock:
+            return list(self._bundles.values())
+
+    def stats(self) -> dict:
+        bundles = self.loaded()
+        return {
+            "configured": sorted(self.tenants),
+            "loaded": [{"id": b.tenant.id, "bytes": b.nbytes, "idle_s": round(time.time() - b.last_used, 1),
+                        "version": b.live.current.version} for b in bundles],
+            "bytes": sum(b.nbytes for b in bundles),
+            "max_bundles": self.max_bundles,
+            "max_bytes": self.max_bytes,
+            "idle_ttl_s": self.idle_ttl,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "errors": self.errors or None,
+        }
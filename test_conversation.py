@@ -0,0 +1,21 @@
+# test_conversation.py — relance ou question autonome (partage du cache entre sessions)
+
+import pytest
+
+from conversation import is_follow_up
+from fuzzy import norm
+
+@pytest.mark.parametrize("text, topical, expected", [
+    ("le studio est ouvert le dimanche matin ?", False, False),
+    ("Où se trouve le studio ?", False, False),
+    ("il y a cours demain ?", False, False),
+    ("Combien coûte un cours d'essai ?", True, False),
+    ("Et pour les ados ?", False, True),
+    ("elle commence quand ?", False, True),
+    ("ça coûte combien ?", False, True),
+    ("Le même le mardi ?", False, True),
+    ("le mardi ?", False, True),
+    ("le hip hop ?", True, False),
+])
+def test_is_follow_up(text, topical, expected):
+    assert is_follow_up(norm(text).split(), topical) is expected
@@ -0,0 +1,74 @@
+# test_deadline.py — délai de réponse (deadline.py) et file d'attente du modèle (concurrency.py)
+
+import threading, time
+
+import pytest
+
+from concurrency import ConcurrencyGate, GateTimeout
+from deadline import Deadline, DeadlineExceeded, DeadlineSaturated
+
+def test_on_time_result():
+    d = Deadline(max_background=2)
+    assert d.run(lambda: "ok", 1.0) == "ok"
+    assert d.stats()["on_time"] == 1 and d.stats()["running"] == 0
+
+def test_no_timeout_runs_inline():
+    d = Deadline(max_background=1)
+    assert d.run(threading.current_thread, None) is threading.current_thread()
+    assert d.stats()["on_time"] == 0
+
+def test_expiry_then_late_completion():
+    d, done = Deadline(max_background=2), threading.Event()
+
+    def slow():
+        time.sleep(0.2)
+        done.set()
+        return "tard"
+
+    with pytest.raises(DeadlineExceeded):
+        d.run(slow, 0.05)
+    assert d.stats()["timeouts"] == 1 and d.stats()["running"] == 1
+    assert done.wait(1.0)  # l'appel n'est pas annulé
+    time.sleep(0.05)
+    stats = d.stats()
+    assert stats["late_ok"] == 1 and stats["running"] == 0
+
+def test_late_error_is_counted():
+    d = Deadline(max_background=1)
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError("amont")
+
+    with pytest.raises(DeadlineExceeded):
+        d.run(fail, 0.02)
+    time.sleep(0.2)
+    assert d.stats()["late_error"] == 1
+
+def test_saturated_does_not_launch():
+    d, release = Deadline(max_background=1), threading.Event()
+    with pytest.raises(DeadlineExceeded):
+        d.run(release.wait, 0.02)
+    launched = []
+    with pytest.raises(DeadlineSaturated):
+        d.run(lambda: launched.append(1), 1.0)
+    assert not launched and d.stats()["saturated"] == 1
+    release.set()
+    time.sleep(0.05)
+    assert d.run(lambda: "libre", 1.0) == "libre"  # place rendue à la fin de l'appel tardif
+
+def test_expire_counts_a_timeout():
+    events = []
+    d = Deadline(on_event=events.append)
+    d.expire()
+    assert d.stats()["timeouts"] == 1 and events == ["timeouts"]
+
+def test_gate_wait_is_bounded_by_timeout():
+    gate = ConcurrencyGate(max_active=1, max_waiting=1, wait_timeout=10.0)
+    gate.acquire()
+    t0 = time.monotonic()
+    with pytest.raises(GateTimeout):
+        gate.acquire(timeout=0.05)
+    assert time.monotonic() - t0 < 1.0
+    assert gate.stats()["timeouts"] == 1 and gate.stats()["waiting"] == 0
+    gate.release()
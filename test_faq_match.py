@@ -0,0 +1,34 @@
+# test_faq_match.py — réponses directes de la FAQ (data/faq_danse.json)
+
+import pytest
+
+from faq_match import FAQMatcher
+
+@pytest.fixture(scope="module")
+def faq() -> FAQMatcher:
+    return FAQMatcher.from_file("data/faq_danse.json")
+
+@pytest.mark.parametrize("text, question", [
+    ("comment se passe l'inscription", "Comment s’effectue l’inscription au Centre de Danse Delphine Letort ?"),
+    ("quelle tenue pour le classique", "Quelle tenue est exigée pour les cours de danse classique ?"),
+    ("vous pouvez utiliser mon image ?", "Le centre peut-il utiliser mon image ?"),
+    ("comment vous contacter", "Comment vous contacter ?"),
+])
+def test_direct_answer(faq, text, question):
+    m = faq.answer(text)
+    assert m is not None and m.question == question
+
+@pytest.mark.parametrize("text", [
+    "je veux annuler mon inscription",   # ressemble à l'entrée « inscription » (confiance ≥ 0.8)
+    "je veux changer mon inscription",
+    "je veux annuler mon paiement",
+])
+def test_uncovered_word_is_not_answered(faq, text):
+    m = faq.match(text)
+    assert m is not None and faq.uncovered(text, m.index)
+    assert faq.answer(text) is None
+
+def test_regression_cancel_registration_was_confident(faq):
+    m = faq.match("je veux annuler mon inscription")
+    assert m.confidence >= faq.min_confidence  # seul le contrôle de couverture l'écarte
+    assert faq.uncovered("je veux annuler mon inscription", m.index) == ["annuler"]
@@ -0,0 +1,84 @@
+# test_provider_client.py — disjoncteur, bascule et hedging sans réseau (tentatives simulées)
+
+import threading, time
+from email.utils import formatdate
+
+import pytest
+
+from provider_client import ChatResult, CircuitBreaker, Provider, ProviderClient, ProviderError, retry_after_seconds
+
+def provider(name: str, breaker: CircuitBreaker | None = None) -> Provider:
+    return Provider(name, f"http://{name}.invalid/v1", "k", breaker=breaker)
+
+def half_open(cooldown: float = 30.0) -> CircuitBreaker:
+    b = CircuitBreaker(failures=1, cooldown=cooldown)
+    b.failure()
+    b.opened_at -= cooldown  # cooldown écoulé
+    return b
+
+def test_breaker_half_open_allows_a_single_trial():
+    b = half_open()
+    assert b.state == "half-open"
+    assert b.allow()
+    assert not b.allow()  # essai déjà réservé
+    b.success()
+    assert b.state == "closed" and b.allow()
+
+def test_healthy_primary_does_not_reserve_the_secondary_trial():
+    backup = half_open()
+    client = ProviderClient([provider("a"), provider("b", backup)])
+    result = client._run(lambda p: ChatResult("ok", p.name, None, 0.0))
+    assert result.provider == "a"
+    assert backup.trial_at == 0.0
+    assert backup.allow()  # l'essai half-open reste disponible
+
+def test_failover_uses_the_half_open_trial():
+    backup = half_open()
+    client = ProviderClient([provider("a"), provider("b", backup)])
+
+    def attempt(p):
+        if p.name == "a":
+            raise ProviderError("a: HTTP 503", status=503)
+        return ChatResult("ok", p.name, None, 0.0)
+
+    assert client._run(attempt).provider == "b"
+    assert client.failovers == 1
+    assert backup.trial_at > 0  # réservé au moment de l'envoi
+
+def test_all_breakers_open_still_tries_one_provider():
+    a, b = CircuitBreaker(failures=1), CircuitBreaker(failures=1)
+    a.failure(), b.failure()
+    client = ProviderClient([provider("a", a), provider("b", b)])
+    assert client._run(lambda p: ChatResult("ok", p.name, None, 0.0)).provider == "a"
+
+def test_hedge_counters_and_discarded_loser():
+    client = ProviderClient([provider("a"), provider("b")], hedge=True, hedge_min_delay=0.02)
+    discarded = []
+    client.on_discard = discarded.append
+
+    def attempt(p):
+        time.sleep(0.15 if p.name == "a" else 0.05)
+        return ChatResult(p.name, p.name, {"prompt_tokens": 5, "completion_tokens": 3}, 0.0)
+
+    n = 12
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client._run(attempt, discard=client._discarded)))
+               for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    time.sleep(0.3)  # les perdants finissent en arrière-plan
+    assert {r.provider for r in results} == {"b"}
+    stats = client.stats()
+    assert stats["hedges_fired"] == stats["hedges_won"] == n
+    assert stats["hedges_discarded"] == n
+    assert [r.provider for r in discarded] == ["a"] * n
+
+@pytest.mark.parametrize("value, expected", [("3", 3.0), (None, None), ("", None), ("bientôt", None)])
+def test_retry_after_seconds(value, expected):
+    assert retry_after_seconds(value) == expected
+
+def test_retry_after_http_date():
+    assert 8 <= retry_after_seconds(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert retry_after_seconds(formatdate(time.time() - 60, usegmt=True)) == 0.0
@@ -0,0 +1,20 @@
+# test_routing.py — classe de question (palier de modèle et budgets)
+
+import pytest
+
+from fuzzy import norm
+from routing import classify
+
+def kind(text: str, intents: int = 0, topical: bool = False) -> str:
+    return classify(norm(text).split(), text.count("?"), intents, topical)
+
+@pytest.mark.parametrize("text, intents, topical, expected", [
+    ("tarif du hip hop ?", 1, True, "short"),
+    ("le studio est ouvert le dimanche matin ?", 0, False, "open"),
+    ("vous faites des stages ?", 0, False, "open"),   # court mais sujet non reconnu
+    ("quels sont les horaires du cours de jazz pour les ados ?", 1, True, "factual"),
+    ("pourquoi choisir le classique plutôt que le jazz ?", 0, True, "complex"),
+    ("c'est quand ? et c'est où ?", 0, False, "complex"),
+])
+def test_classify(text, intents, topical, expected):
+    assert kind(text, intents, topical) == expected
@@ -0,0 +1,124 @@
+# test_singleflight.py — regroupement des appels identiques (meneur, suiveurs, bail inter-workers)
+
+import os, threading, time
+
+import pytest
+
+from singleflight import FlightTimeout, SingleFlight
+
+def follow(sf: SingleFlight, key: str, fn, out: list, **kw) -> threading.Thread:
+    def run():
+        try:
+            out.append(sf.do(key, fn, **kw))
+        except Exception as e:
+            out.append(e)
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+def test_followers_share_the_leader_result():
+    sf, calls, out = SingleFlight(), [], []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "réponse"
+
+    threads = [follow(sf, "k", fetch, out)]
+    time.sleep(0.05)
+    threads += [follow(sf, "k", fetch, out) for _ in range(4)]
+    for t in threads:
+        t.join()
+    assert out == ["réponse"] * 5
+    assert len(calls) == 1
+    assert sf.stats()["coalesced"] == 4 and sf.stats()["in_flight"] == 0
+
+def test_leader_error_reaches_followers():
+    sf, out = SingleFlight(), []
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError("amont")
+
+    threads = [follow(sf, "k", fail, out)]
+    time.sleep(0.03)
+    threads.append(follow(sf, "k", fail, out))
+    for t in threads:
+        t.join()
+    assert all(isinstance(e, ValueError) for e in out) and len(out) == 2
+
+def test_leader_without_result_is_not_counted_as_coalesced():
+    # meneur de streaming interrompu (méta IA, client parti) : finish(result=None)
+    sf = SingleFlight()
+    leader, call = sf.begin("k")
+    assert leader
+    out = []
+    t = follow(sf, "k", lambda: "appel du suiveur", out)
+    time.sleep(0.05)
+    sf.finish("k", call, result=None)
+    t.join()
+    assert out == ["appel du suiveur"]  # le suiveur appelle lui-même
+    assert sf.stats()["coalesced"] == 0
+
+def test_leader_without_result_with_short_timeout_still_calls():
+    # timeout < wait_timeout : le meneur a fini sans résultat, ce n'est pas un délai dépassé
+    sf = SingleFlight()
+    leader, call = sf.begin("k")
+    out = []
+    t = follow(sf, "k", lambda: "appel du suiveur", out, timeout=1.0)
+    time.sleep(0.05)
+    sf.finish("k", call, result=None)
+    t.join()
+    assert out == ["appel du suiveur"]
+    assert sf.stats()["wait_timeouts"] == 0
+
+def test_follower_timeout_raises_flight_timeout():
+    sf = SingleFlight()
+    leader, call = sf.begin("k")
+    with pytest.raises(FlightTimeout):
+        sf.do("k", lambda: "jamais", timeout=0.05)
+    assert sf.stats()["wait_timeouts"] == 1
+    sf.finish("k", call, result="tard")
+
+def test_runner_refusal_releases_followers():
+    # `runner` refuse avant de lancer l'appel (file pleine, délai) : les suiveurs ne restent pas bloqués
+    sf, out = SingleFlight(), []
+
+    def refuse(job):
+        time.sleep(0.1)
+        raise RuntimeError("refusé")
+
+    t = follow(sf, "k", lambda: "jamais", out, runner=refuse)
+    time.sleep(0.03)
+    u = follow(sf, "k", lambda: "suiveur", out)
+    t.join(), u.join()
+    assert sum(isinstance(e, RuntimeError) for e in out) == 2
+    assert sf.stats()["in_flight"] == 0
+
+def test_wait_timeout_then_follower_calls_itself():
+    sf = SingleFlight(wait_timeout=0.05)
+    leader, call = sf.begin("k")
+    out = []
+    follow(sf, "k", lambda: "seul", out).join()
+    assert out == ["seul"]
+    assert sf.stats()["wait_timeouts"] == 1
+    sf.finish("k", call, result="tard")
+
+def test_cross_worker_lease_waits_for_the_shared_cache(tmp_path):
+    path = os.path.join(tmp_path, "leases.sqlite3")
+    a, b = SingleFlight(path, poll=0.02), SingleFlight(path, poll=0.02)
+    cache, calls = {}, []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        cache["k"] = "partagée"
+        return "partagée"
+
+    out = []
+    t = follow(a, "k", fetch, out, lookup=lambda: cache.get("k"))
+    time.sleep(0.05)
+    assert b.do("k", fetch, lookup=lambda: cache.get("k")) == "partagée"
+    t.join()
+    assert len(calls) == 1
+    assert b.stats()["coalesced_cross_worker"] == 1